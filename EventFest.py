@@ -1,238 +1,1570 @@
 import sqlite3 
-from datetime import datetime 
+import sys
+import re
+import csv
+import json
+import time
+import math
+import queue
+import threading
+from datetime import datetime, timedelta
 from abc import ABC, abstractmethod 
 from enum import Enum
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from array import array
+from bisect import bisect_left, insort
+
+import analises
+import diario
+import metricas
+
+# Versão do esquema do banco, gravada em PRAGMA user_version
+VERSAO_ESQUEMA = 3
+
+# Quantidade de eventos buscados por consulta nas listagens paginadas
+TAMANHO_PAGINA = 50
+
+# Duração considerada para um evento "acontecendo agora", já que o evento só guarda o horário de início
+DURACAO_EVENTO_HORAS = 4
+
+# Conexões de leitura mantidas abertas por banco, além da conexão de escrita
+LEITORES_PADRAO = 4
+
+# Instruções preparadas guardadas em cache por conexão
+INSTRUCOES_EM_CACHE = 512
+
+# Configurações aplicadas a toda conexão aberta (WAL é ativado uma vez, pela conexão de escrita)
+PRAGMAS_CONEXAO = (
+    "synchronous = NORMAL",
+    "foreign_keys = ON",
+    "busy_timeout = 5000",
+    "cache_size = -65536",
+    "mmap_size = 268435456",
+    "temp_store = MEMORY",
+)
+
+# Quantidade de linhas gravadas por executemany ou lidas por fetchmany na importação/exportação
+TAMANHO_LOTE = 1000
+
+# Colunas aceitas na ordenação das listagens (nome usado na interface -> coluna no banco)
+ORDENACOES_USUARIOS = {'id': 'id', 'nome': 'nome', 'idade': 'idade', 'cep': 'cep'}
+ORDENACOES_EVENTOS = {'id': 'id', 'data': 'data_hora', 'nome': 'nome', 'preco': 'preco', 'categoria': 'categoria'}
+
+# Colunas lidas de Eventos para montar um EventoConcreto (ver evento_da_linha)
+COLUNAS_EVENTO = "id, nome, endereco, cep, preco, categoria, data, hora, descricao, capacidade"
+
+# Busca textual: quantidade padrão de resultados e peso de cada coluna no bm25 (nome, descricao, categoria, endereco)
+LIMITE_BUSCA = 20
+PESOS_BUSCA = (10.0, 1.0, 5.0, 2.0)
+
+# Busca por proximidade: raio padrão, raio inicial da busca crescente e raio médio da Terra, em km
+RAIO_PADRAO_KM = 10.0
+RAIO_INICIAL_KM = 1.0
+RAIO_TERRA_KM = 6371.0
+
+# Normalização do CEP feita em SQL (triggers e junções); normalizar_cep faz a mesma coisa em Python
+CEP_NORMALIZADO_SQL = "replace(replace(replace(trim({coluna}), '-', ''), '.', ''), ' ', '')"
+
+def converter_data(data):
+    # Aceita a data no formato digitado (dd/mm/aaaa) ou no formato ISO gravado no banco (aaaa-mm-dd)
+    if isinstance(data, datetime):
+        return data
+    try:
+        return datetime.strptime(data, "%d/%m/%Y")
+    except ValueError:
+        return datetime.strptime(data, "%Y-%m-%d")
+
+def combinar_data_hora(data, hora):
+    # Combina data e hora do evento em um único datetime; hora inválida vale 00:00
+    try:
+        horario = datetime.strptime(hora, "%H:%M").time()
+    except (TypeError, ValueError):
+        horario = datetime.min.time()
+    return datetime.combine(data.date(), horario)
+
+def calcular_data_hora(data, hora):
+    # Data e hora do evento em segundos desde a época (horário local), formato gravado em Eventos.data_hora
+    return int(combinar_data_hora(data, hora).timestamp())
 
 # Classe abstrata Evento
 class Evento(ABC):
+    # Sem __dict__ aqui, para que as subclasses com __slots__ fiquem de fato compactas
+    __slots__ = ()
+
     @abstractmethod
-    def esta_ativo(self):
+    def esta_ativo(self, data_hora_atual=None):
         pass
 
     @abstractmethod
-    def esta_proximo(self):
+    def esta_proximo(self, data_hora_atual=None):
         pass
 
     @abstractmethod
-    def ja_passou(self):
+    def ja_passou(self, data_hora_atual=None):
         pass
 
+def filtro_prefixo(coluna, prefixo):
+    # Traduz "começa com" em uma faixa (coluna >= prefixo AND coluna < prefixo + maior caractere), que usa o índice da coluna
+    return f"{coluna} >= ? AND {coluna} < ?", [prefixo, prefixo + "\U0010ffff"]
+
+def filtros_eventos(categoria=None, cep_prefixo=None, preco_min=None, preco_max=None):
+    # Monta as condições de filtro das listagens de eventos; None (ou texto vazio) desliga o filtro
+    condicoes = []
+    parametros = []
+    if categoria:
+        condicoes.append("categoria = ?")
+        parametros.append(categoria)
+    if cep_prefixo:
+        condicao, valores = filtro_prefixo("cep", cep_prefixo)
+        condicoes.append(condicao)
+        parametros.extend(valores)
+    if preco_min is not None:
+        condicoes.append("preco >= ?")
+        parametros.append(float(preco_min))
+    if preco_max is not None:
+        condicoes.append("preco <= ?")
+        parametros.append(float(preco_max))
+    return condicoes, parametros
+
+def ordenacao(ordenacoes, ordenar_por, decrescente=False):
+    # Valida a coluna de ordenação (nunca interpolada direto da entrada) e desempata pelo id
+    if ordenar_por not in ordenacoes:
+        raise ValueError(f"Ordenação inválida: {ordenar_por}. Use uma de: {', '.join(ordenacoes)}.")
+    ordem = "DESC" if decrescente else "ASC"
+    coluna = ordenacoes[ordenar_por]
+    if coluna == 'id':
+        return f" ORDER BY id {ordem}"
+    return f" ORDER BY {coluna} {ordem}, id {ordem}"
+
+def imprimir_em_blocos(linhas, titulo=None, mensagem_vazia=None, limite=None, tamanho_bloco=TAMANHO_PAGINA, saida=None):
+    # Escreve as linhas em blocos, com flush a cada bloco: a primeira página aparece logo e a memória não cresce
+    # Retorna a quantidade de linhas escritas
+    saida = saida or sys.stdout
+    bloco = []
+    total = 0
+    for linha in linhas:
+        if total == 0 and titulo:
+            bloco.append(titulo)
+        bloco.append(str(linha))
+        total += 1
+        if len(bloco) >= tamanho_bloco:
+            saida.write("\n".join(bloco) + "\n")
+            saida.flush()
+            bloco.clear()
+        if limite is not None and total >= limite:
+            break
+    if bloco:
+        saida.write("\n".join(bloco) + "\n")
+        saida.flush()
+    if total == 0 and mensagem_vazia:
+        print(mensagem_vazia)
+    return total
+
+def termos_busca(texto):
+    # Quebra o texto em palavras; cada uma vira um termo FTS5 entre aspas com busca por prefixo ("show"*)
+    # As aspas impedem que a entrada seja interpretada como operadores (AND, OR, NEAR, coluna:)
+    return " ".join(f'"{palavra}"*' for palavra in re.findall(r"\w+", texto or ""))
+
+def depois_de(agora):
+    # Corte entre eventos próximos (data_hora > agora) e os que já começaram (data_hora <= agora), como em
+    # EventoConcreto.esta_proximo/esta_ativo; data_hora é gravada em segundos inteiros, então data_hora > agora
+    # equivale a data_hora >= agora + 1s truncado, que as buscas usam como início inclusivo ou fim exclusivo
+    return agora + timedelta(seconds=1)
+
+def normalizar_cep(cep):
+    # "01000-000", "01.000-000" e "01000000" viram a mesma chave da tabela Ceps
+    return re.sub(r"[-. ]", "", cep.strip()) if cep else cep
+
+def distancia_km(latitude1, longitude1, latitude2, longitude2):
+    # Distância em linha reta sobre a superfície da Terra (fórmula de haversine)
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2
+         + math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def retangulo_km(latitude, longitude, raio_km):
+    # Retângulo (lat/lon mínimas e máximas) que contém o círculo de raio_km em volta do ponto
+    delta_latitude = math.degrees(raio_km / RAIO_TERRA_KM)
+    cos_latitude = math.cos(math.radians(latitude))
+    delta_longitude = 180.0 if cos_latitude < 1e-6 else min(180.0, delta_latitude / cos_latitude)
+    return (latitude - delta_latitude, latitude + delta_latitude, longitude - delta_longitude, longitude + delta_longitude)
+
+def internar(texto):
+    # Valores muito repetidos (categoria, CEP, sexo) passam a compartilhar um único objeto str
+    return sys.intern(texto) if isinstance(texto, str) else texto
+
+# Resultado de uma tentativa de reserva de vaga em um evento
+class SituacaoReserva(Enum):
+    INSCRITO = 'inscrito'
+    LISTA_DE_ESPERA = 'lista_de_espera'
+    JA_INSCRITO = 'ja_inscrito'
+    JA_NA_LISTA = 'ja_na_lista'
+
 # Classe EventoConcreto que herda de Evento
 class EventoConcreto(Evento):
-    def __init__(self, nome, endereco, cep, preco, categoria, data, hora, descricao):
+    # __slots__ evita um __dict__ por evento; os participantes ficam no RegistroEventos, como ids
+    __slots__ = ('id', 'nome', 'endereco', 'cep', 'preco', 'categoria', 'data', 'hora', 'descricao', 'data_hora',
+                 'capacidade')
+
+    def __init__(self, nome, endereco, cep, preco, categoria, data, hora, descricao, id=None, capacidade=None):
         # Inicializa as informações do evento
+        self.id = id
         self.nome = nome
         self.endereco = endereco
-        self.cep = cep
+        self.cep = internar(cep)
         self.preco = float(preco)
-        self.categoria = categoria
-        self.data = datetime.strptime(data, "%d/%m/%Y")
-        self.hora = hora
+        self.categoria = internar(categoria)
+        self.data = converter_data(data)
+        self.hora = internar(hora)
         self.descricao = descricao
-        self.participantes = []
+        # Data e hora combinadas uma única vez, na criação do evento
+        self.data_hora = combinar_data_hora(self.data, hora)
+        # Quantidade máxima de participantes; None significa sem limite
+        self.capacidade = None if capacidade in (None, '') else int(capacidade)
 
-    def esta_ativo(self):
+    def como_dict(self):
+        # Substitui o antigo __dict__ na exibição dos eventos
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def esta_ativo(self, data_hora_atual=None):
         # Verifica se o evento está ativo comparando a data/hora atual com a do evento
-        data_hora_atual = datetime.now()
-        data_hora_evento = datetime.combine(self.data, datetime.strptime(self.hora, "%H:%M").time())
-        return data_hora_atual >= data_hora_evento
+        data_hora_atual = data_hora_atual or datetime.now()
+        return data_hora_atual >= self.data_hora
 
-    def esta_proximo(self):
+    def esta_proximo(self, data_hora_atual=None):
         # Verifica se o evento está próximo comparando a data/hora atual com a do evento
-        data_hora_atual = datetime.now()
-        data_hora_evento = datetime.combine(self.data, datetime.strptime(self.hora, "%H:%M").time())
-        return data_hora_atual < data_hora_evento
+        data_hora_atual = data_hora_atual or datetime.now()
+        return data_hora_atual < self.data_hora
 
-    def ja_passou(self):
+    def ja_passou(self, data_hora_atual=None):
         # Verifica se o evento já passou comparando a data/hora atual com a do evento
-        data_hora_atual = datetime.now()
-        data_hora_evento = datetime.combine(self.data, datetime.strptime(self.hora, "%H:%M").time())
-        return data_hora_atual > data_hora_evento
+        data_hora_atual = data_hora_atual or datetime.now()
+        return data_hora_atual > self.data_hora
+
+def evento_da_linha(linha):
+    # Monta o evento a partir de uma linha com as colunas de COLUNAS_EVENTO
+    return EventoConcreto(*linha[1:9], id=linha[0], capacidade=linha[9])
 
 class Usuario:
-    def __init__(self, nome, idade, sexo, telefone, endereco, cep):
+    __slots__ = ('id', 'nome', 'idade', 'sexo', 'telefone', 'endereco', 'cep')
+
+    def __init__(self, nome, idade, sexo, telefone, endereco, cep, id=None):
         # Inicializa as informações do usuário
+        self.id = id
         self.nome = nome
         self.idade = int(idade)
-        self.sexo = sexo
+        self.sexo = internar(sexo)
         self.telefone = telefone
         self.endereco = endereco
-        self.cep = cep
+        self.cep = internar(cep)
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
 
 class Participacoes:
+    __slots__ = ('id', 'evento_nome', 'participante')
+
     def __init__(self, id, evento_nome, participante):
         # Inicializa as informações da participação
         self.id = id
         self.evento_nome = evento_nome
         self.participante = participante
 
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+# Classe que mantém índices em memória para eventos, usuários e participações
+class RegistroEventos:
+    def __init__(self):
+        # Listas com todos os registros, na ordem em que foram cadastrados
+        self.eventos = []
+        self.usuarios = []
+        # Índices por chave (o primeiro registro com a chave é o encontrado nas buscas)
+        self.eventos_por_id = {}
+        self.usuarios_por_id = {}
+        self.eventos_por_nome = {}
+        self.usuarios_por_nome = {}
+        self.eventos_por_categoria = {}
+        self.eventos_por_cep = {}
+        self.eventos_por_data = {}
+        self.usuarios_por_cep = {}
+        # Índice de adjacência nos dois sentidos: id do evento -> ids dos participantes e id do usuário -> ids dos eventos
+        # Cada lista é um array('q') ordenado: 8 bytes por participação, com busca binária
+        self.participantes_por_evento = {}
+        self.eventos_por_participante = {}
+
+    def limpar(self):
+        # Esvazia as listas e índices sem trocar os objetos, pois os gerenciadores guardam referências a eles
+        for colecao in (self.eventos, self.usuarios, self.eventos_por_id, self.usuarios_por_id,
+                        self.eventos_por_nome, self.usuarios_por_nome,
+                        self.eventos_por_categoria, self.eventos_por_cep, self.eventos_por_data,
+                        self.usuarios_por_cep, self.participantes_por_evento, self.eventos_por_participante):
+            colecao.clear()
+
+    def carregar(self, dados, pares_participacao=()):
+        # Preenche os índices a partir do resultado de ManipuladorDados.carregar_dados
+        # As participações podem vir como objetos Participacoes ou, de forma mais econômica, como pares (evento_id, usuario_id)
+        for usuario in dados.get('usuarios', []):
+            self.adicionar_usuario(usuario)
+        for evento in dados.get('eventos', []):
+            self.adicionar_evento(evento)
+        for participacao in dados.get('participacoes', []):
+            evento = self.buscar_evento(participacao.evento_nome)
+            usuario = self.buscar_usuario(participacao.participante)
+            if evento and usuario:
+                self.adicionar_participacao(evento.id, usuario.id)
+        # Pares lidos em ordem de participação: acrescenta sem ordenar e ordena cada array uma vez no final
+        for evento_id, usuario_id in pares_participacao:
+            self.participantes_por_evento.setdefault(evento_id, array('q')).append(usuario_id)
+            self.eventos_por_participante.setdefault(usuario_id, array('q')).append(evento_id)
+        for indice in (self.participantes_por_evento, self.eventos_por_participante):
+            for chave, ids in indice.items():
+                indice[chave] = array('q', sorted(set(ids)))
+
+    def adicionar_usuario(self, usuario):
+        # Adiciona o usuário à lista e aos índices
+        self.usuarios.append(usuario)
+        self.usuarios_por_id[usuario.id] = usuario
+        self.usuarios_por_nome.setdefault(usuario.nome, usuario)
+        self.usuarios_por_cep.setdefault(usuario.cep, []).append(usuario)
+
+    def adicionar_evento(self, evento):
+        # Adiciona o evento à lista e aos índices
+        self.eventos.append(evento)
+        self.eventos_por_id[evento.id] = evento
+        self.eventos_por_nome.setdefault(evento.nome.strip(), evento)
+        self.eventos_por_categoria.setdefault(evento.categoria, []).append(evento)
+        self.eventos_por_cep.setdefault(evento.cep, []).append(evento)
+        self.eventos_por_data.setdefault(evento.data.date(), []).append(evento)
+
+    def salvar_usuario(self, usuario):
+        # Atualiza o usuário já registrado com o mesmo nome ou adiciona um novo
+        existente = self.usuarios_por_nome.get(usuario.nome)
+        if existente is None:
+            self.adicionar_usuario(usuario)
+            return
+        self.usuarios_por_cep[existente.cep].remove(existente)
+        for campo in ('id', 'idade', 'sexo', 'telefone', 'endereco', 'cep'):
+            setattr(existente, campo, getattr(usuario, campo))
+        self.usuarios_por_id[existente.id] = existente
+        self.usuarios_por_cep.setdefault(existente.cep, []).append(existente)
+
+    def salvar_evento(self, evento):
+        # Atualiza o evento já registrado com o mesmo nome ou adiciona um novo
+        existente = self.eventos_por_nome.get(evento.nome.strip())
+        if existente is None:
+            self.adicionar_evento(evento)
+            return
+        self.eventos_por_categoria[existente.categoria].remove(existente)
+        self.eventos_por_cep[existente.cep].remove(existente)
+        self.eventos_por_data[existente.data.date()].remove(existente)
+        for campo in ('id', 'endereco', 'cep', 'preco', 'categoria', 'data', 'hora', 'descricao', 'data_hora', 'capacidade'):
+            setattr(existente, campo, getattr(evento, campo))
+        self.eventos_por_id[existente.id] = existente
+        self.eventos_por_categoria.setdefault(existente.categoria, []).append(existente)
+        self.eventos_por_cep.setdefault(existente.cep, []).append(existente)
+        self.eventos_por_data.setdefault(existente.data.date(), []).append(existente)
+
+    def adicionar_participacao(self, evento_id, usuario_id):
+        # Registra a participação nos dois índices; retorna False se ela já existia
+        participantes = self.participantes_por_evento.setdefault(evento_id, array('q'))
+        posicao = bisect_left(participantes, usuario_id)
+        if posicao < len(participantes) and participantes[posicao] == usuario_id:
+            return False
+        participantes.insert(posicao, usuario_id)
+        insort(self.eventos_por_participante.setdefault(usuario_id, array('q')), evento_id)
+        return True
+
+    def remover_participacao(self, evento_id, usuario_id):
+        # Remove a participação dos dois índices; retorna False se ela não existia
+        participantes = self.participantes_por_evento.get(evento_id, ())
+        posicao = bisect_left(participantes, usuario_id)
+        if posicao == len(participantes) or participantes[posicao] != usuario_id:
+            return False
+        del participantes[posicao]
+        eventos = self.eventos_por_participante[usuario_id]
+        del eventos[bisect_left(eventos, evento_id)]
+        return True
+
+    def buscar_evento(self, nome_evento):
+        return self.eventos_por_nome.get(nome_evento.strip())
+
+    def buscar_usuario(self, nome_usuario):
+        return self.usuarios_por_nome.get(nome_usuario)
+
+    def esta_participando(self, evento_id, usuario_id):
+        participantes = self.participantes_por_evento.get(evento_id, ())
+        posicao = bisect_left(participantes, usuario_id)
+        return posicao < len(participantes) and participantes[posicao] == usuario_id
+
+    def participantes_do_evento(self, nome_evento):
+        # Retorna os nomes dos participantes do evento
+        evento = self.buscar_evento(nome_evento)
+        if evento is None:
+            return []
+        return [self.usuarios_por_id[id].nome for id in self.participantes_por_evento.get(evento.id, ())
+                if id in self.usuarios_por_id]
+
+    def eventos_do_participante(self, nome_usuario):
+        # Retorna os eventos (objetos) em que o usuário está inscrito
+        usuario = self.buscar_usuario(nome_usuario)
+        if usuario is None:
+            return []
+        return [self.eventos_por_id[id] for id in self.eventos_por_participante.get(usuario.id, ())
+                if id in self.eventos_por_id]
+
+    def eventos_da_categoria(self, categoria):
+        return list(self.eventos_por_categoria.get(categoria, []))
+
+    def eventos_do_cep(self, cep):
+        return list(self.eventos_por_cep.get(cep, []))
+
+    def eventos_da_data(self, data):
+        # Aceita tanto datetime quanto date
+        if isinstance(data, datetime):
+            data = data.date()
+        return list(self.eventos_por_data.get(data, []))
+
+    def usuarios_do_cep(self, cep):
+        return list(self.usuarios_por_cep.get(cep, []))
+
+# Classe que guarda os dados do banco em memória, carregados uma única vez e compartilhados pelos gerenciadores
+class CacheDados:
+    def __init__(self, manipulador_dados):
+        self.manipulador_dados = manipulador_dados
+        self.registro = RegistroEventos()
+        # Duas travas, sempre nesta ordem: a da conexão de escrita serializa as gravações e as cargas, e a do registro
+        # protege as listas e índices em memória, segurada só enquanto eles são lidos ou alterados (as gravações no banco
+        # acontecem fora dela)
+        # Quem segura a trava do registro não pede a de escrita, para as duas ordens nunca se cruzarem
+        self.trava_escrita = manipulador_dados.conexoes.trava_escrita
+        self.trava = threading.RLock()
+        self.carregado = False
+        # Valor de PRAGMA data_version na última carga; muda quando outra conexão grava no arquivo
+        # (gravações desta conexão que não passam pelo cache o invalidam, ver ManipuladorDados.unidade_de_trabalho)
+        self.versao_dados = None
+
+    def em_dia(self):
+        # True se o registro está carregado e nenhuma outra conexão gravou desde a carga
+        # Não espera o escritor: com uma gravação em andamento em outra thread a versão não é lida agora
+        # (a conexão de escrita está ocupada) e o registro vale como está até a próxima leitura
+        if not self.carregado:
+            return False
+        if not self.trava_escrita.acquire(blocking=False):
+            return True
+        try:
+            return self.manipulador_dados.versao_dados() == self.versao_dados
+        finally:
+            self.trava_escrita.release()
+
+    def obter_registro(self):
+        # Retorna o registro, carregando o banco apenas na primeira vez ou se outro processo o alterou
+        # Para ler as listas e índices devolvidos, segure self.trava
+        if self.em_dia():
+            if metricas.ativo:
+                metricas.contar('cache_acertos')
+            return self.registro
+        # A carga espera as gravações em andamento, para o que for lido do banco coincidir com o que foi aplicado aqui
+        with self.trava_escrita:
+            versao = self.manipulador_dados.versao_dados()
+            if not self.carregado or versao != self.versao_dados:
+                if metricas.ativo:
+                    metricas.contar('cache_falhas')
+                self.recarregar(versao)
+            elif metricas.ativo:
+                metricas.contar('cache_acertos')
+            return self.registro
+
+    def registro_carregado(self):
+        # Retorna o registro se ele já está em memória e em dia com o banco, sem carregá-lo; senão None
+        return self.registro if self.em_dia() else None
+
+    def buscar_usuario(self, nome_usuario):
+        # Busca no registro se ele está carregado; senão uma consulta pelo índice do nome, sem ler as tabelas inteiras
+        registro = self.registro_carregado()
+        if registro is not None:
+            with self.trava:
+                return registro.buscar_usuario(nome_usuario)
+        return self.manipulador_dados.buscar_usuario(nome_usuario)
+
+    def buscar_evento(self, nome_evento):
+        registro = self.registro_carregado()
+        if registro is not None:
+            with self.trava:
+                return registro.buscar_evento(nome_evento)
+        return self.manipulador_dados.buscar_evento(nome_evento)
+
+    def nomes_dos_usuarios(self, ids_usuarios):
+        # Nomes dos usuários pelos ids, do registro ou do banco, como em buscar_usuario
+        registro = self.registro_carregado()
+        if registro is None:
+            return self.manipulador_dados.buscar_nomes_usuarios(ids_usuarios)
+        with self.trava:
+            return [registro.usuarios_por_id[id].nome for id in ids_usuarios if id in registro.usuarios_por_id]
+
+    def recarregar(self, versao=None):
+        # Recarrega todas as tabelas no mesmo registro (as referências dos gerenciadores continuam válidas)
+        with self.trava_escrita:
+            dados = self.manipulador_dados.carregar_dados(com_participacoes=False)
+            with self.trava:
+                self.registro.limpar()
+                self.registro.carregar(dados, self.manipulador_dados.iterar_pares_participacao())
+            self.versao_dados = self.manipulador_dados.versao_dados() if versao is None else versao
+            self.carregado = True
+
+    def invalidar(self):
+        # Força a recarga na próxima consulta, após gravações feitas diretamente no banco (ex.: importação em lote)
+        self.carregado = False
+
+    def salvar_usuario(self, usuario):
+        # Grava (ou atualiza) o usuário no banco e aplica a mudança no cache
+        # As gravações só tocam o registro se ele já foi carregado; senão a primeira carga já lerá o banco atualizado
+        with self.trava_escrita, self.manipulador_dados.gravacao_no_cache():
+            self.manipulador_dados.salvar_usuario(usuario)
+            if self.carregado:
+                with self.trava:
+                    self.registro.salvar_usuario(usuario)
+
+    def salvar_evento(self, evento):
+        # Grava (ou atualiza) o evento no banco e aplica a mudança no cache
+        # Se a capacidade aumentou, quem estava na lista de espera já entra
+        with self.trava_escrita, self.manipulador_dados.gravacao_no_cache():
+            self.manipulador_dados.salvar_evento(evento)
+            promovidos = self.manipulador_dados.promover_lista_espera(evento.id)
+            if not self.carregado:
+                return
+            with self.trava:
+                self.registro.salvar_evento(evento)
+                for usuario_id in promovidos:
+                    self.registro.adicionar_participacao(evento.id, usuario_id)
+
+    def adicionar_participacao(self, evento, usuario):
+        # Reserva uma vaga (ou um lugar na lista de espera) e retorna a SituacaoReserva
+        with self.trava_escrita, self.manipulador_dados.gravacao_no_cache():
+            if self.carregado:
+                with self.trava:
+                    if self.registro.esta_participando(evento.id, usuario.id):
+                        return SituacaoReserva.JA_INSCRITO
+            situacao, promovidos = self.manipulador_dados.reservar_vaga(evento, usuario)
+            if not self.carregado:
+                return situacao
+            with self.trava:
+                if situacao in (SituacaoReserva.INSCRITO, SituacaoReserva.JA_INSCRITO):
+                    self.registro.adicionar_participacao(evento.id, usuario.id)
+                # A reserva pode ter promovido outros usuários da fila (vagas abertas por outra conexão)
+                for usuario_id in promovidos:
+                    self.registro.adicionar_participacao(evento.id, usuario_id)
+            return situacao
+
+    def remover_participacao(self, evento, usuario):
+        # Cancela a participação ou o lugar na fila; retorna (removido, ids dos usuários promovidos da fila)
+        with self.trava_escrita, self.manipulador_dados.gravacao_no_cache():
+            removido, promovidos = self.manipulador_dados.cancelar_reserva(evento, usuario)
+            if not self.carregado:
+                return removido, promovidos
+            with self.trava:
+                self.registro.remover_participacao(evento.id, usuario.id)
+                for usuario_id in promovidos:
+                    self.registro.adicionar_participacao(evento.id, usuario_id)
+            return removido, promovidos
+
+# Classe que administra as conexões com o banco: uma de escrita e um pequeno conjunto de conexões de leitura
+class GerenciadorConexoes:
+    def __init__(self, nome_banco, leitores=LEITORES_PADRAO):
+        self.nome_banco = nome_banco
+        self.em_memoria = nome_banco == ':memory:' or nome_banco.startswith('file::memory:')
+        self.max_leitores = 0 if self.em_memoria else leitores
+        # Só uma thread por vez usa a conexão de escrita, aberta no primeiro uso (ver conexao_escrita)
+        self.trava_escrita = threading.RLock()
+        self.escritor = None
+        self.leitores_livres = queue.LifoQueue()
+        self.leitores_abertos = 0
+        self.trava_leitores = threading.Lock()
+
+    def abrir_conexao(self, somente_leitura=False):
+        # Abre uma conexão com as configurações de desempenho e o cache de instruções preparadas
+        conexao = sqlite3.connect(self.nome_banco, check_same_thread=False, cached_statements=INSTRUCOES_EM_CACHE,
+                                  factory=metricas.fabrica_conexao())
+        for pragma in PRAGMAS_CONEXAO:
+            conexao.execute(f"PRAGMA {pragma}")
+        if somente_leitura:
+            conexao.execute("PRAGMA query_only = ON")
+        return conexao
+
+    def conexao_escrita(self):
+        # Abre a conexão de escrita na primeira chamada e a reaproveita nas seguintes
+        if self.escritor is None:
+            with self.trava_escrita:
+                if self.escritor is None:
+                    escritor = self.abrir_conexao()
+                    if not self.em_memoria:
+                        # Em WAL os leitores leem o último estado confirmado sem esperar o escritor
+                        escritor.execute("PRAGMA journal_mode = WAL")
+                    self.escritor = escritor
+        return self.escritor
+
+    @contextmanager
+    def leitura(self):
+        # Empresta uma conexão de leitura; abre uma nova só enquanto o limite não foi atingido
+        if self.max_leitores == 0:
+            # Um banco em memória existe só na conexão de escrita
+            with self.trava_escrita:
+                yield self.conexao_escrita()
+            return
+        try:
+            conexao = self.leitores_livres.get_nowait()
+        except queue.Empty:
+            with self.trava_leitores:
+                abrir = self.leitores_abertos < self.max_leitores
+                if abrir:
+                    self.leitores_abertos += 1
+            conexao = self.abrir_conexao(somente_leitura=True) if abrir else self.leitores_livres.get()
+        try:
+            yield conexao
+        finally:
+            self.leitores_livres.put(conexao)
+
+    def fechar(self):
+        # Fecha todas as conexões abertas
+        while True:
+            try:
+                self.leitores_livres.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.trava_escrita:
+            if self.escritor is not None:
+                self.escritor.close()
+                self.escritor = None
+
 # Classe para manipulação de dados no banco SQLite
 class ManipuladorDados:
-    def __init__(self, nome_banco):
+    def __init__(self, nome_banco, leitores=LEITORES_PADRAO):
         # Inicializa o banco de dados
         self.nome_banco = nome_banco
-        self.conexao = sqlite3.connect(self.nome_banco)
-        self.criar_tabelas() # Chama o método para criar tabelas no banco
+        # Todas as operações usam as conexões do gerenciador; self.conexao é a conexão de escrita
+        # Nada é aberto aqui: o arquivo só é aberto e as tabelas criadas no primeiro uso (ver preparar)
+        self.conexoes = GerenciadorConexoes(nome_banco, leitores)
+        self.preparado = False
+        self.preparando = False
+        # Profundidade de unidades de trabalho abertas e thread que as abriu (ver unidade_de_trabalho)
+        self.nivel_transacao = 0
+        self.thread_transacao = None
+        # total_changes da conexão no início da unidade mais externa e quantas dessas mudanças o cache já acompanhou
+        self.mudancas_inicio = 0
+        self.mudancas_no_cache = 0
+        # Cache único compartilhado por todos que usam este manipulador
+        self.cache = CacheDados(self)
+        # Diário só de acréscimo com as alterações, para consumidores lerem só o que mudou
+        self.diario = diario.Diario(self)
+
+    @property
+    def conexao(self):
+        # Conexão de escrita, com o banco já aberto e as tabelas criadas
+        if not self.preparado:
+            self.preparar()
+        return self.conexoes.escritor
+
+    def preparar(self):
+        # Abre a conexão de escrita e cria (ou migra) as tabelas, uma única vez, mesmo com várias threads
+        if self.preparado:
+            return
+        with self.conexoes.trava_escrita:
+            # preparando: criar_tabelas usa self.conexao na mesma thread antes de o preparo terminar
+            if self.preparado or self.preparando:
+                return
+            conexao = self.conexoes.conexao_escrita()
+            self.preparando = True
+            try:
+                # As chaves estrangeiras são ligadas só depois da migração, que copia tabelas antigas
+                conexao.execute("PRAGMA foreign_keys = OFF")
+                self.criar_tabelas() # Chama o método para criar tabelas no banco
+                conexao.execute("PRAGMA foreign_keys = ON")
+                self.preparado = True
+            finally:
+                self.preparando = False
+
+    def versao_dados(self):
+        # Número que o SQLite incrementa quando outra conexão confirma alterações no arquivo
+        with self.conexoes.trava_escrita:
+            return self.conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def leitura(self):
+        # Dentro de uma unidade de trabalho a leitura usa a conexão de escrita, para enxergar o que ainda não foi confirmado
+        self.preparar()
+        if self.nivel_transacao and self.thread_transacao == threading.get_ident():
+            yield self.conexao
+            return
+        with self.conexoes.leitura() as conexao:
+            yield conexao
+
+    def fechar(self):
+        self.conexoes.fechar()
+
+    def versao_esquema(self):
+        # Lê a versão do esquema gravada em PRAGMA user_version
+        versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+        if versao == 0 and self.tabela_existe('Eventos'):
+            # Bancos criados antes do versionamento não gravavam a versão
+            versao = 1
+        return versao
+
+    def tabela_existe(self, nome_tabela):
+        cursor = self.conexao.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome_tabela,))
+        return cursor.fetchone() is not None
 
     def criar_tabelas(self):
-        # Criação das tabelas se não existirem
+        # Criação das tabelas e índices se não existirem, migrando bancos de versões anteriores
+        versao = self.versao_esquema()
+        if versao == 1:
+            self.copiar_backup(f"{self.nome_banco}.v1.bak")
+
         cursor = self.conexao.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if versao == 1:
+                # As tabelas antigas são renomeadas e os dados copiados para as novas depois de criá-las
+                for tabela in ('Participacoes', 'Eventos', 'Usuarios'):
+                    cursor.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_v1")
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS Usuarios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL UNIQUE,
+                    idade INTEGER,
+                    sexo TEXT,
+                    telefone TEXT,
+                    endereco TEXT,
+                    cep TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS Eventos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL UNIQUE,
+                    endereco TEXT,
+                    cep TEXT,
+                    preco REAL,
+                    categoria TEXT,
+                    data TEXT,
+                    hora TEXT,
+                    descricao TEXT,
+                    data_hora INTEGER NOT NULL,
+                    capacidade INTEGER CHECK (capacidade IS NULL OR capacidade >= 0)
+                )
+            """)
+            if versao == 2:
+                # Versão 3: capacidade por evento (NULL = sem limite) e lista de espera
+                cursor.execute("""
+                    ALTER TABLE Eventos ADD COLUMN capacidade INTEGER CHECK (capacidade IS NULL OR capacidade >= 0)
+                """)
+            # A restrição UNIQUE já cria o índice (evento_id, usuario_id) usado nas buscas por evento
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS Participacoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    evento_id INTEGER NOT NULL REFERENCES Eventos (id) ON DELETE CASCADE,
+                    usuario_id INTEGER NOT NULL REFERENCES Usuarios (id) ON DELETE CASCADE,
+                    UNIQUE (evento_id, usuario_id)
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_participacoes_usuario ON Participacoes (usuario_id, evento_id)")
+            # Fila de espera dos eventos lotados; a ordem de chegada é a ordem do id
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ListaEspera (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    evento_id INTEGER NOT NULL REFERENCES Eventos (id) ON DELETE CASCADE,
+                    usuario_id INTEGER NOT NULL REFERENCES Usuarios (id) ON DELETE CASCADE,
+                    UNIQUE (evento_id, usuario_id)
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_lista_espera_evento ON ListaEspera (evento_id, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_data_hora ON Eventos (data_hora)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_categoria ON Eventos (categoria)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_cep ON Eventos (cep)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_cep ON Usuarios (cep)")
+
+            if versao == 1:
+                self.migrar_dados_v1(cursor)
+
+            self.busca_textual = self.criar_indice_busca(cursor)
+            self.indice_espacial = self.criar_indice_espacial(cursor)
+            # Agregados do painel (ver analises.py); bancos que já tinham participações são contados uma vez
+            if analises.criar_tabelas(cursor):
+                analises.reconstruir(cursor)
+            # Diário de alterações (ver diario.py); o estado que já existia entra como o primeiro instantâneo
+            if diario.criar_tabelas(cursor):
+                diario.gravar_instantaneo(cursor, *diario.estado_atual(cursor))
+
+            cursor.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+            self.conexao.commit()
+        except Exception:
+            self.conexao.rollback()
+            raise
+
+    def criar_indice_busca(self, cursor):
+        # Índice FTS5 sobre nome, descrição, categoria e endereço dos eventos, sem acentos e com prefixos de 2 e 3 letras
+        # É uma tabela de conteúdo externo (não duplica o texto) mantida em dia por triggers
+        # Retorna False se o SQLite não tiver FTS5; nesse caso a busca usa LIKE
+        criar = not self.tabela_existe('EventosBusca')
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS EventosBusca USING fts5 (
+                    nome, descricao, categoria, endereco,
+                    content = 'Eventos', content_rowid = 'id',
+                    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+                )
+            """)
+        except sqlite3.OperationalError:
+            return False
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT,
-                idade INTEGER,
-                sexo TEXT,
-                telefone TEXT,
-                endereco TEXT,
-                cep TEXT
-            )
+            CREATE TRIGGER IF NOT EXISTS eventos_busca_inserir AFTER INSERT ON Eventos BEGIN
+                INSERT INTO EventosBusca (rowid, nome, descricao, categoria, endereco)
+                VALUES (new.id, new.nome, new.descricao, new.categoria, new.endereco);
+            END
         """)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Eventos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT,
-                endereco TEXT,
-                cep TEXT,
-                preco REAL,
-                categoria TEXT,
-                data DATE,
-                hora TEXT,
-                descricao TEXT
-            )
+            CREATE TRIGGER IF NOT EXISTS eventos_busca_apagar AFTER DELETE ON Eventos BEGIN
+                INSERT INTO EventosBusca (EventosBusca, rowid, nome, descricao, categoria, endereco)
+                VALUES ('delete', old.id, old.nome, old.descricao, old.categoria, old.endereco);
+            END
         """)
+        # Só reindexa quando uma coluna de texto muda (não a cada alteração de preço ou data)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Participacoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                evento_nome TEXT,
-                participante TEXT,
-                FOREIGN KEY (evento_nome) REFERENCES Eventos (nome)
-            )
+            CREATE TRIGGER IF NOT EXISTS eventos_busca_atualizar
+            AFTER UPDATE OF nome, descricao, categoria, endereco ON Eventos BEGIN
+                INSERT INTO EventosBusca (EventosBusca, rowid, nome, descricao, categoria, endereco)
+                VALUES ('delete', old.id, old.nome, old.descricao, old.categoria, old.endereco);
+                INSERT INTO EventosBusca (rowid, nome, descricao, categoria, endereco)
+                VALUES (new.id, new.nome, new.descricao, new.categoria, new.endereco);
+            END
         """)
-        self.conexao.commit()
+        if criar:
+            # Bancos que já tinham eventos: indexa o conteúdo existente uma vez
+            cursor.execute("INSERT INTO EventosBusca (EventosBusca) VALUES ('rebuild')")
+        return True
 
-    def carregar_dados(self):
-        # Carrega os dados do banco de dados
-        cursor = self.conexao.cursor()
-        cursor.execute("SELECT * FROM Usuarios")
-        usuarios = cursor.fetchall()
-        usuarios = [Usuario(*usuario[1:]) for usuario in usuarios]
-
-        cursor.execute("SELECT * FROM Eventos")
-        eventos = cursor.fetchall()
-        eventos = [
-            EventoConcreto(*evento[1:9]) for evento in eventos
-        ]
-
-        cursor.execute("SELECT * FROM Participacoes")
-        participacoes = cursor.fetchall()
-        finalParticipacoes = []
-        for participacao in participacoes:
-            finalParticipacoes.append(Participacoes(participacao[0], participacao[1], participacao[2]))
-        
-        participacoes = finalParticipacoes
+    def criar_indice_espacial(self, cursor):
+        # Tabela local CEP -> latitude/longitude (carregada de um arquivo, ver ImportadorExportador) e um índice R*Tree
+        # com a posição de cada evento cujo CEP está nessa tabela, mantido por triggers
+        # Retorna False se o SQLite não tiver R*Tree; nesse caso a busca percorre a junção Eventos x Ceps
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Ceps (
+                cep TEXT PRIMARY KEY,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        criar = not self.tabela_existe('EventosLocal')
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS EventosLocal USING rtree (
+                    id, latitude_min, latitude_max, longitude_min, longitude_max
+                )
+            """)
+        except sqlite3.OperationalError:
+            return False
+        cep_evento = CEP_NORMALIZADO_SQL.format(coluna='new.cep')
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS eventos_local_inserir AFTER INSERT ON Eventos BEGIN
+                INSERT INTO EventosLocal
+                SELECT new.id, latitude, latitude, longitude, longitude FROM Ceps WHERE cep = {cep_evento};
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS eventos_local_atualizar AFTER UPDATE OF cep ON Eventos BEGIN
+                DELETE FROM EventosLocal WHERE id = old.id;
+                INSERT INTO EventosLocal
+                SELECT new.id, latitude, latitude, longitude, longitude FROM Ceps WHERE cep = {cep_evento};
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS eventos_local_apagar AFTER DELETE ON Eventos BEGIN
+                DELETE FROM EventosLocal WHERE id = old.id;
+            END
+        """)
+        if criar:
+            self.reconstruir_indice_espacial(cursor)
+        return True
 
-        if not usuarios and not eventos:
-            print("Não há usuários ou eventos registrados no sistema.")
-        
-        return {'usuarios': usuarios, 'eventos': eventos, 'participacoes': participacoes }
+    def reconstruir_indice_espacial(self, cursor=None):
+        # Reposiciona todos os eventos; usado depois de carregar (ou trocar) a tabela de CEPs
+        cursor = cursor or self.conexao.cursor()
+        cursor.execute("DELETE FROM EventosLocal")
+        cursor.execute(f"""
+            INSERT INTO EventosLocal
+            SELECT e.id, c.latitude, c.latitude, c.longitude, c.longitude
+            FROM Eventos e JOIN Ceps c ON c.cep = {CEP_NORMALIZADO_SQL.format(coluna='e.cep')}
+        """)
+
+    def copiar_backup(self, nome_arquivo):
+        # Copia o banco antes de uma migração, para que ela possa ser desfeita manualmente
+        if self.nome_banco == ':memory:':
+            return
+        destino = sqlite3.connect(nome_arquivo)
+        try:
+            self.conexao.backup(destino)
+        finally:
+            destino.close()
+
+    def migrar_dados_v1(self, cursor):
+        # Copia os dados das tabelas da versão 1 (ligadas por nome) para a versão atual (ligadas por id)
+        # Nomes repetidos são unificados no primeiro registro, pois agora são únicos
+        cursor.execute("""
+            INSERT INTO Usuarios (id, nome, idade, sexo, telefone, endereco, cep)
+            SELECT id, nome, idade, sexo, telefone, endereco, cep FROM Usuarios_v1
+            WHERE id IN (SELECT MIN(id) FROM Usuarios_v1 WHERE nome IS NOT NULL GROUP BY nome)
+        """)
+
+        eventos = []
+        nomes_vistos = set()
+        for id, nome, endereco, cep, preco, categoria, data, hora, descricao in cursor.execute("""
+            SELECT id, nome, endereco, cep, preco, categoria, data, hora, descricao
+            FROM Eventos_v1 ORDER BY id
+        """).fetchall():
+            if nome is None or nome.strip() in nomes_vistos:
+                continue
+            try:
+                data = converter_data(data)
+            except (TypeError, ValueError):
+                print(f"Evento {nome} ignorado na migração: data inválida ({data}).")
+                continue
+            nomes_vistos.add(nome.strip())
+            eventos.append((id, nome, endereco, cep, preco, categoria, data.strftime('%Y-%m-%d'),
+                            hora, descricao, calcular_data_hora(data, hora)))
+        cursor.executemany("""
+            INSERT INTO Eventos (id, nome, endereco, cep, preco, categoria, data, hora, descricao, data_hora)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, eventos)
+
+        ids_eventos = {nome.strip(): id for id, nome in cursor.execute("SELECT id, nome FROM Eventos").fetchall()}
+        ids_usuarios = dict(cursor.execute("SELECT nome, id FROM Usuarios").fetchall())
+        participacoes = []
+        for evento_nome, participante in cursor.execute(
+                "SELECT evento_nome, participante FROM Participacoes_v1 ORDER BY id").fetchall():
+            evento_nome = (evento_nome or '').strip()
+            participante = participante or ''
+            # Versões antigas gravavam o usuário em evento_nome e o evento em participante
+            if evento_nome not in ids_eventos and participante.strip() in ids_eventos:
+                evento_nome, participante = participante.strip(), evento_nome
+            if evento_nome in ids_eventos and participante in ids_usuarios:
+                participacoes.append((ids_eventos[evento_nome], ids_usuarios[participante]))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)
+        """, participacoes)
+
+        for tabela in ('Participacoes_v1', 'Eventos_v1', 'Usuarios_v1'):
+            cursor.execute(f"DROP TABLE {tabela}")
 
-# Método para salvar dados no banco de dados
+    def carregar_dados(self, com_participacoes=True):
+        # Carrega os dados do banco de dados usando uma conexão de leitura
+        # com_participacoes=False pula a criação de um objeto Participacoes por linha (ver iterar_pares_participacao)
+        with self.leitura() as conexao:
+            cursor = conexao.cursor()
+            cursor.execute("SELECT id, nome, idade, sexo, telefone, endereco, cep FROM Usuarios ORDER BY id")
+            usuarios = cursor.fetchall()
+            usuarios = [Usuario(*usuario[1:], id=usuario[0]) for usuario in usuarios]
+
+            cursor.execute(f"SELECT {COLUNAS_EVENTO} FROM Eventos ORDER BY id")
+            eventos = cursor.fetchall()
+            eventos = [evento_da_linha(evento) for evento in eventos]
+
+            participacoes = []
+            if com_participacoes:
+                cursor.execute("""
+                    SELECT p.id, e.nome, u.nome
+                    FROM Participacoes p
+                    JOIN Eventos e ON e.id = p.evento_id
+                    JOIN Usuarios u ON u.id = p.usuario_id
+                    ORDER BY p.id
+                """)
+                participacoes = [Participacoes(*participacao) for participacao in cursor.fetchall()]
+
+            return {'usuarios': usuarios, 'eventos': eventos, 'participacoes': participacoes }
+
+    def iterar_pares_participacao(self):
+        # Percorre as participações como pares (evento_id, usuario_id), em lotes, sem montar objetos
+        with self.leitura() as conexao:
+            cursor = conexao.execute("SELECT evento_id, usuario_id FROM Participacoes ORDER BY id")
+            while True:
+                linhas = cursor.fetchmany(TAMANHO_LOTE)
+                if not linhas:
+                    break
+                yield from linhas
+
+# Método para salvar dados no banco de dados (mantido por compatibilidade; usa as operações de gravação abaixo)
     def salvar_dados(self, dados, usuario, evento, usuario_participacao, evento_participacao, participacoes):
-        cursor = self.conexao.cursor()
-       
-        if(usuario != None):
-            cursor.execute("""
-            INSERT INTO Usuarios (nome, idade, sexo, telefone, endereco, cep)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (usuario.nome, usuario.idade, usuario.sexo, usuario.telefone, usuario.endereco, usuario.cep))
-       
-        if(evento != None):
-            cursor.execute("""
-            INSERT INTO Eventos (nome, endereco, cep, preco, categoria, data, hora, descricao)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (evento.nome, evento.endereco, evento.cep, evento.preco, evento.categoria, evento.data.strftime('%d/%m/%Y'), evento.hora, evento.descricao))
+        with self.unidade_de_trabalho():
+            if(usuario != None):
+                self.salvar_usuario(usuario)
 
-        if(evento_participacao != None and usuario_participacao != None):  
-            cursor.execute("""
-            INSERT INTO Participacoes (evento_nome, participante)
-            VALUES (?, ?)
-        """, (evento_participacao.nome, usuario_participacao.nome))
-            
+            if(evento != None):
+                self.salvar_evento(evento)
 
-        if(participacoes != None):
-            cursor.execute("DELETE FROM Participacoes")
-            for participacao in participacoes:
-                            cursor.execute("""
-                INSERT INTO Participacoes (evento_nome, participante)
-                VALUES (?, ?)
-            """, (participacao.participante, participacao.evento_nome))
+            if(evento_participacao != None and usuario_participacao != None):
+                self.adicionar_participacao(evento_participacao, usuario_participacao)
 
-        self.conexao.commit()
+            if(participacoes != None):
+                self.sincronizar_participacoes(participacoes)
+
+    @contextmanager
+    def unidade_de_trabalho(self):
+        # Agrupa gravações em uma única transação, confirmada uma só vez ao sair do bloco mais externo
+        # Blocos aninhados viram SAVEPOINTs, que podem ser desfeitos sem perder o restante da transação
+        # A trava da conexão de escrita fica com a thread até o fim do bloco
+        with self.conexoes.trava_escrita:
+            nivel = self.nivel_transacao + 1
+            ponto = f"unidade_{nivel}"
+            if nivel == 1:
+                self.mudancas_inicio = self.conexao.total_changes
+                self.mudancas_no_cache = 0
+                if not self.conexao.in_transaction:
+                    # IMMEDIATE reserva a escrita já no início: leituras feitas dentro da unidade (ex.: vagas restantes)
+                    # não podem ser invalidadas por outro processo antes do COMMIT
+                    self.conexao.execute("BEGIN IMMEDIATE")
+            else:
+                self.conexao.execute(f"SAVEPOINT {ponto}")
+            # Só depois do BEGIN/SAVEPOINT: se ele falhar (ex.: "database is locked"), nada fica marcado como aberto
+            self.nivel_transacao = nivel
+            self.thread_transacao = threading.get_ident()
+            try:
+                yield self
+            except BaseException:
+                self.nivel_transacao -= 1
+                if self.nivel_transacao == 0:
+                    self.thread_transacao = None
+                    self.conexao.rollback()
+                    # O cache pode ter recebido mudanças que não foram gravadas
+                    self.cache.invalidar()
+                else:
+                    self.conexao.execute(f"ROLLBACK TO {ponto}")
+                    self.conexao.execute(f"RELEASE {ponto}")
+                raise
+            else:
+                self.nivel_transacao -= 1
+                if self.nivel_transacao == 0:
+                    self.thread_transacao = None
+                    try:
+                        self.conexao.commit()
+                    except BaseException:
+                        self.conexao.rollback()
+                        self.cache.invalidar()
+                        raise
+                    # Gravações que não passaram pelo cache (nem por gravacao_no_cache) o deixam desatualizado;
+                    # data_version não muda com gravações da própria conexão, então ele é relido na próxima consulta
+                    if self.conexao.total_changes - self.mudancas_inicio > self.mudancas_no_cache:
+                        self.cache.invalidar()
+                else:
+                    self.conexao.execute(f"RELEASE {ponto}")
+
+    @contextmanager
+    def gravacao_no_cache(self):
+        # Unidade de trabalho cujas gravações o chamador já aplica ao cache (ou que só mexem em tabelas fora dele)
+        with self.unidade_de_trabalho():
+            inicio = self.conexao.total_changes
+            try:
+                yield self
+            finally:
+                self.mudancas_no_cache += self.conexao.total_changes - inicio
+
+    def salvar_usuario(self, usuario):
+        # Insere o usuário ou atualiza o cadastro existente com o mesmo nome
+        with self.unidade_de_trabalho():
+            cursor = self.conexao.execute("""
+                INSERT INTO Usuarios (nome, idade, sexo, telefone, endereco, cep)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (nome) DO UPDATE SET
+                    idade = excluded.idade, sexo = excluded.sexo, telefone = excluded.telefone,
+                    endereco = excluded.endereco, cep = excluded.cep
+                RETURNING id
+            """, (usuario.nome, usuario.idade, usuario.sexo, usuario.telefone, usuario.endereco, usuario.cep))
+            usuario.id = cursor.fetchone()[0]
+        return usuario.id
+
+    def salvar_evento(self, evento):
+        # Insere o evento ou atualiza o evento existente com o mesmo nome
+        with self.unidade_de_trabalho():
+            cursor = self.conexao.execute("""
+                INSERT INTO Eventos (nome, endereco, cep, preco, categoria, data, hora, descricao, data_hora, capacidade)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (nome) DO UPDATE SET
+                    endereco = excluded.endereco, cep = excluded.cep, preco = excluded.preco,
+                    categoria = excluded.categoria, data = excluded.data, hora = excluded.hora,
+                    descricao = excluded.descricao, data_hora = excluded.data_hora, capacidade = excluded.capacidade
+                RETURNING id
+            """, (evento.nome, evento.endereco, evento.cep, evento.preco, evento.categoria, evento.data.strftime('%Y-%m-%d'),
+                  evento.hora, evento.descricao, int(evento.data_hora.timestamp()), evento.capacidade))
+            evento.id = cursor.fetchone()[0]
+        return evento.id
+
+    def adicionar_participacao(self, evento, usuario):
+        # Insere uma participação; retorna False se ela já existia
+        with self.unidade_de_trabalho():
+            cursor = self.conexao.execute("""
+                INSERT OR IGNORE INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)
+            """, (evento.id, usuario.id))
+        return cursor.rowcount == 1
+
+    def remover_participacao(self, evento, usuario):
+        # Apaga uma participação (ou o lugar na lista de espera); retorna False se não havia nenhum dos dois
+        return self.cancelar_reserva(evento, usuario)[0]
+
+    def vagas_restantes(self, evento_id):
+        # Vagas livres no evento (None = sem limite); o total de inscritos vem do agregado mantido por trigger
+        linha = self.conexao.execute("""
+            SELECT e.capacidade, coalesce(s.inscritos, 0)
+            FROM Eventos e LEFT JOIN EstatisticasEvento s ON s.evento_id = e.id
+            WHERE e.id = ?
+        """, (evento_id,)).fetchone()
+        if linha is None:
+            raise LookupError(f"Evento {evento_id} não encontrado.")
+        capacidade, inscritos = linha
+        return None if capacidade is None else max(capacidade - inscritos, 0)
+
+    def reservar_vaga(self, evento, usuario):
+        # Inscreve o usuário se houver vaga ou o coloca no fim da lista de espera
+        # Retorna (SituacaoReserva, ids dos usuários promovidos da fila antes da reserva)
+        # A verificação e a gravação acontecem na mesma transação BEGIN IMMEDIATE, que bloqueia outros escritores
+        # (threads e processos) até o COMMIT, então duas reservas simultâneas nunca veem a mesma vaga livre
+        with self.unidade_de_trabalho():
+            if self.conexao.execute("""
+                SELECT 1 FROM Participacoes WHERE evento_id = ? AND usuario_id = ?
+            """, (evento.id, usuario.id)).fetchone():
+                return SituacaoReserva.JA_INSCRITO, []
+            # Quem já está na fila tem prioridade sobre quem chega agora (vagas abertas por aumento de capacidade)
+            promovidos = self.promover_lista_espera(evento.id)
+            if usuario.id in promovidos:
+                return SituacaoReserva.INSCRITO, promovidos
+            if self.conexao.execute("""
+                SELECT 1 FROM ListaEspera WHERE evento_id = ? AND usuario_id = ?
+            """, (evento.id, usuario.id)).fetchone():
+                return SituacaoReserva.JA_NA_LISTA, promovidos
+            vagas = self.vagas_restantes(evento.id)
+            if vagas is None or vagas > 0:
+                self.conexao.execute("""
+                    INSERT INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)
+                """, (evento.id, usuario.id))
+                return SituacaoReserva.INSCRITO, promovidos
+            self.conexao.execute("""
+                INSERT INTO ListaEspera (evento_id, usuario_id) VALUES (?, ?)
+            """, (evento.id, usuario.id))
+            return SituacaoReserva.LISTA_DE_ESPERA, promovidos
+
+    def cancelar_reserva(self, evento, usuario):
+        # Cancela a participação ou o lugar na fila e promove, por ordem de chegada, quem estiver esperando
+        # Retorna (removido, ids dos usuários promovidos)
+        with self.unidade_de_trabalho():
+            cursor = self.conexao.execute("""
+                DELETE FROM Participacoes WHERE evento_id = ? AND usuario_id = ?
+            """, (evento.id, usuario.id))
+            if cursor.rowcount == 1:
+                return True, self.promover_lista_espera(evento.id)
+            cursor = self.conexao.execute("""
+                DELETE FROM ListaEspera WHERE evento_id = ? AND usuario_id = ?
+            """, (evento.id, usuario.id))
+            return cursor.rowcount == 1, []
+
+    def promover_lista_espera(self, evento_id):
+        # Move os primeiros da fila para as vagas livres; retorna os ids dos usuários inscritos
+        with self.unidade_de_trabalho():
+            vagas = self.vagas_restantes(evento_id)
+            if vagas == 0:
+                return []
+            promovidos = self.conexao.execute("""
+                SELECT id, usuario_id FROM ListaEspera WHERE evento_id = ? ORDER BY id LIMIT ?
+            """, (evento_id, -1 if vagas is None else vagas)).fetchall()
+            if not promovidos:
+                return []
+            self.conexao.executemany("""
+                INSERT OR IGNORE INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)
+            """, ((evento_id, usuario_id) for _, usuario_id in promovidos))
+            self.conexao.executemany("DELETE FROM ListaEspera WHERE id = ?", ((id,) for id, _ in promovidos))
+        return [usuario_id for _, usuario_id in promovidos]
+
+    def buscar_lista_espera(self, evento):
+        # Nomes na lista de espera do evento, na ordem em que serão promovidos
+        with self.leitura() as conexao:
+            cursor = conexao.execute("""
+                SELECT u.nome FROM ListaEspera l
+                JOIN Usuarios u ON u.id = l.usuario_id
+                WHERE l.evento_id = ?
+                ORDER BY l.id
+            """, (evento.id,))
+            return [nome for (nome,) in cursor.fetchall()]
+
+    def sincronizar_participacoes(self, participacoes):
+        # Deixa a tabela igual à lista recebida, inserindo e apagando apenas as linhas que mudaram
+        # A diferença é calculada aqui: as gravações usam o índice (evento_id, usuario_id), sem varrer a tabela
+        with self.unidade_de_trabalho():
+            self.conexao.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS ParticipacoesDesejadas (evento_nome TEXT, participante TEXT)
+            """)
+            self.conexao.execute("DELETE FROM ParticipacoesDesejadas")
+            self.conexao.executemany("""
+                INSERT INTO ParticipacoesDesejadas (evento_nome, participante) VALUES (?, ?)
+            """, ((participacao.evento_nome, participacao.participante) for participacao in participacoes))
+            # Pares (evento_id, usuario_id) na ordem da lista recebida, que define a ordem das novas inserções
+            desejadas = dict.fromkeys(self.conexao.execute("""
+                SELECT e.id, u.id FROM ParticipacoesDesejadas d
+                JOIN Eventos e ON e.nome = d.evento_nome
+                JOIN Usuarios u ON u.nome = d.participante
+                ORDER BY d.rowid
+            """))
+            self.conexao.execute("DELETE FROM ParticipacoesDesejadas")
+            atuais = set(self.conexao.execute("SELECT evento_id, usuario_id FROM Participacoes"))
+            self.conexao.executemany("""
+                DELETE FROM Participacoes WHERE evento_id = ? AND usuario_id = ?
+            """, [par for par in atuais if par not in desejadas])
+            self.conexao.executemany("""
+                INSERT INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)
+            """, [par for par in desejadas if par not in atuais])
+
+# Métodos para buscar um usuário ou evento pelo nome direto no banco (usados enquanto o cache não foi carregado)
+    def buscar_usuario(self, nome_usuario):
+        # Usa o índice da restrição UNIQUE em Usuarios.nome; retorna None se não existir
+        with self.leitura() as conexao:
+            linha = conexao.execute("""
+                SELECT id, nome, idade, sexo, telefone, endereco, cep FROM Usuarios WHERE nome = ?
+            """, (nome_usuario,)).fetchone()
+        return Usuario(*linha[1:], id=linha[0]) if linha else None
+
+    def buscar_evento(self, nome_evento):
+        # Usa o índice da restrição UNIQUE em Eventos.nome; retorna None se não existir
+        with self.leitura() as conexao:
+            linha = conexao.execute(f"SELECT {COLUNAS_EVENTO} FROM Eventos WHERE nome = ?",
+                                    (nome_evento.strip(),)).fetchone()
+        return evento_da_linha(linha) if linha else None
+
+    def buscar_nomes_usuarios(self, ids_usuarios):
+        # Nomes dos usuários na ordem dos ids recebidos (ids que não existem são omitidos)
+        with self.leitura() as conexao:
+            nomes = dict(conexao.execute("""
+                SELECT u.id, u.nome FROM json_each(?) j JOIN Usuarios u ON u.id = j.value
+            """, (json.dumps(list(ids_usuarios)),)).fetchall())
+        return [nomes[id] for id in ids_usuarios if id in nomes]
 
 # Método para buscar participantes
-    def buscar_participantes(self):
-        cursor = self.conexao.cursor()
-        cursor.execute("SELECT * FROM Participacoes")
-        cursor.fetchall()
-        self.conexao.commit()
+    def buscar_participantes(self, evento):
+        # Usa o índice (evento_id, usuario_id) da restrição UNIQUE
+        with self.leitura() as conexao:
+            cursor = conexao.execute("""
+                SELECT u.nome FROM Participacoes p
+                JOIN Usuarios u ON u.id = p.usuario_id
+                WHERE p.evento_id = ?
+                ORDER BY p.id
+            """, (evento.id,))
+            return [nome for (nome,) in cursor.fetchall()]
+
+    def participantes_dos_eventos(self, conexao, ids_eventos):
+        # Nomes dos participantes de vários eventos em uma só consulta: id do evento -> nomes, em ordem de inscrição
+        # Recebe a conexão de quem chama, para ser usada junto com um cursor que já ocupa uma conexão de leitura
+        participantes = {id: [] for id in ids_eventos}
+        cursor = conexao.execute("""
+            SELECT p.evento_id, u.nome FROM json_each(?) j
+            JOIN Participacoes p ON p.evento_id = j.value
+            JOIN Usuarios u ON u.id = p.usuario_id
+            ORDER BY p.id
+        """, (json.dumps(list(participantes)),))
+        for evento_id, nome in cursor:
+            participantes[evento_id].append(nome)
+        return participantes
+
+# Método para buscar os eventos de um usuário
+    def buscar_eventos_do_usuario(self, usuario):
+        # Usa o índice idx_participacoes_usuario
+        with self.leitura() as conexao:
+            cursor = conexao.execute("""
+                SELECT e.nome FROM Participacoes p
+                JOIN Eventos e ON e.id = p.evento_id
+                WHERE p.usuario_id = ?
+                ORDER BY p.id
+            """, (usuario.id,))
+            return [nome for (nome,) in cursor.fetchall()]
+
+# Método para buscar eventos por faixa de data/hora
+    def buscar_eventos_por_periodo(self, inicio=None, fim=None, limite=TAMANHO_PAGINA, deslocamento=0,
+                                   apos=None, decrescente=False, **filtros):
+        # inicio (inclusivo) e fim (exclusivo) são datetimes; a consulta percorre só o trecho do índice idx_eventos_data_hora
+        # apos=(data_hora, id) do último evento da página anterior permite paginar sem OFFSET
+        # filtros: categoria, cep_prefixo, preco_min, preco_max (ver filtros_eventos)
+        condicoes, parametros = filtros_eventos(**filtros)
+        if inicio is not None:
+            condicoes.append("data_hora >= ?")
+            parametros.append(int(inicio.timestamp()))
+        if fim is not None:
+            condicoes.append("data_hora < ?")
+            parametros.append(int(fim.timestamp()))
+        if apos is not None:
+            condicoes.append("(data_hora, id) < (?, ?)" if decrescente else "(data_hora, id) > (?, ?)")
+            parametros.extend(apos)
+        ordem = "DESC" if decrescente else "ASC"
+        consulta_sql = f"SELECT {COLUNAS_EVENTO} FROM Eventos"
+        if condicoes:
+            consulta_sql += " WHERE " + " AND ".join(condicoes)
+        consulta_sql += f" ORDER BY data_hora {ordem}, id {ordem}"
+        if limite is not None:
+            consulta_sql += " LIMIT ? OFFSET ?"
+            parametros.extend((limite, deslocamento))
+
+        with self.leitura() as conexao:
+            cursor = conexao.execute(consulta_sql, parametros)
+            return [evento_da_linha(evento) for evento in cursor.fetchall()]
+
+    def buscar_eventos_proximos(self, limite=TAMANHO_PAGINA, apos=None, agora=None, **filtros):
+        # Eventos que ainda vão começar (data_hora > agora), do mais próximo para o mais distante
+        agora = agora or datetime.now()
+        return self.buscar_eventos_por_periodo(inicio=depois_de(agora), limite=limite, apos=apos, **filtros)
+
+    def buscar_eventos_passados(self, limite=TAMANHO_PAGINA, apos=None, agora=None, **filtros):
+        # Eventos que já começaram (data_hora <= agora), do mais recente para o mais antigo
+        agora = agora or datetime.now()
+        return self.buscar_eventos_por_periodo(fim=depois_de(agora), limite=limite, apos=apos,
+                                               decrescente=True, **filtros)
+
+    def buscar_eventos_proximos_dias(self, dias=7, limite=TAMANHO_PAGINA, apos=None, agora=None, **filtros):
+        # Próximos eventos que começam antes de agora + dias
+        agora = agora or datetime.now()
+        return self.buscar_eventos_por_periodo(inicio=depois_de(agora), fim=agora + timedelta(days=dias), limite=limite,
+                                               apos=apos, **filtros)
+
+    def buscar_eventos_acontecendo(self, duracao_horas=DURACAO_EVENTO_HORAS, limite=TAMANHO_PAGINA, apos=None, agora=None,
+                                   **filtros):
+        # Eventos que já começaram, há no máximo duracao_horas
+        agora = agora or datetime.now()
+        return self.buscar_eventos_por_periodo(inicio=agora - timedelta(hours=duracao_horas), fim=depois_de(agora),
+                                               limite=limite, apos=apos, **filtros)
         
 # Método para apagar participação
-    def apagar_participacao(self, evento, usuario):
-        try:  
-            conn = sqlite3.connect('dados.db')
-            cursor = conn.cursor()
-            consulta_sql = f"DELETE FROM Participacoes WHERE evento_nome = ? AND participante = ?"
+    def buscar_eventos_texto(self, texto, limite=LIMITE_BUSCA, com_relevancia=False):
+        # Busca eventos por palavras (ou começo de palavras) no nome, descrição, categoria e endereço,
+        # ignorando acentos e maiúsculas; os mais relevantes (bm25, com o nome pesando mais) vêm primeiro
+        # com_relevancia=True devolve pares (relevância, evento), menor é melhor, para intercalar resultados de vários bancos
+        termos = termos_busca(texto)
+        if not termos:
+            return []
+        self.preparar()
+        if not self.busca_textual:
+            eventos = self.buscar_eventos_like(texto, limite)
+            return [(0.0, evento) for evento in eventos] if com_relevancia else eventos
+        # O ranking e o LIMIT ficam na subconsulta, para a junção com Eventos ler só as linhas devolvidas
+        with self.leitura() as conexao:
+            cursor = conexao.execute(f"""
+                SELECT e.id, e.nome, e.endereco, e.cep, e.preco, e.categoria, e.data, e.hora, e.descricao, e.capacidade,
+                       b.relevancia
+                FROM (
+                    SELECT rowid, bm25(EventosBusca, {", ".join(map(str, PESOS_BUSCA))}) AS relevancia
+                    FROM EventosBusca WHERE EventosBusca MATCH ?
+                    ORDER BY relevancia LIMIT ?
+                ) b
+                JOIN Eventos e ON e.id = b.rowid
+                ORDER BY b.relevancia
+            """, (termos, limite))
+            if com_relevancia:
+                return [(linha[-1], evento_da_linha(linha)) for linha in cursor.fetchall()]
+            return [evento_da_linha(linha) for linha in cursor.fetchall()]
+
+    def buscar_eventos_like(self, texto, limite=LIMITE_BUSCA):
+        # Alternativa sem FTS5: cada palavra precisa aparecer em alguma das colunas (sem ranking e sem ignorar acentos)
+        condicoes = []
+        parametros = []
+        for palavra in re.findall(r"\w+", texto):
+            condicoes.append("(nome LIKE ? OR descricao LIKE ? OR categoria LIKE ? OR endereco LIKE ?)")
+            parametros.extend([f"%{palavra}%"] * 4)
+        with self.leitura() as conexao:
+            cursor = conexao.execute(f"""
+                SELECT {COLUNAS_EVENTO} FROM Eventos
+                WHERE {" AND ".join(condicoes)} ORDER BY data_hora LIMIT ?
+            """, parametros + [limite])
+            return [evento_da_linha(evento) for evento in cursor.fetchall()]
+
+    def buscar_coordenadas(self, cep):
+        # Latitude e longitude do CEP na tabela local, ou None se ele não estiver lá
+        with self.leitura() as conexao:
+            return conexao.execute("SELECT latitude, longitude FROM Ceps WHERE cep = ?", (normalizar_cep(cep),)).fetchone()
+
+    def buscar_eventos_no_retangulo(self, retangulo, inicio):
+        # Eventos (com a posição) dentro do retângulo que começam a partir de inicio
+        latitude_min, latitude_max, longitude_min, longitude_max = retangulo
+        colunas = ", ".join("e." + coluna for coluna in COLUNAS_EVENTO.split(", "))
+        self.preparar()
+        if self.indice_espacial:
+            consulta_sql = f"""
+                SELECT {colunas}, l.latitude_min, l.longitude_min
+                FROM EventosLocal l JOIN Eventos e ON e.id = l.id
+                WHERE l.latitude_min >= ? AND l.latitude_max <= ? AND l.longitude_min >= ? AND l.longitude_max <= ?
+                  AND e.data_hora >= ?
+            """
+        else:
+            consulta_sql = f"""
+                SELECT {colunas}, c.latitude, c.longitude
+                FROM Eventos e JOIN Ceps c ON c.cep = {CEP_NORMALIZADO_SQL.format(coluna='e.cep')}
+                WHERE c.latitude BETWEEN ? AND ? AND c.longitude BETWEEN ? AND ? AND e.data_hora >= ?
+            """
+        with self.leitura() as conexao:
+            return conexao.execute(consulta_sql, (latitude_min, latitude_max, longitude_min, longitude_max,
+                                                  int(inicio.timestamp()))).fetchall()
+
+    def buscar_eventos_perto(self, cep, raio_km=RAIO_PADRAO_KM, limite=LIMITE_BUSCA, agora=None):
+        # Próximos eventos a até raio_km do CEP, do mais perto para o mais longe: lista de (distância em km, evento)
+        # A busca começa com um raio pequeno e cresce até achar limite eventos ou chegar a raio_km, então perguntar
+        # pelos mais próximos em uma cidade grande não obriga a medir a distância até todos os eventos da região
+        coordenadas = self.buscar_coordenadas(cep)
+        if coordenadas is None:
+            raise LookupError(f"CEP {cep} não encontrado na tabela de CEPs.")
+        latitude, longitude = coordenadas
+        agora = agora or datetime.now()
+        raio_atual = min(RAIO_INICIAL_KM, raio_km)
+        while True:
+            encontrados = []
+            for linha in self.buscar_eventos_no_retangulo(retangulo_km(latitude, longitude, raio_atual), depois_de(agora)):
+                distancia = distancia_km(latitude, longitude, linha[-2], linha[-1])
+                if distancia <= raio_atual:
+                    encontrados.append((distancia, linha))
+            if len(encontrados) >= limite or raio_atual >= raio_km:
+                break
+            raio_atual = min(raio_atual * 4, raio_km)
+        encontrados.sort(key=lambda item: (item[0], item[1][0]))
+        return [(distancia, evento_da_linha(linha)) for distancia, linha in encontrados[:limite]]
+
+    def contar_usuarios(self):
+        with self.leitura() as conexao:
+            return conexao.execute("SELECT COUNT(*) FROM Usuarios").fetchone()[0]
+
+    def contar_eventos(self):
+        with self.leitura() as conexao:
+            return conexao.execute("SELECT COUNT(*) FROM Eventos").fetchone()[0]
+
+    def iterar_usuarios(self, ordenar_por='id', decrescente=False, cep_prefixo=None, tamanho_lote=TAMANHO_LOTE):
+        # Percorre os usuários direto do cursor, tamanho_lote linhas por vez, sem montar a lista inteira
+        consulta_sql = "SELECT id, nome, idade, sexo, telefone, endereco, cep FROM Usuarios"
+        parametros = []
+        if cep_prefixo:
+            condicao, parametros = filtro_prefixo("cep", cep_prefixo)
+            consulta_sql += " WHERE " + condicao
+        consulta_sql += ordenacao(ORDENACOES_USUARIOS, ordenar_por, decrescente)
+        with self.leitura() as conexao:
+            cursor = conexao.execute(consulta_sql, parametros)
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                for linha in linhas:
+                    yield Usuario(*linha[1:], id=linha[0])
 
-            cursor.execute(consulta_sql, (evento.nome, usuario.nome))
+    def iterar_eventos(self, ordenar_por='data', decrescente=False, categoria=None, cep_prefixo=None,
+                       preco_min=None, preco_max=None, tamanho_lote=TAMANHO_LOTE, com_participantes=False):
+        # Percorre os eventos filtrados direto do cursor, tamanho_lote linhas por vez
+        # com_participantes=True entrega pares (evento, nomes dos participantes), lidos por lote na mesma conexão:
+        # pedir outra conexão com o cursor aberto esgotaria o conjunto de leitores e travaria
+        condicoes, parametros = filtros_eventos(categoria, cep_prefixo, preco_min, preco_max)
+        consulta_sql = f"SELECT {COLUNAS_EVENTO} FROM Eventos"
+        if condicoes:
+            consulta_sql += " WHERE " + " AND ".join(condicoes)
+        consulta_sql += ordenacao(ORDENACOES_EVENTOS, ordenar_por, decrescente)
+        with self.leitura() as conexao:
+            cursor = conexao.execute(consulta_sql, parametros)
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                if not com_participantes:
+                    for linha in linhas:
+                        yield evento_da_linha(linha)
+                    continue
+                participantes = self.participantes_dos_eventos(conexao, [linha[0] for linha in linhas])
+                for linha in linhas:
+                    yield evento_da_linha(linha), participantes[linha[0]]
 
-            conn.commit()
+    def apagar_participacao(self, evento, usuario):
+        # Usa a conexão de escrita compartilhada, em vez de reabrir o arquivo a cada chamada
+        try:
+            self.remover_participacao(evento, usuario)
             print("Registro excluído com sucesso.")
         except sqlite3.Error as e:
             print("Erro durante a exclusão:", e)
 
-        finally:
-            conn.close()
+# Método para cancelar participação
+    def cancelar_participacao(self, evento, usuario):
+        # Retorna False se o usuário não estava inscrito no evento
+        return self.remover_participacao(evento, usuario)
 
 # Classe para gerenciar usuários
 class GerenciadorUsuarios:
     def __init__(self, manipulador_dados):
         # Inicializa a classe GerenciadorUsuarios com um manipulador de dados fornecido
         self.manipulador_dados = manipulador_dados
-        self.usuarios = []
-        self.carregar_usuarios()
+        # O banco só é lido quando um comando precisa do registro em memória
+        self.cache = manipulador_dados.cache
+
+    @property
+    def registro(self):
+        # Registro do cache compartilhado, que só lê o banco na primeira vez ou quando ele muda
+        return self.cache.obter_registro()
+
+    @property
+    def usuarios(self):
+        return self.registro.usuarios
 
     def carregar_usuarios(self):
-        # Carrega os dados de usuários usando o manipulador de dados
-        dados = self.manipulador_dados.carregar_dados()
-        if 'usuarios' in dados:
-            # Se houver usuários, atualiza a lista de usuários com esses dados
-            self.usuarios = dados['usuarios']
+        # Carrega o cache antecipadamente (ex.: antes de um servidor começar a atender)
+        self.cache.obter_registro()
+
+    def buscar_usuario(self, nome_usuario):
+        # Busca o usuário pelo nome no índice do registro (ou no banco, se o registro ainda não foi carregado)
+        return self.cache.buscar_usuario(nome_usuario)
 
     def salvar_usuarios(self, usuario):
-        # Cria um dicionário com informações de usuários e uma lista vazia para eventos
-        dados = {'usuarios': self.usuarios, 'eventos': []}
-        self.manipulador_dados.salvar_dados(dados, usuario, None, None, None, None)
+        # Grava o usuário no banco e no cache compartilhado
+        self.cache.salvar_usuario(usuario)
         # Exibe uma mensagem de confirmação após salvar os usuários
         print("Usuários salvos com sucesso.")
 
+    def registrar_usuario(self, nome, idade, sexo, telefone, endereco, cep):
+        # Cadastra um usuário sem interação; lança ValueError se a idade for inválida ou o nome já existir
+        try:
+            usuario = Usuario(nome, idade, sexo, telefone, endereco, cep)
+        except (TypeError, ValueError):
+            raise ValueError(f"Idade inválida: {idade}.")
+        with self.cache.trava_escrita:
+            # Os nomes são únicos no banco; a verificação usa o índice do registro ou o do banco
+            if self.buscar_usuario(usuario.nome):
+                raise ValueError(f"Já existe um usuário com o nome {usuario.nome}.")
+            self.cache.salvar_usuario(usuario)
+        return usuario
+
     def cadastrar_usuario(self):
         # Método para cadastrar um novo usuário
         print("\n=== Cadastrar Novo Usuário ===")
-        usuario = Usuario(input("Nome: "),
-                     input("Idade: "),
-                     input("Sexo (M/F): "),
-                     input("Telefone: "),
-                     input("Endereço: "),
-                     input("CEP: "))
-        self.usuarios.append(usuario)
-        self.salvar_usuarios(usuario)
+        try:
+            self.registrar_usuario(input("Nome: "),
+                                   input("Idade: "),
+                                   input("Sexo (M/F): "),
+                                   input("Telefone: "),
+                                   input("Endereço: "),
+                                   input("CEP: "))
+        except ValueError as e:
+            print(e)
+            return
+        print("Usuários salvos com sucesso.")
 
-    def listar_usuarios(self):
-        # Método para listar os usuários existentes
+    def listar_usuarios(self, ordenar_por='id', decrescente=False, cep_prefixo=None, limite=None,
+                        tamanho_pagina=TAMANHO_PAGINA):
+        # Método para listar os usuários existentes, lidos do banco aos poucos e escritos em blocos
         print("\n=== Lista de Usuários ===")
-        for usuario in self.usuarios:
-            print(usuario.__dict__)
+        usuarios = self.manipulador_dados.iterar_usuarios(ordenar_por, decrescente, cep_prefixo)
+        mensagem_vazia = "Nenhum usuário encontrado." if cep_prefixo else "Não há usuários registrados no sistema."
+        return imprimir_em_blocos((usuario.como_dict() for usuario in usuarios), mensagem_vazia=mensagem_vazia,
+                                  limite=limite, tamanho_bloco=tamanho_pagina)
+
+    def listar_usuarios_filtrados(self):
+        # Pede os filtros e a ordenação ao usuário antes de listar
+        cep_prefixo = input("Prefixo do CEP (vazio para todos): ").strip()
+        ordenar_por = input(f"Ordenar por ({'/'.join(ORDENACOES_USUARIOS)}) [id]: ").strip() or 'id'
+        try:
+            self.listar_usuarios(ordenar_por, cep_prefixo=cep_prefixo or None)
+        except ValueError as e:
+            print(e)
 
 # Classe para gerenciar eventos
 class GerenciadorEventos:
@@ -240,37 +1572,39 @@ class GerenciadorEventos:
         # Inicialização da classe com manipulador de dados e gerenciador de usuários
         self.manipulador_dados = manipulador_dados
         self.gerenciador_usuarios = gerenciador_usuarios
-        self.eventos = []
-        self.participacoes = []
-        self.carregar_eventos()
-        self.carregar_participacoes()
+        # O cache (e o registro indexado dentro dele) é o mesmo do gerenciador de usuários
+        self.cache = manipulador_dados.cache
+        self.painel = analises.PainelAnalises(manipulador_dados)
+
+    @property
+    def registro(self):
+        # Registro do cache compartilhado, carregado só no primeiro comando que precisa dele
+        return self.cache.obter_registro()
+
+    @property
+    def eventos(self):
+        return self.registro.eventos
 
     def carregar_eventos(self):
-        # Método para carregar os eventos existentes
-        dados = self.manipulador_dados.carregar_dados()
-        if 'eventos' in dados: # Verifica se existem eventos salvos
-            self.eventos = dados['eventos']
+        # Carrega o cache antecipadamente, sem esperar o primeiro comando
+        self.cache.obter_registro()
 
     def carregar_participacoes(self):
-        # Método para carregar participações existentes nos eventos
-        dados = self.manipulador_dados.carregar_dados()
-        if 'participacoes' in dados: # Verifica se existem participações salvas
-            self.participacoes = dados['participacoes']
+        # As participações já ficam no índice de adjacência do registro compartilhado
+        self.cache.obter_registro()
+
+    def buscar_evento(self, nome_evento):
+        # Busca o evento pelo nome no índice do registro (ou no banco, se o registro ainda não foi carregado)
+        return self.cache.buscar_evento(nome_evento)
 
     def salvar_eventos(self, evento):
-        # Método para salvar os eventos
-        dados = {'usuarios': [], 'eventos': self.eventos}
-        self.manipulador_dados.salvar_dados(dados, None, evento, None, None, None)
+        # Grava o evento no banco e no cache compartilhado
+        self.cache.salvar_evento(evento)
         print("Eventos salvos com sucesso.")
 
     def salvar_participacao_evento(self, evento, usuario):
-        # Método para salvar participação em um evento
-            dados = {'usuarios': [], 'eventos': [], 'participacoes': self.participacoes}
-            self.manipulador_dados.salvar_dados(dados, None, None, evento, usuario, None)
-
-    def cancelar_participacao(self, evento, usuario):
-         # Métodos para cancelar a participação de um usuário em um evento
-        self.manipulador_dados.cancelar_participacao(evento, usuario);
+        # Reserva a vaga no banco e no cache; retorna a SituacaoReserva
+        return self.cache.adicionar_participacao(evento, usuario)
 
     def cadastrar_evento(self):
         print("\n=== Cadastrar Novo Evento ===")
@@ -284,66 +1618,246 @@ class GerenciadorEventos:
             data = input("Data (dd/mm/aaaa): ")
             hora = input("Hora (hh:mm): ")
             descricao = input("Descrição: ")
+            capacidade = input("Capacidade (vazio para sem limite): ").strip() or None
 
             try:
                 datetime.strptime(data, "%d/%m/%Y")
+                datetime.strptime(hora, "%H:%M")
                 break
             except ValueError:
-                print("Por favor, insira a data no formato dd/mm/aaaa.")
+                print("Por favor, insira a data no formato dd/mm/aaaa e a hora no formato hh:mm.")
 
-        evento = EventoConcreto(nome_evento, endereco, cep, preco, categoria, data, hora, descricao)
-        self.eventos.append(evento)
-        self.salvar_eventos(evento)
+        try:
+            self.registrar_evento(nome_evento, endereco, cep, preco, categoria, data, hora, descricao, capacidade)
+        except ValueError as e:
+            print(e)
+            return
+        print("Eventos salvos com sucesso.")
+
+    def registrar_evento(self, nome_evento, endereco, cep, preco, categoria, data, hora, descricao, capacidade=None):
+        # Cadastra um evento sem interação; lança ValueError se algum dado for inválido ou o nome já existir
+        try:
+            datetime.strptime(data, "%d/%m/%Y")
+            datetime.strptime(hora, "%H:%M")
+        except (TypeError, ValueError):
+            raise ValueError("Por favor, insira a data no formato dd/mm/aaaa e a hora no formato hh:mm.")
+        try:
+            capacidade = None if capacidade in (None, '') else int(capacidade)
+        except (TypeError, ValueError):
+            capacidade = -1
+        if capacidade is not None and capacidade < 0:
+            raise ValueError("A capacidade deve ser um número inteiro maior ou igual a zero.")
+        try:
+            evento = EventoConcreto(nome_evento, endereco, cep, preco, categoria, data, hora, descricao,
+                                    capacidade=capacidade)
+        except (TypeError, ValueError):
+            raise ValueError(f"Preço inválido: {preco}.")
+        with self.cache.trava_escrita:
+            if self.buscar_evento(nome_evento):
+                raise ValueError(f"Já existe um evento com o nome {nome_evento.strip()}.")
+            self.cache.salvar_evento(evento)
+        return evento
+
+    def localizar_participacao(self, nome_evento, nome_usuario):
+        # Retorna o evento e o usuário pelos nomes; lança LookupError se algum não existir
+        evento = self.buscar_evento(nome_evento)
+        if not evento:
+            raise LookupError(f"Evento {nome_evento.strip()} não encontrado.")
+        usuario = self.gerenciador_usuarios.buscar_usuario(nome_usuario)
+        if not usuario:
+            raise LookupError(f"Usuário {nome_usuario} não encontrado.")
+        return evento, usuario
+
+    def inscrever(self, nome_evento, nome_usuario):
+        # Inscreve o usuário no evento (ou na lista de espera, se estiver lotado) sem interação
+        # Retorna (evento, usuário, SituacaoReserva); lança ValueError se ele já estiver inscrito ou na fila
+        evento, usuario = self.localizar_participacao(nome_evento, nome_usuario)
+        situacao = self.salvar_participacao_evento(evento, usuario)
+        if situacao == SituacaoReserva.JA_INSCRITO:
+            raise ValueError(f"O usuário {usuario.nome} já está participando do evento {evento.nome}.")
+        if situacao == SituacaoReserva.JA_NA_LISTA:
+            raise ValueError(f"O usuário {usuario.nome} já está na lista de espera do evento {evento.nome}.")
+        return evento, usuario, situacao
+
+    def desinscrever(self, nome_evento, nome_usuario):
+        # Cancela a inscrição (ou o lugar na fila) sem interação; lança ValueError se o usuário não estiver em nenhuma
+        # Retorna (evento, usuário, nomes promovidos da lista de espera)
+        evento, usuario = self.localizar_participacao(nome_evento, nome_usuario)
+        removido, promovidos = self.cache.remover_participacao(evento, usuario)
+        if not removido:
+            raise ValueError(f"O usuário {usuario.nome} não está participando do evento {evento.nome}.")
+        return evento, usuario, self.cache.nomes_dos_usuarios(promovidos)
+
+    def lista_espera(self, nome_evento):
+        # Nomes na lista de espera do evento, em ordem de chegada
+        evento = self.buscar_evento(nome_evento)
+        if not evento:
+            raise LookupError(f"Evento {nome_evento.strip()} não encontrado.")
+        return self.manipulador_dados.buscar_lista_espera(evento)
+
+    def processar_lote(self, operacoes):
+        # Executa várias inscrições/cancelamentos ('inscrever' ou 'desinscrever', evento, usuário) em uma só transação
+        # Retorna, na mesma ordem, o resultado de cada operação ou a exceção que ela lançou
+        resultados = []
+        with self.manipulador_dados.unidade_de_trabalho():
+            for operacao, nome_evento, nome_usuario in operacoes:
+                try:
+                    resultados.append(getattr(self, operacao)(nome_evento, nome_usuario))
+                except (LookupError, ValueError, sqlite3.Error) as e:
+                    resultados.append(e)
+        return resultados
+
+    def eventos_do_usuario(self, nome_usuario):
+        # Retorna os eventos em que o usuário está inscrito
+        registro = self.cache.obter_registro()
+        with self.cache.trava:
+            return registro.eventos_do_participante(nome_usuario)
 
 # Métodos para listar eventos próximos e passados
-    def listar_eventos(self):
+    def com_participantes(self, eventos):
+        # Acrescenta os nomes dos participantes a cada evento; eles vêm do índice de adjacência do registro
+        # Enquanto o cache não foi carregado, uma consulta por página de eventos, para uma listagem curta não ler tudo
+        # (a página é lida antes de pedir a conexão, então quem gera os eventos já devolveu a sua)
+        if not self.cache.carregado:
+            eventos = iter(eventos)
+            while True:
+                pagina = list(islice(eventos, TAMANHO_PAGINA))
+                if not pagina:
+                    return
+                with self.manipulador_dados.leitura() as conexao:
+                    participantes = self.manipulador_dados.participantes_dos_eventos(
+                        conexao, [evento.id for evento in pagina])
+                for evento in pagina:
+                    yield {**evento.como_dict(), 'participantes': participantes[evento.id]}
+        registro = self.cache.obter_registro()
+        for evento in eventos:
+            with self.cache.trava:
+                participantes = registro.participantes_do_evento(evento.nome)
+            yield {**evento.como_dict(), 'participantes': participantes}
+
+    def listar_eventos(self, ordenar_por='id', decrescente=False, categoria=None, cep_prefixo=None,
+                       preco_min=None, preco_max=None, limite=None, tamanho_pagina=TAMANHO_PAGINA):
+        # Lista os eventos lidos do banco aos poucos, com filtros opcionais, escrevendo em blocos
         print("\n=== Lista de Eventos ===")
-        eventoNomes = []
-        for evento in self.eventos:
-            eventoNomes.append(evento.nome)
-
-        dados = self.manipulador_dados.carregar_dados()
-        participacoes = dados['participacoes']
-
-        finalParticipacoes = []
-        removeDuplicatas = []
-
-
-        if(participacoes != []) :
-            for evento in self.eventos:
-                for participacao in participacoes:
-                    if(participacao.participante == evento.nome):
-                            finalParticipacoes.append(participacao.evento_nome)
-
-                for final in finalParticipacoes:
-                    if final not in removeDuplicatas:
-                        removeDuplicatas.append(final)
-                        if final not in evento.participantes:
-                            evento.participantes.append(final)
-                print(evento.__dict__)
-                finalParticipacoes.clear()
-                removeDuplicatas.clear()
-        else :
-            for evento in self.eventos:
-                print(evento.__dict__)
-
-    def listar_eventos_proximos(self):
-        eventos_proximos = [evento for evento in self.eventos if evento.esta_proximo()]
-        if eventos_proximos:
-            print("\n=== Lista de Eventos Próximos ===")
-            for evento in eventos_proximos:
-                print(evento.__dict__)
-        else:
-            print("Não há eventos próximos.")
-
-    def listar_eventos_passados(self):
-        eventos_passados = [evento for evento in self.eventos if evento.ja_passou()]
-        if eventos_passados:
-            print("\n=== Lista de Eventos Passados ===")
-            for evento in eventos_passados:
-                print(evento.__dict__)
+        # O cursor fica com uma conexão de leitura até o fim da listagem; os participantes vêm pela mesma conexão
+        eventos = self.manipulador_dados.iterar_eventos(ordenar_por, decrescente, categoria, cep_prefixo,
+                                                        preco_min, preco_max, com_participantes=True)
+        linhas = ({**evento.como_dict(), 'participantes': participantes} for evento, participantes in eventos)
+        filtrado = any(filtro is not None for filtro in (categoria, cep_prefixo, preco_min, preco_max))
+        mensagem_vazia = "Nenhum evento encontrado." if filtrado else "Não há eventos registrados no sistema."
+        return imprimir_em_blocos(linhas, mensagem_vazia=mensagem_vazia, limite=limite, tamanho_bloco=tamanho_pagina)
+
+    def listar_eventos_filtrados(self):
+        # Pede os filtros e a ordenação ao usuário antes de listar
+        categoria = input("Categoria (vazio para todas): ").strip()
+        cep_prefixo = input("Prefixo do CEP (vazio para todos): ").strip()
+        preco_min = input("Preço mínimo (vazio para sem mínimo): ").strip()
+        preco_max = input("Preço máximo (vazio para sem máximo): ").strip()
+        ordenar_por = input(f"Ordenar por ({'/'.join(ORDENACOES_EVENTOS)}) [data]: ").strip() or 'data'
+        try:
+            preco_min = float(preco_min) if preco_min else None
+            preco_max = float(preco_max) if preco_max else None
+            self.listar_eventos(ordenar_por, categoria=categoria or None, cep_prefixo=cep_prefixo or None,
+                                preco_min=preco_min, preco_max=preco_max)
+        except ValueError as e:
+            print(e)
+
+    def iterar_eventos_paginados(self, buscar_pagina, agora=None, tamanho_pagina=TAMANHO_PAGINA):
+        # Busca uma página por vez no banco (paginação por chave) e entrega os eventos um a um
+        agora = agora or datetime.now()
+        apos = None
+        while True:
+            pagina = buscar_pagina(apos=apos, agora=agora, limite=tamanho_pagina)
+            yield from pagina
+            if len(pagina) < tamanho_pagina:
+                break
+            ultimo = pagina[-1]
+            apos = (int(ultimo.data_hora.timestamp()), ultimo.id)
+
+    def imprimir_eventos_paginados(self, buscar_pagina, titulo, mensagem_vazia, limite=None):
+        # Imprime em blocos as páginas buscadas sob demanda, parando assim que o limite for atingido
+        eventos = self.iterar_eventos_paginados(buscar_pagina)
+        return imprimir_em_blocos(self.com_participantes(eventos), titulo, mensagem_vazia, limite)
+
+    def listar_eventos_proximos(self, limite=None):
+        return self.imprimir_eventos_paginados(self.manipulador_dados.buscar_eventos_proximos,
+                                               "\n=== Lista de Eventos Próximos ===", "Não há eventos próximos.", limite)
+
+    def listar_eventos_passados(self, limite=None):
+        return self.imprimir_eventos_paginados(self.manipulador_dados.buscar_eventos_passados,
+                                               "\n=== Lista de Eventos Passados ===", "Não há eventos passados.", limite)
+
+    def listar_eventos_proximos_dias(self, dias=7, limite=None):
+        def buscar_pagina(apos, agora, limite):
+            return self.manipulador_dados.buscar_eventos_proximos_dias(dias, limite=limite, apos=apos, agora=agora)
+        return self.imprimir_eventos_paginados(buscar_pagina, f"\n=== Eventos dos Próximos {dias} Dias ===",
+                                               f"Não há eventos nos próximos {dias} dias.", limite)
+
+    def listar_eventos_acontecendo(self, limite=None):
+        return self.imprimir_eventos_paginados(self.manipulador_dados.buscar_eventos_acontecendo,
+                                               "\n=== Eventos Acontecendo Agora ===", "Não há eventos acontecendo agora.", limite)
+
+    def pesquisar(self, texto, limite=LIMITE_BUSCA):
+        # Busca textual ranqueada sobre os eventos (ver ManipuladorDados.buscar_eventos_texto)
+        return self.manipulador_dados.buscar_eventos_texto(texto, limite)
+
+    def pesquisar_eventos(self):
+        # Pede as palavras-chave e mostra os eventos mais relevantes
+        print("\n=== Pesquisar Eventos ===")
+        texto = input("Palavras-chave: ")
+        eventos = self.pesquisar(texto)
+        imprimir_em_blocos(self.com_participantes(eventos), mensagem_vazia=f"Nenhum evento encontrado para: {texto}")
+
+    def eventos_perto_do_usuario(self, nome_usuario, raio_km=RAIO_PADRAO_KM, limite=LIMITE_BUSCA):
+        # Próximos eventos perto do CEP do usuário: lista de (distância em km, evento)
+        usuario = self.gerenciador_usuarios.buscar_usuario(nome_usuario)
+        if not usuario:
+            raise LookupError(f"Usuário {nome_usuario} não encontrado.")
+        return self.manipulador_dados.buscar_eventos_perto(usuario.cep, raio_km, limite)
+
+    def listar_eventos_perto(self):
+        # Pede o usuário e o raio e mostra os eventos mais próximos
+        print("\n=== Eventos Perto de Mim ===")
+        nome_usuario = input("Nome do usuário: ")
+        raio_km = input(f"Raio em km [{RAIO_PADRAO_KM:g}]: ").strip()
+        try:
+            eventos = self.eventos_perto_do_usuario(nome_usuario, float(raio_km) if raio_km else RAIO_PADRAO_KM)
+        except (LookupError, ValueError) as e:
+            print(e)
+            return
+        if not eventos:
+            print("Não há eventos próximos nesse raio.")
+        for distancia, evento in eventos:
+            print(f"{distancia:.1f} km - {evento.nome} ({evento.data.strftime('%d/%m/%Y')} {evento.hora}) - {evento.endereco}")
+
+    def exibir_estatisticas(self):
+        # Painel lido das tabelas de agregados: receita por categoria/mês, perfil geral e, se pedido, de um evento
+        print("\n=== Estatísticas ===")
+        nome_evento = input("Nome do evento (vazio para o resumo geral): ").strip()
+        if nome_evento:
+            evento = self.buscar_evento(nome_evento)
+            if not evento:
+                print(f"Evento {nome_evento} não encontrado.")
+                self.sugerir_eventos(nome_evento)
+                return
+            print(f"Inscritos: {self.painel.inscritos_do_evento(evento)}  "
+                  f"Receita esperada: R$ {self.painel.receita_esperada(evento):.2f}")
+            perfil = self.painel.perfil_do_evento(evento)
         else:
-            print("Não há eventos passados.")
+            for categoria, mes, inscritos, receita in self.painel.receita_por_categoria():
+                print(f"{categoria or '(sem categoria)'} {mes}: {inscritos} inscritos, R$ {receita:.2f}")
+            perfil = self.painel.perfil_geral()
+        for faixa, sexo, inscritos in perfil:
+            faixa = "idade desconhecida" if faixa < 0 else f"{faixa}-{faixa + 9} anos"
+            print(f"  {faixa} {sexo or '-'}: {inscritos}")
+
+    def sugerir_eventos(self, nome_evento):
+        # Quando o nome digitado não existe, mostra os eventos com nomes parecidos
+        if self.buscar_evento(nome_evento):
+            return
+        sugestoes = self.pesquisar(nome_evento, limite=5)
+        if sugestoes:
+            print("Eventos parecidos: " + ", ".join(evento.nome for evento in sugestoes))
 
     def participar_evento(self):
         # Métodos para participar e cancelar participação em eventos
@@ -351,28 +1865,17 @@ class GerenciadorEventos:
         nome_evento = input("Nome do evento: ").strip()
         usuario_nome = input("Nome do usuário: ")
 
-        evento_encontrado = None
-        for evento in self.eventos:
-            if evento.nome.strip() == nome_evento:
-                evento_encontrado = evento
-                break
-
-        if evento_encontrado:
-            usuario_encontrado = None
-            for usuario in self.gerenciador_usuarios.usuarios:
-                if usuario.nome == usuario_nome:
-                    usuario_encontrado = usuario
-                    break
-
-            if usuario_encontrado:
-                print(f"{usuario_encontrado.nome} participou do evento {evento_encontrado.nome}.")
-                self.salvar_participacao_evento(evento_encontrado, usuario_encontrado)
-                print("Participação salva")
-
-            else:
-                print(f"Usuário {usuario_nome} não encontrado.")
-        else:
-            print(f"Evento {nome_evento} não encontrado.")
+        try:
+            evento_encontrado, usuario_encontrado, situacao = self.inscrever(nome_evento, usuario_nome)
+        except (LookupError, ValueError) as e:
+            print(e)
+            self.sugerir_eventos(nome_evento)
+            return
+        if situacao == SituacaoReserva.LISTA_DE_ESPERA:
+            print(f"O evento {evento_encontrado.nome} está lotado; {usuario_encontrado.nome} entrou na lista de espera.")
+            return
+        print(f"{usuario_encontrado.nome} participou do evento {evento_encontrado.nome}.")
+        print("Participação salva")
             
     def cancelar_participacao(self):
         # Método para cancelar participação
@@ -380,69 +1883,337 @@ class GerenciadorEventos:
         nome_evento = input("Nome do evento: ").strip()
         nome_usuario = input("Nome do usuário: ")
 
-        evento_encontrado = None
-        for evento in self.eventos:
-            if evento.nome.strip() == nome_evento:
-                evento_encontrado = evento
-                break
-
-        if evento_encontrado:
-            usuario_encontrado = None
-            for usuario in self.gerenciador_usuarios.usuarios:
-                if usuario.nome == nome_usuario:
-                    usuario_encontrado = usuario
-                    break
-
-            if usuario_encontrado:
-                if usuario_encontrado.nome in evento_encontrado.participantes:
-                    evento_encontrado.participantes.remove(usuario_encontrado.nome)
-                    print(f"{usuario_encontrado.nome} cancelou a participação no evento {evento_encontrado.nome}.")
-                    self.manipulador_dados.apagar_participacao(evento_encontrado, usuario_encontrado)
-                    dados = self.manipulador_dados.carregar_dados()
-                    participacoes = dados['participacoes']
-
-                    for participacao in participacoes:
-                        if participacao.evento_nome == usuario_encontrado.nome and participacao.participante == evento_encontrado.nome:
-                            participacoes.remove(participacao)
-    
-                    self.manipulador_dados.salvar_dados(dados, None, None, evento, usuario, participacoes)
-                else:
-                    print(f"O usuário {usuario_encontrado.nome} não está participando do evento {evento_encontrado.nome}.")
-            else:
-                print(f"Usuário {nome_usuario} não encontrado.")
-        else:
-            print(f"Evento {nome_evento} não encontrado.")
+        try:
+            evento_encontrado, usuario_encontrado, promovidos = self.desinscrever(nome_evento, nome_usuario)
+        except (LookupError, ValueError) as e:
+            print(e)
+            self.sugerir_eventos(nome_evento)
+            return
+        print(f"{usuario_encontrado.nome} cancelou a participação no evento {evento_encontrado.nome}.")
+        for nome in promovidos:
+            print(f"{nome} saiu da lista de espera e agora participa do evento {evento_encontrado.nome}.")
             
     def listar_eventos_do_usuario(self):
         # Método para listar os eventos de um usuário específico
         nome_usuario = input("Digite o nome do usuário para listar os eventos: ")
-        eventos_usuario = []
-        final_eventos_usuario = []
+        eventos_usuario = self.eventos_do_usuario(nome_usuario)
 
-        dados = self.manipulador_dados.carregar_dados()
-        participacoes = dados['participacoes']
+        if eventos_usuario:
+            print(f"\n=== Eventos do usuário {nome_usuario} ===")
+            for evento in eventos_usuario:
+                print(evento.nome)
+        else:
+            print(f"Não há eventos para o usuário {nome_usuario}.")
 
-        for participacao in participacoes:
-            if(participacao.evento_nome == nome_usuario):
-                eventos_usuario.append(participacao.participante)
+# Classe para importação e exportação em lote de usuários, eventos e participações (CSV ou JSONL)
+class ImportadorExportador:
+    # Colunas esperadas em cada tipo de arquivo
+    CAMPOS = {
+        'usuarios': ('nome', 'idade', 'sexo', 'telefone', 'endereco', 'cep'),
+        'eventos': ('nome', 'endereco', 'cep', 'preco', 'categoria', 'data', 'hora', 'descricao', 'capacidade'),
+        'participacoes': ('evento', 'usuario'),
+        'ceps': ('cep', 'latitude', 'longitude'),
+    }
+    # Colunas que precisam ser texto (ou vazias); no JSONL um número ou uma lista aqui é erro da linha
+    CAMPOS_TEXTO = {
+        'usuarios': ('nome', 'sexo', 'telefone', 'endereco', 'cep'),
+        'eventos': ('nome', 'endereco', 'cep', 'categoria', 'data', 'hora', 'descricao'),
+        'participacoes': ('evento', 'usuario'),
+        'ceps': ('cep',),
+    }
 
-        # Filtra os eventos do usuário específico
-        if eventos_usuario != []:
-            for evento in self.eventos:
-                if evento.nome in eventos_usuario:
-                    final_eventos_usuario.append(evento.nome)
+    def __init__(self, manipulador_dados):
+        self.manipulador_dados = manipulador_dados
 
-            print(f"\n=== Eventos do usuário {nome_usuario} ===")
-            for evento in final_eventos_usuario:
-                print(evento)
+    def ler_registros(self, arquivo, formato):
+        # Lê o arquivo linha a linha, sem carregá-lo inteiro na memória
+        # No JSONL devolve o texto da linha: a decodificação fica com decodificar_registro, para um erro valer só a linha
+        if formato == 'csv':
+            yield from csv.DictReader(arquivo)
         else:
-            print(f"Não há eventos para o usuário {nome_usuario}.")
+            for linha in arquivo:
+                if linha.strip():
+                    yield linha
+
+    def decodificar_registro(self, tipo, registro, formato):
+        # Retorna o registro como dicionário com os campos de texto conferidos ou lança ValueError com o motivo
+        if formato != 'csv':
+            try:
+                registro = json.loads(registro)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSON inválido ({e.msg}, coluna {e.colno})")
+        if not isinstance(registro, dict):
+            raise ValueError(f"a linha deve ser um objeto JSON, não {type(registro).__name__}")
+        for campo in self.CAMPOS_TEXTO[tipo]:
+            valor = registro.get(campo)
+            if valor is not None and not isinstance(valor, str):
+                raise ValueError(f"{campo} deve ser texto ({valor!r})")
+        return registro
+
+    def formato_do_arquivo(self, caminho):
+        # O formato é definido pela extensão do arquivo
+        if caminho.lower().endswith('.csv'):
+            return 'csv'
+        if caminho.lower().endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        raise ValueError("Formato não suportado: use um arquivo .csv ou .jsonl.")
+
+    def validar_usuario(self, registro):
+        # Retorna a tupla pronta para o INSERT ou lança ValueError com o motivo
+        nome = (registro.get('nome') or '').strip()
+        if not nome:
+            raise ValueError("nome vazio")
+        try:
+            idade = int(registro.get('idade'))
+        except (TypeError, ValueError):
+            raise ValueError(f"idade inválida ({registro.get('idade')})")
+        if not 0 <= idade <= 150:
+            raise ValueError(f"idade fora do intervalo 0-150 ({idade})")
+        sexo = (registro.get('sexo') or '').strip().upper()
+        if sexo not in ('M', 'F', ''):
+            raise ValueError(f"sexo deve ser M ou F ({registro.get('sexo')})")
+        return (nome, idade, sexo, registro.get('telefone'), registro.get('endereco'), registro.get('cep'))
+
+    def validar_evento(self, registro):
+        # Retorna a tupla pronta para o INSERT ou lança ValueError com o motivo
+        nome = (registro.get('nome') or '').strip()
+        if not nome:
+            raise ValueError("nome vazio")
+        try:
+            preco = float(registro.get('preco'))
+        except (TypeError, ValueError):
+            raise ValueError(f"preço inválido ({registro.get('preco')})")
+        if preco < 0:
+            raise ValueError(f"preço negativo ({preco})")
+        try:
+            data = converter_data(registro.get('data'))
+        except (TypeError, ValueError):
+            raise ValueError(f"data inválida ({registro.get('data')}), use dd/mm/aaaa")
+        hora = (registro.get('hora') or '').strip()
+        try:
+            datetime.strptime(hora, "%H:%M")
+        except ValueError:
+            raise ValueError(f"hora inválida ({registro.get('hora')}), use hh:mm")
+        # A coluna capacidade é opcional (arquivos antigos não a têm); vazia significa sem limite
+        capacidade = registro.get('capacidade')
+        if capacidade in (None, ''):
+            capacidade = None
+        else:
+            try:
+                capacidade = int(capacidade)
+            except (TypeError, ValueError):
+                raise ValueError(f"capacidade inválida ({capacidade})")
+            if capacidade < 0:
+                raise ValueError(f"capacidade negativa ({capacidade})")
+        return (nome, registro.get('endereco'), registro.get('cep'), preco, registro.get('categoria'),
+                data.strftime('%Y-%m-%d'), hora, registro.get('descricao'), calcular_data_hora(data, hora), capacidade)
+
+    def validar_participacao(self, registro):
+        evento = (registro.get('evento') or '').strip()
+        usuario = (registro.get('usuario') or '').strip()
+        if not evento or not usuario:
+            raise ValueError("evento e usuário são obrigatórios")
+        return (usuario, evento)
+
+    def validar_cep(self, registro):
+        cep = normalizar_cep(registro.get('cep') or '')
+        if not cep:
+            raise ValueError("cep vazio")
+        try:
+            latitude = float(registro.get('latitude'))
+            longitude = float(registro.get('longitude'))
+        except (TypeError, ValueError):
+            raise ValueError(f"coordenadas inválidas ({registro.get('latitude')}, {registro.get('longitude')})")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"coordenadas fora do intervalo ({latitude}, {longitude})")
+        return (cep, latitude, longitude)
+
+    def importar(self, tipo, caminho, caminho_erros=None):
+        # Importa o arquivo em lotes com executemany, tudo em uma única transação
+        validar = {'usuarios': self.validar_usuario, 'eventos': self.validar_evento,
+                   'participacoes': self.validar_participacao, 'ceps': self.validar_cep}[tipo]
+        consulta_sql = {
+            'usuarios': """
+                INSERT OR IGNORE INTO Usuarios (nome, idade, sexo, telefone, endereco, cep)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            'eventos': """
+                INSERT OR IGNORE INTO Eventos (nome, endereco, cep, preco, categoria, data, hora, descricao, data_hora,
+                                               capacidade)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            # Participações além da capacidade do evento são ignoradas, como as repetidas
+            # (vagas contadas uma vez no início, ver vagas_da_importacao: durante a importação os agregados ficam pausados)
+            'participacoes': """
+                INSERT OR IGNORE INTO Participacoes (evento_id, usuario_id)
+                SELECT e.id, u.id FROM Eventos e JOIN Usuarios u ON u.nome = ?
+                WHERE e.nome = ?
+                  AND (e.capacidade IS NULL OR (SELECT vagas FROM VagasImportacao WHERE evento_id = e.id) > 0)
+            """,
+            # Um CEP repetido substitui as coordenadas anteriores
+            'ceps': "INSERT OR REPLACE INTO Ceps (cep, latitude, longitude) VALUES (?, ?, ?)",
+        }[tipo]
+        formato = self.formato_do_arquivo(caminho)
+        resumo = {'lidos': 0, 'importados': 0, 'ignorados': 0, 'erros': 0, 'exemplos_erros': []}
+        inicio = time.perf_counter()
+
+        cursor = self.manipulador_dados.conexao.cursor()
+        arquivo_erros = open(caminho_erros, 'w', newline='', encoding='utf-8') if caminho_erros else None
+        try:
+            escritor_erros = csv.writer(arquivo_erros) if arquivo_erros else None
+            if escritor_erros:
+                escritor_erros.writerow(('linha', 'erro'))
+            lote = []
+            with self.manipulador_dados.unidade_de_trabalho(), open(caminho, newline='', encoding='utf-8') as arquivo, \
+                    (analises.pausar(cursor) if tipo == 'participacoes' else nullcontext()), \
+                    (self.vagas_da_importacao(cursor) if tipo == 'participacoes' else nullcontext()):
+                # Participações em lote: os agregados são recalculados uma vez no fim, não a cada linha
+                for numero, registro in enumerate(self.ler_registros(arquivo, formato), start=1):
+                    resumo['lidos'] += 1
+                    try:
+                        lote.append(validar(self.decodificar_registro(tipo, registro, formato)))
+                    except ValueError as e:
+                        resumo['erros'] += 1
+                        if len(resumo['exemplos_erros']) < 10:
+                            resumo['exemplos_erros'].append((numero, str(e)))
+                        if escritor_erros:
+                            escritor_erros.writerow((numero, str(e)))
+                    if len(lote) >= TAMANHO_LOTE:
+                        self.gravar_lote(cursor, consulta_sql, lote, resumo)
+                self.gravar_lote(cursor, consulta_sql, lote, resumo)
+                if tipo == 'ceps' and self.manipulador_dados.indice_espacial:
+                    # Eventos cadastrados antes dos CEPs ganham posição no índice espacial
+                    self.manipulador_dados.reconstruir_indice_espacial(cursor)
+        finally:
+            if arquivo_erros:
+                arquivo_erros.close()
+
+        # O cache em memória é recarregado na próxima consulta
+        self.manipulador_dados.cache.invalidar()
+        resumo['segundos'] = time.perf_counter() - inicio
+        resumo['linhas_por_segundo'] = resumo['lidos'] / resumo['segundos'] if resumo['segundos'] else 0.0
+        return resumo
+
+    @contextmanager
+    def vagas_da_importacao(self, cursor):
+        # Vagas livres de cada evento com capacidade, contadas uma só vez antes das participações importadas
+        # e descontadas por um trigger temporário a cada inserção (um COUNT por linha deixaria a importação quadrática)
+        cursor.execute("CREATE TEMP TABLE VagasImportacao (evento_id INTEGER PRIMARY KEY, vagas INTEGER NOT NULL)")
+        try:
+            cursor.execute("""
+                INSERT INTO VagasImportacao (evento_id, vagas)
+                SELECT e.id, e.capacidade - (SELECT COUNT(*) FROM Participacoes p WHERE p.evento_id = e.id)
+                FROM Eventos e WHERE e.capacidade IS NOT NULL
+            """)
+            cursor.execute("""
+                CREATE TEMP TRIGGER descontar_vaga_importacao AFTER INSERT ON main.Participacoes
+                BEGIN
+                    UPDATE VagasImportacao SET vagas = vagas - 1 WHERE evento_id = NEW.evento_id;
+                END
+            """)
+            yield
+        finally:
+            cursor.execute("DROP TRIGGER IF EXISTS temp.descontar_vaga_importacao")
+            cursor.execute("DROP TABLE IF EXISTS temp.VagasImportacao")
+
+    def gravar_lote(self, cursor, consulta_sql, lote, resumo):
+        # Insere o lote e conta quantas linhas foram de fato gravadas (nomes repetidos são ignorados)
+        if not lote:
+            return
+        cursor.executemany(consulta_sql, lote)
+        resumo['importados'] += cursor.rowcount
+        resumo['ignorados'] += len(lote) - cursor.rowcount
+        lote.clear()
+
+    def exportar(self, tipo, caminho):
+        # Exporta a tabela lendo do cursor em lotes com fetchmany
+        consulta_sql = {
+            'usuarios': "SELECT nome, idade, sexo, telefone, endereco, cep FROM Usuarios ORDER BY id",
+            'eventos': "SELECT nome, endereco, cep, preco, categoria, data, hora, descricao, capacidade FROM Eventos ORDER BY id",
+            'participacoes': """
+                SELECT e.nome, u.nome FROM Participacoes p
+                JOIN Eventos e ON e.id = p.evento_id
+                JOIN Usuarios u ON u.id = p.usuario_id
+                ORDER BY p.id
+            """,
+            'ceps': "SELECT cep, latitude, longitude FROM Ceps ORDER BY cep",
+        }[tipo]
+        campos = self.CAMPOS[tipo]
+        formato = self.formato_do_arquivo(caminho)
+        resumo = {'exportados': 0}
+        inicio = time.perf_counter()
+
+        with self.manipulador_dados.leitura() as conexao, open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+            cursor = conexao.execute(consulta_sql)
+            escritor = csv.writer(arquivo) if formato == 'csv' else None
+            if escritor:
+                escritor.writerow(campos)
+            while True:
+                linhas = cursor.fetchmany(TAMANHO_LOTE)
+                if not linhas:
+                    break
+                if tipo == 'eventos':
+                    # A data volta para o formato dd/mm/aaaa usado na digitação e na importação
+                    linhas = [linha[:5] + (converter_data(linha[5]).strftime('%d/%m/%Y'),) + linha[6:] for linha in linhas]
+                if escritor:
+                    escritor.writerows(linhas)
+                else:
+                    arquivo.writelines(json.dumps(dict(zip(campos, linha)), ensure_ascii=False) + '\n' for linha in linhas)
+                resumo['exportados'] += len(linhas)
+
+        resumo['segundos'] = time.perf_counter() - inicio
+        resumo['linhas_por_segundo'] = resumo['exportados'] / resumo['segundos'] if resumo['segundos'] else 0.0
+        return resumo
+
+    def pedir_tipo(self):
+        tipo = input(f"Tipo de dado ({'/'.join(self.CAMPOS)}): ").strip().lower()
+        if tipo not in self.CAMPOS:
+            print(f"Tipo {tipo} inválido.")
+            return None
+        return tipo
+
+    def importar_arquivo(self):
+        # Método interativo para importar um arquivo CSV/JSONL
+        print("\n=== Importar Dados ===")
+        tipo = self.pedir_tipo()
+        if not tipo:
+            return
+        caminho = input("Arquivo (.csv ou .jsonl): ").strip()
+        caminho_erros = input("Arquivo para o relatório de erros (vazio para não gravar): ").strip() or None
+        try:
+            resumo = self.importar(tipo, caminho, caminho_erros)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print("Erro durante a importação:", e)
+            return
+        print(f"{resumo['lidos']} linhas lidas, {resumo['importados']} importadas, "
+              f"{resumo['ignorados']} ignoradas, {resumo['erros']} com erro "
+              f"em {resumo['segundos']:.2f}s ({resumo['linhas_por_segundo']:.0f} linhas/s).")
+        for numero, erro in resumo['exemplos_erros']:
+            print(f"  Linha {numero}: {erro}")
+
+    def exportar_arquivo(self):
+        # Método interativo para exportar uma tabela para CSV/JSONL
+        print("\n=== Exportar Dados ===")
+        tipo = self.pedir_tipo()
+        if not tipo:
+            return
+        caminho = input("Arquivo (.csv ou .jsonl): ").strip()
+        try:
+            resumo = self.exportar(tipo, caminho)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print("Erro durante a exportação:", e)
+            return
+        print(f"{resumo['exportados']} linhas exportadas em {resumo['segundos']:.2f}s "
+              f"({resumo['linhas_por_segundo']:.0f} linhas/s).")
 
 # Classe Menu
 class Menu:
-    def __init__(self, gerenciador_usuarios, gerenciador_eventos):
+    def __init__(self, gerenciador_usuarios, gerenciador_eventos, importador_exportador=None, diretorio_perfil=None):
         self.gerenciador_usuarios = gerenciador_usuarios
         self.gerenciador_eventos = gerenciador_eventos
+        self.importador_exportador = importador_exportador or ImportadorExportador(gerenciador_eventos.manipulador_dados)
+        # Se indicado, cada comando roda sob o cProfile e as estatísticas são gravadas nesse diretório
+        self.diretorio_perfil = diretorio_perfil
 
     def exibir_menu(self):
         # Exibe as opções do menu
@@ -457,41 +2228,128 @@ class Menu:
         print("8. Cancelar participação de evento")
         print("9. Listar eventos do usuário")
         print("10. Sair")
+        print("11. Listar eventos dos próximos 7 dias")
+        print("12. Listar eventos acontecendo agora")
+        print("13. Importar dados (CSV/JSONL)")
+        print("14. Exportar dados (CSV/JSONL)")
+        print("15. Listar eventos com filtros")
+        print("16. Listar usuários com filtros")
+        print("17. Pesquisar eventos")
+        print("18. Eventos perto de mim")
+        print("19. Estatísticas")
+        print("20. Exibir métricas")
+
+    def exibir_metricas(self):
+        # Mostra as métricas coletadas até agora no formato texto do Prometheus
+        if not metricas.ativo:
+            print("\nMétricas desligadas. Inicie com --metricas ou EVENTFEST_METRICAS=1.")
+            return
+        print()
+        print(metricas.texto_prometheus(), end='')
 
     def executar(self):
         while True:
             self.exibir_menu() # Mostra o menu
             escolha = input("\nEscolha uma opção: ") # Solicita a escolha do usuário
-            # Realiza a operação de acordo com a escolha do usuário
-            if escolha == '1':
-                self.gerenciador_eventos.cadastrar_evento()
-            elif escolha == '2':
-                self.gerenciador_usuarios.cadastrar_usuario()
-            elif escolha == '3':
-                self.gerenciador_usuarios.listar_usuarios()
-            elif escolha == '4':
-                self.gerenciador_eventos.listar_eventos()
-            elif escolha == '5':
-                self.gerenciador_eventos.listar_eventos_proximos()
-            elif escolha == '6':
-                self.gerenciador_eventos.listar_eventos_passados()
-            elif escolha == '7':
-                self.gerenciador_eventos.participar_evento()
-            elif escolha == '8':
-                self.gerenciador_eventos.cancelar_participacao()
-            elif escolha == '9':
-                self.gerenciador_eventos.listar_eventos_do_usuario()
-            elif escolha == '10':
-                print("\nPrograma encerrado. Obrigado por usar o sistema!")
-                break
-            else:
-                print("\nOpção inválida. Por favor, escolha uma opção válida.")
-                
-# Inicialização das classes e execução do menu
-nome_banco = "dados.db"
-manipulador = ManipuladorDados(nome_banco)
-gerenciador_usuarios = GerenciadorUsuarios(manipulador)
-gerenciador_eventos = GerenciadorEventos(manipulador, gerenciador_usuarios)
-
-menu = Menu(gerenciador_usuarios, gerenciador_eventos)
-menu.executar()
+            # Realiza a operação de acordo com a escolha do usuário (sob o cProfile, se pedido)
+            with metricas.perfil_do_comando(self.diretorio_perfil, f"opcao_{escolha.strip()}"):
+                if escolha == '1':
+                    self.gerenciador_eventos.cadastrar_evento()
+                elif escolha == '2':
+                    self.gerenciador_usuarios.cadastrar_usuario()
+                elif escolha == '3':
+                    self.gerenciador_usuarios.listar_usuarios()
+                elif escolha == '4':
+                    self.gerenciador_eventos.listar_eventos()
+                elif escolha == '5':
+                    self.gerenciador_eventos.listar_eventos_proximos()
+                elif escolha == '6':
+                    self.gerenciador_eventos.listar_eventos_passados()
+                elif escolha == '7':
+                    self.gerenciador_eventos.participar_evento()
+                elif escolha == '8':
+                    self.gerenciador_eventos.cancelar_participacao()
+                elif escolha == '9':
+                    self.gerenciador_eventos.listar_eventos_do_usuario()
+                elif escolha == '10':
+                    print("\nPrograma encerrado. Obrigado por usar o sistema!")
+                    break
+                elif escolha == '11':
+                    self.gerenciador_eventos.listar_eventos_proximos_dias()
+                elif escolha == '12':
+                    self.gerenciador_eventos.listar_eventos_acontecendo()
+                elif escolha == '13':
+                    self.importador_exportador.importar_arquivo()
+                elif escolha == '14':
+                    self.importador_exportador.exportar_arquivo()
+                elif escolha == '15':
+                    self.gerenciador_eventos.listar_eventos_filtrados()
+                elif escolha == '16':
+                    self.gerenciador_usuarios.listar_usuarios_filtrados()
+                elif escolha == '17':
+                    self.gerenciador_eventos.pesquisar_eventos()
+                elif escolha == '18':
+                    self.gerenciador_eventos.listar_eventos_perto()
+                elif escolha == '19':
+                    self.gerenciador_eventos.exibir_estatisticas()
+                elif escolha == '20':
+                    self.exibir_metricas()
+                else:
+                    print("\nOpção inválida. Por favor, escolha uma opção válida.")
+
+# Operações com latência medida quando as métricas estão ligadas
+# Os comandos interativos do menu ficam de fora: o tempo deles inclui a digitação do usuário
+OPERACOES_MEDIDAS = (
+    (ManipuladorDados, ('carregar_dados', 'salvar_dados', 'salvar_usuario', 'salvar_evento', 'reservar_vaga',
+                        'cancelar_reserva', 'promover_lista_espera', 'buscar_lista_espera', 'vagas_restantes',
+                        'sincronizar_participacoes', 'buscar_participantes', 'buscar_eventos_do_usuario',
+                        'buscar_eventos_por_periodo', 'buscar_eventos_texto', 'buscar_eventos_like',
+                        'buscar_eventos_perto', 'copiar_backup')),
+    (CacheDados, ('recarregar',)),
+    (GerenciadorUsuarios, ('registrar_usuario', 'buscar_usuario', 'listar_usuarios')),
+    (GerenciadorEventos, ('registrar_evento', 'buscar_evento', 'inscrever', 'desinscrever', 'lista_espera',
+                          'processar_lote', 'eventos_do_usuario', 'listar_eventos', 'listar_eventos_proximos',
+                          'listar_eventos_passados', 'listar_eventos_proximos_dias', 'listar_eventos_acontecendo',
+                          'pesquisar', 'eventos_perto_do_usuario', 'sugerir_eventos')),
+    (ImportadorExportador, ('importar', 'exportar')),
+    (analises.PainelAnalises, ('inscritos_do_evento', 'receita_esperada', 'receita_por_categoria',
+                               'perfil_do_evento', 'perfil_geral', 'reconstruir')),
+)
+
+def ligar_metricas():
+    # Liga a coleta: embrulha as operações acima e mede o SQL das conexões abertas daqui em diante
+    metricas.ligar()
+    for classe, nomes in OPERACOES_MEDIDAS:
+        metricas.instrumentar(classe, nomes)
+
+if metricas.ativo:
+    ligar_metricas()
+
+def main(argv=None):
+    # Inicialização das classes e execução do menu; importar o módulo não abre o banco nem lê arquivos
+    import argparse
+    argumentos = argparse.ArgumentParser(description="EventFest - gerenciamento de eventos")
+    argumentos.add_argument('--banco', default="dados.db", help="arquivo do banco SQLite (padrão: dados.db)")
+    argumentos.add_argument('--metricas', action='store_true', help="coleta métricas de latência, SQL e cache")
+    argumentos.add_argument('--metricas-arquivo',
+                            help="grava as métricas ao sair (.jsonl: log estruturado; outro: texto do Prometheus)")
+    argumentos.add_argument('--perfil', metavar='DIRETORIO', help="roda cada comando sob o cProfile e grava os .prof")
+    opcoes = argumentos.parse_args(argv)
+    if (opcoes.metricas or opcoes.metricas_arquivo) and not metricas.ativo:
+        ligar_metricas()
+
+    # O banco é aberto pelo primeiro comando que o usa, e a carga completa só acontece se o comando precisar dela
+    manipulador = ManipuladorDados(opcoes.banco)
+    gerenciador_usuarios = GerenciadorUsuarios(manipulador)
+    gerenciador_eventos = GerenciadorEventos(manipulador, gerenciador_usuarios)
+
+    menu = Menu(gerenciador_usuarios, gerenciador_eventos, diretorio_perfil=opcoes.perfil)
+    try:
+        menu.executar()
+    finally:
+        if opcoes.metricas_arquivo:
+            metricas.gravar(opcoes.metricas_arquivo)
+        manipulador.fechar()
+
+if __name__ == "__main__":
+    main()
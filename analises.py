@@ -0,0 +1,291 @@
+# Tabelas de agregados (inscritos por evento, receita por categoria/mês e perfil dos participantes),
+# atualizadas por triggers a cada gravação em Participacoes, e as consultas do painel sobre elas
+from collections import Counter
+from contextlib import contextmanager
+
+# NumPy é opcional: sem ele a reconstrução usa Counter, mais lenta em bancos grandes
+# Só é importado na primeira reconstrução grande: o import custa mais que todo o resto da inicialização do programa
+np = None
+numpy_verificado = False
+
+# Participações a partir das quais a reconstrução automática usa NumPy (abaixo disso o Counter é mais rápido)
+MINIMO_NUMPY = 50000
+
+# Faixa etária agrupada de 10 em 10 anos (-1 = idade desconhecida)
+FAIXA_ETARIA_SQL = "coalesce((idade / 10) * 10, -1)"
+
+def carregar_numpy():
+    # Importa o NumPy na primeira chamada; retorna None se ele não estiver instalado
+    global np, numpy_verificado
+    if not numpy_verificado:
+        numpy_verificado = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+    return np
+
+def faixa_etaria(idade):
+    # Mesma regra de FAIXA_ETARIA_SQL, em Python
+    return -1 if idade is None else (int(idade) // 10) * 10
+
+def criar_tabelas(cursor):
+    # Cria as tabelas de agregados e os triggers que as mantêm; retorna True se elas não existiam (precisam de carga)
+    novas = cursor.execute("""
+        SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'EstatisticasEvento'
+    """).fetchone()[0] == 0
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS EstatisticasEvento (
+            evento_id INTEGER PRIMARY KEY,
+            inscritos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ReceitaCategoriaMes (
+            categoria TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            inscritos INTEGER NOT NULL DEFAULT 0,
+            receita REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (categoria, mes)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PerfilEvento (
+            evento_id INTEGER NOT NULL,
+            faixa_etaria INTEGER NOT NULL,
+            sexo TEXT NOT NULL,
+            inscritos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (evento_id, faixa_etaria, sexo)
+        ) WITHOUT ROWID
+    """)
+    # Enquanto houver uma linha aqui os triggers não fazem nada (carga em lote seguida de reconstruir, ver pausar)
+    cursor.execute("CREATE TABLE IF NOT EXISTS AgregadosPausados (id INTEGER PRIMARY KEY)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS PerfilParticipantes (
+            faixa_etaria INTEGER NOT NULL,
+            sexo TEXT NOT NULL,
+            inscricoes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (faixa_etaria, sexo)
+        ) WITHOUT ROWID
+    """)
+
+    # Um mesmo corpo serve para somar (nova participação, sinal +1) e subtrair (participação apagada, sinal -1)
+    for nome, momento, linha, sinal in (('analises_participacao_inserir', 'AFTER INSERT', 'new', '1'),
+                                        ('analises_participacao_apagar', 'AFTER DELETE', 'old', '-1')):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {nome} {momento} ON Participacoes
+            WHEN NOT EXISTS (SELECT 1 FROM AgregadosPausados)
+            BEGIN
+                INSERT INTO EstatisticasEvento (evento_id, inscritos) VALUES ({linha}.evento_id, {sinal})
+                ON CONFLICT (evento_id) DO UPDATE SET inscritos = inscritos + excluded.inscritos;
+                INSERT INTO ReceitaCategoriaMes (categoria, mes, inscritos, receita)
+                SELECT coalesce(categoria, ''), coalesce(substr(data, 1, 7), ''), {sinal}, {sinal} * coalesce(preco, 0)
+                FROM Eventos WHERE id = {linha}.evento_id
+                ON CONFLICT (categoria, mes) DO UPDATE SET
+                    inscritos = inscritos + excluded.inscritos, receita = receita + excluded.receita;
+                INSERT INTO PerfilEvento (evento_id, faixa_etaria, sexo, inscritos)
+                SELECT {linha}.evento_id, {FAIXA_ETARIA_SQL}, coalesce(sexo, ''), {sinal}
+                FROM Usuarios WHERE id = {linha}.usuario_id
+                ON CONFLICT (evento_id, faixa_etaria, sexo) DO UPDATE SET inscritos = inscritos + excluded.inscritos;
+                INSERT INTO PerfilParticipantes (faixa_etaria, sexo, inscricoes)
+                SELECT {FAIXA_ETARIA_SQL}, coalesce(sexo, ''), {sinal}
+                FROM Usuarios WHERE id = {linha}.usuario_id
+                ON CONFLICT (faixa_etaria, sexo) DO UPDATE SET inscricoes = inscricoes + excluded.inscricoes;
+            END
+        """)
+
+    # Mudança de preço, categoria ou data move a receita já contada para a nova categoria/mês
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS analises_evento_atualizar AFTER UPDATE OF preco, categoria, data ON Eventos
+        WHEN (old.preco IS NOT new.preco OR old.categoria IS NOT new.categoria OR old.data IS NOT new.data)
+         AND NOT EXISTS (SELECT 1 FROM AgregadosPausados)
+         AND (SELECT inscritos FROM EstatisticasEvento WHERE evento_id = new.id) != 0
+        BEGIN
+            INSERT INTO ReceitaCategoriaMes (categoria, mes, inscritos, receita)
+            SELECT coalesce(old.categoria, ''), coalesce(substr(old.data, 1, 7), ''), -inscritos,
+                   -inscritos * coalesce(old.preco, 0)
+            FROM EstatisticasEvento WHERE evento_id = old.id
+            ON CONFLICT (categoria, mes) DO UPDATE SET
+                inscritos = inscritos + excluded.inscritos, receita = receita + excluded.receita;
+            INSERT INTO ReceitaCategoriaMes (categoria, mes, inscritos, receita)
+            SELECT coalesce(new.categoria, ''), coalesce(substr(new.data, 1, 7), ''), inscritos,
+                   inscritos * coalesce(new.preco, 0)
+            FROM EstatisticasEvento WHERE evento_id = new.id
+            ON CONFLICT (categoria, mes) DO UPDATE SET
+                inscritos = inscritos + excluded.inscritos, receita = receita + excluded.receita;
+        END
+    """)
+    # Mudança de idade ou sexo move o usuário de faixa em cada evento de que participa
+    for linha, sinal in (('old', '-1'), ('new', '1')):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS analises_usuario_atualizar_{linha} AFTER UPDATE OF idade, sexo ON Usuarios
+            WHEN (old.idade IS NOT new.idade OR old.sexo IS NOT new.sexo) AND NOT EXISTS (SELECT 1 FROM AgregadosPausados)
+            BEGIN
+                INSERT INTO PerfilEvento (evento_id, faixa_etaria, sexo, inscritos)
+                SELECT evento_id, coalesce(({linha}.idade / 10) * 10, -1), coalesce({linha}.sexo, ''), {sinal}
+                FROM Participacoes WHERE usuario_id = {linha}.id
+                ON CONFLICT (evento_id, faixa_etaria, sexo) DO UPDATE SET inscritos = inscritos + excluded.inscritos;
+                INSERT INTO PerfilParticipantes (faixa_etaria, sexo, inscricoes)
+                SELECT coalesce(({linha}.idade / 10) * 10, -1), coalesce({linha}.sexo, ''), {sinal} * COUNT(*)
+                FROM Participacoes WHERE usuario_id = {linha}.id
+                ON CONFLICT (faixa_etaria, sexo) DO UPDATE SET inscricoes = inscricoes + excluded.inscricoes;
+            END
+        """)
+    # Ao apagar um evento ou usuário, as participações são apagadas antes (e não pelo ON DELETE CASCADE),
+    # para que os triggers acima ainda encontrem o evento e o usuário
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS analises_evento_apagar BEFORE DELETE ON Eventos BEGIN
+            DELETE FROM Participacoes WHERE evento_id = old.id;
+            DELETE FROM EstatisticasEvento WHERE evento_id = old.id;
+            DELETE FROM PerfilEvento WHERE evento_id = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS analises_usuario_apagar BEFORE DELETE ON Usuarios BEGIN
+            DELETE FROM Participacoes WHERE usuario_id = old.id;
+        END
+    """)
+    return novas
+
+@contextmanager
+def pausar(cursor, usar_numpy=None):
+    # Desliga os triggers durante uma carga em lote e reconstrói os agregados uma vez no fim
+    # Deve rodar dentro de uma transação de escrita: a pausa nunca chega a ser vista por outras conexões
+    cursor.execute("INSERT OR IGNORE INTO AgregadosPausados (id) VALUES (1)")
+    try:
+        yield
+    finally:
+        cursor.execute("DELETE FROM AgregadosPausados")
+    reconstruir(cursor, usar_numpy)
+
+def contar_python(participacoes, eventos, usuarios):
+    # Versão sem NumPy da contagem: participacoes = [(evento_id, usuario_id)],
+    # eventos = {id: (categoria, mes, preco)}, usuarios = {id: (faixa_etaria, sexo)}
+    por_evento = Counter()
+    perfil_evento = Counter()
+    for evento_id, usuario_id in participacoes:
+        por_evento[evento_id] += 1
+        perfil_evento[(evento_id,) + usuarios[usuario_id]] += 1
+    receita = Counter()
+    inscritos_categoria = Counter()
+    for evento_id, inscritos in por_evento.items():
+        categoria, mes, preco = eventos[evento_id]
+        inscritos_categoria[(categoria, mes)] += inscritos
+        receita[(categoria, mes)] += inscritos * preco
+    perfil_geral = Counter()
+    for (_, faixa, sexo), inscritos in perfil_evento.items():
+        perfil_geral[(faixa, sexo)] += inscritos
+    return (por_evento, {chave: (inscritos_categoria[chave], receita[chave]) for chave in inscritos_categoria},
+            perfil_evento, perfil_geral)
+
+def contar_numpy(participacoes, eventos, usuarios):
+    # Mesma contagem de contar_python, com bincount/unique sobre arrays de ids em vez de um laço por participação
+    if not participacoes:
+        return contar_python(participacoes, eventos, usuarios)
+    pares = np.array(participacoes, dtype=np.int64)
+    evento_ids, usuario_ids = pares[:, 0], pares[:, 1]
+
+    por_evento = np.bincount(evento_ids)
+    ids_com_inscritos = np.nonzero(por_evento)[0]
+
+    # Categoria/mês e perfil viram códigos inteiros para que cada grupo seja um índice de bincount
+    chaves_categoria = sorted({eventos[id][:2] for id in ids_com_inscritos.tolist()})
+    codigo_categoria = {chave: codigo for codigo, chave in enumerate(chaves_categoria)}
+    categorias = np.array([codigo_categoria[eventos[id][:2]] for id in ids_com_inscritos.tolist()], dtype=np.int64)
+    precos = np.array([eventos[id][2] for id in ids_com_inscritos.tolist()], dtype=np.float64)
+    inscritos = por_evento[ids_com_inscritos]
+    inscritos_categoria = np.bincount(categorias, weights=inscritos, minlength=len(chaves_categoria))
+    receita = np.bincount(categorias, weights=inscritos * precos, minlength=len(chaves_categoria))
+
+    chaves_perfil = sorted(set(usuarios.values()))
+    codigo_perfil = {chave: codigo for codigo, chave in enumerate(chaves_perfil)}
+    maior_usuario = max(usuarios) if usuarios else 0
+    perfil_por_usuario = np.zeros(maior_usuario + 1, dtype=np.int64)
+    for id, chave in usuarios.items():
+        perfil_por_usuario[id] = codigo_perfil[chave]
+    perfis = perfil_por_usuario[usuario_ids]
+    combinados, contagens = np.unique(evento_ids * len(chaves_perfil) + perfis, return_counts=True)
+    perfil_geral = np.bincount(perfis, minlength=len(chaves_perfil))
+
+    return ({int(id): int(por_evento[id]) for id in ids_com_inscritos},
+            {chave: (int(inscritos_categoria[codigo]), float(receita[codigo])) for codigo, chave in enumerate(chaves_categoria)},
+            {(int(chave // len(chaves_perfil)),) + chaves_perfil[chave % len(chaves_perfil)]: int(contagem)
+             for chave, contagem in zip(combinados.tolist(), contagens.tolist())},
+            {chave: int(perfil_geral[codigo]) for codigo, chave in enumerate(chaves_perfil) if perfil_geral[codigo]})
+
+def reconstruir(cursor, usar_numpy=None):
+    # Recalcula todos os agregados a partir das tabelas (carga inicial ou correção)
+    # usar_numpy=None: NumPy (se instalado) só a partir de MINIMO_NUMPY participações
+    eventos = {id: (categoria or '', (data or '')[:7], preco or 0.0)
+               for id, categoria, data, preco in cursor.execute("SELECT id, categoria, data, preco FROM Eventos")}
+    usuarios = {id: (faixa_etaria(idade), sexo or '')
+                for id, idade, sexo in cursor.execute("SELECT id, idade, sexo FROM Usuarios")}
+    participacoes = cursor.execute("SELECT evento_id, usuario_id FROM Participacoes").fetchall()
+    if usar_numpy is None:
+        usar_numpy = len(participacoes) >= MINIMO_NUMPY
+    contar = contar_numpy if usar_numpy and carregar_numpy() is not None else contar_python
+    por_evento, por_categoria, perfil_evento, perfil_geral = contar(participacoes, eventos, usuarios)
+
+    for tabela in ('EstatisticasEvento', 'ReceitaCategoriaMes', 'PerfilEvento', 'PerfilParticipantes'):
+        cursor.execute(f"DELETE FROM {tabela}")
+    cursor.executemany("INSERT INTO EstatisticasEvento (evento_id, inscritos) VALUES (?, ?)", por_evento.items())
+    cursor.executemany("""
+        INSERT INTO ReceitaCategoriaMes (categoria, mes, inscritos, receita) VALUES (?, ?, ?, ?)
+    """, (chave + valores for chave, valores in por_categoria.items()))
+    cursor.executemany("""
+        INSERT INTO PerfilEvento (evento_id, faixa_etaria, sexo, inscritos) VALUES (?, ?, ?, ?)
+    """, (chave + (inscritos,) for chave, inscritos in perfil_evento.items()))
+    cursor.executemany("""
+        INSERT INTO PerfilParticipantes (faixa_etaria, sexo, inscricoes) VALUES (?, ?, ?)
+    """, (chave + (inscricoes,) for chave, inscricoes in perfil_geral.items()))
+    return len(participacoes)
+
+# Consultas do painel: leituras diretas das tabelas de agregados, sem juntar as tabelas de origem
+class PainelAnalises:
+    def __init__(self, manipulador_dados):
+        self.manipulador_dados = manipulador_dados
+
+    def inscritos_do_evento(self, evento):
+        with self.manipulador_dados.leitura() as conexao:
+            linha = conexao.execute("SELECT inscritos FROM EstatisticasEvento WHERE evento_id = ?", (evento.id,)).fetchone()
+        return linha[0] if linha else 0
+
+    def receita_esperada(self, evento):
+        return self.inscritos_do_evento(evento) * (evento.preco or 0.0)
+
+    def receita_por_categoria(self, mes=None):
+        # Lista de (categoria, mês aaaa-mm, inscritos, receita); mes filtra um único mês
+        with self.manipulador_dados.leitura() as conexao:
+            if mes:
+                cursor = conexao.execute("""
+                    SELECT categoria, mes, inscritos, receita FROM ReceitaCategoriaMes
+                    WHERE mes = ? AND inscritos != 0 ORDER BY categoria
+                """, (mes,))
+            else:
+                cursor = conexao.execute("""
+                    SELECT categoria, mes, inscritos, receita FROM ReceitaCategoriaMes
+                    WHERE inscritos != 0 ORDER BY categoria, mes
+                """)
+            return cursor.fetchall()
+
+    def perfil_do_evento(self, evento):
+        # Lista de (faixa etária, sexo, inscritos) dos participantes do evento
+        with self.manipulador_dados.leitura() as conexao:
+            return conexao.execute("""
+                SELECT faixa_etaria, sexo, inscritos FROM PerfilEvento
+                WHERE evento_id = ? AND inscritos != 0 ORDER BY faixa_etaria, sexo
+            """, (evento.id,)).fetchall()
+
+    def perfil_geral(self):
+        # Lista de (faixa etária, sexo, inscrições) somando todos os eventos
+        with self.manipulador_dados.leitura() as conexao:
+            return conexao.execute("""
+                SELECT faixa_etaria, sexo, inscricoes FROM PerfilParticipantes
+                WHERE inscricoes != 0 ORDER BY faixa_etaria, sexo
+            """).fetchall()
+
+    def reconstruir(self, usar_numpy=None):
+        # Recalcula os agregados em uma transação; retorna a quantidade de participações lidas
+        with self.manipulador_dados.gravacao_no_cache():
+            return reconstruir(self.manipulador_dados.conexao.cursor(), usar_numpy)
@@ -0,0 +1,227 @@
+# Benchmarks do EventFest em bancos temporários gerados com benchmarks/gerador.py, em várias escalas
+# Grava os tempos em JSON para comparar execuções (--comparar resultado_anterior.json)
+# Uso: python benchmarks/desempenho.py [--tamanhos 1000 100000 1000000] [--repeticoes 5] [--saida resultados.json]
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import analises
+import gerador
+from EventFest import (ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos, ImportadorExportador,
+                       EventoConcreto, Usuario)
+
+# Diferença relativa a partir da qual a comparação marca um benchmark como regressão
+LIMIAR_REGRESSAO = 1.2
+
+# Tempo máximo (mediana, em segundos) do import do EventFest até o primeiro comando respondido, em qualquer escala
+ORCAMENTO_INICIALIZACAO = 0.25
+
+def medir(funcao, repeticoes, operacoes=1):
+    # Executa a função repeticoes vezes e resume os tempos (em segundos)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tempos)
+    return {'repeticoes': repeticoes, 'operacoes': operacoes, 'minimo': min(tempos), 'mediana': mediana,
+            'media': statistics.fmean(tempos), 'operacoes_por_segundo': operacoes / mediana if mediana else None}
+
+def medir_inicializacao(caminho, repeticoes):
+    # Tempo de um processo novo do import até o primeiro comando respondido (a primeira página dos próximos eventos)
+    # Não deve crescer com o banco: nada é aberto no import e a listagem não carrega o cache inteiro
+    codigo = """
+import sys, io, time, contextlib
+inicio = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import EventFest
+m = EventFest.ManipuladorDados(sys.argv[2])
+gu = EventFest.GerenciadorUsuarios(m)
+ge = EventFest.GerenciadorEventos(m, gu)
+with contextlib.redirect_stdout(io.StringIO()):
+    ge.listar_eventos_proximos(EventFest.TAMANHO_PAGINA)
+print(time.perf_counter() - inicio)
+"""
+    tempos = [float(subprocess.run([sys.executable, '-c', codigo, RAIZ, caminho], capture_output=True, text=True,
+                                   check=True).stdout) for _ in range(repeticoes)]
+    return {'repeticoes': repeticoes, 'operacoes': 1, 'minimo': min(tempos), 'mediana': statistics.median(tempos),
+            'media': statistics.fmean(tempos), 'operacoes_por_segundo': 1 / statistics.median(tempos)}
+
+def executar_escala(participacoes, repeticoes, semente, diretorio):
+    total_usuarios, total_eventos, total_participacoes = gerador.proporcoes(participacoes)
+    caminho = os.path.join(diretorio, f"dados_{participacoes}.db")
+    resultados = {}
+
+    inicio = time.perf_counter()
+    dados = gerador.gerar(total_usuarios, total_eventos, total_participacoes, semente)
+    resultados['gerar_dados'] = {'segundos': time.perf_counter() - inicio}
+    manipulador = ManipuladorDados(caminho)
+    resultados['popular_banco'] = medir(lambda: gerador.popular_banco(manipulador, dados), 1, total_participacoes)
+
+    # Amostras fixas (mesma semente) de nomes usados nas operações pontuais
+    aleatorio = random.Random(semente)
+    nomes_usuarios = [linha[0] for linha in aleatorio.sample(dados['usuarios'], min(200, total_usuarios))]
+    nomes_eventos = [linha[0] for linha in aleatorio.sample(dados['eventos'], min(200, total_eventos))]
+    palavras = [linha[7].split()[0] for linha in aleatorio.sample(dados['eventos'], min(50, total_eventos))]
+    ceps = [cep for cep, _, _ in aleatorio.sample(dados['ceps'], min(50, len(dados['ceps'])))]
+    del dados
+
+    resultados['inicializacao'] = medir_inicializacao(caminho, repeticoes)
+    resultados['carregar_dados'] = medir(manipulador.carregar_dados, repeticoes)
+    resultados['recarregar_cache'] = medir(manipulador.cache.recarregar, repeticoes)
+
+    gerenciador_usuarios = GerenciadorUsuarios(manipulador)
+    gerenciador_eventos = GerenciadorEventos(manipulador, gerenciador_usuarios)
+    usuarios = [gerenciador_usuarios.buscar_usuario(nome) for nome in nomes_usuarios]
+    eventos = [gerenciador_eventos.buscar_evento(nome) for nome in nomes_eventos]
+
+    with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+        resultados['listar_usuarios'] = medir(gerenciador_usuarios.listar_usuarios, repeticoes, total_usuarios)
+        resultados['listar_eventos'] = medir(gerenciador_eventos.listar_eventos, repeticoes, total_eventos)
+        resultados['listar_eventos_proximos'] = medir(gerenciador_eventos.listar_eventos_proximos, repeticoes)
+        resultados['listar_eventos_passados'] = medir(gerenciador_eventos.listar_eventos_passados, repeticoes)
+        resultados['listar_eventos_filtrados'] = medir(
+            lambda: gerenciador_eventos.listar_eventos('preco', categoria='Música', preco_min=20, preco_max=80),
+            repeticoes)
+
+    def eventos_dos_usuarios():
+        for nome in nomes_usuarios:
+            gerenciador_eventos.eventos_do_usuario(nome)
+    resultados['listar_eventos_do_usuario'] = medir(eventos_dos_usuarios, repeticoes, len(nomes_usuarios))
+
+    def participantes_no_banco():
+        for evento in eventos:
+            manipulador.buscar_participantes(evento)
+    resultados['buscar_participantes'] = medir(participantes_no_banco, repeticoes, len(eventos))
+
+    def inscrever_e_cancelar():
+        for nome_evento, nome_usuario in zip(nomes_eventos, nomes_usuarios):
+            try:
+                gerenciador_eventos.inscrever(nome_evento, nome_usuario)
+            except ValueError:
+                pass
+            try:
+                gerenciador_eventos.desinscrever(nome_evento, nome_usuario)
+            except ValueError:
+                pass
+    operacoes = 2 * min(len(nomes_eventos), len(nomes_usuarios))
+    resultados['inscrever_e_cancelar'] = medir(inscrever_e_cancelar, repeticoes, operacoes)
+
+    def lote_de_inscricoes():
+        pares = list(zip(nomes_eventos, nomes_usuarios))
+        gerenciador_eventos.processar_lote([('inscrever', evento, usuario) for evento, usuario in pares])
+        gerenciador_eventos.processar_lote([('desinscrever', evento, usuario) for evento, usuario in pares])
+    resultados['processar_lote'] = medir(lote_de_inscricoes, repeticoes, operacoes)
+
+    def salvar_dados():
+        # Caminho de compatibilidade: grava um usuário, um evento e uma participação em uma transação
+        usuario = Usuario('Benchmark', 30, 'F', '', '', '')
+        evento = EventoConcreto('Evento benchmark', '', '', 10, 'Teatro', '01/01/2030', '20:00', '')
+        manipulador.salvar_dados(None, usuario, evento, usuario, evento, None)
+        manipulador.remover_participacao(evento, usuario)
+    resultados['salvar_dados'] = medir(salvar_dados, repeticoes)
+    manipulador.cache.invalidar()
+
+    def pesquisar():
+        for palavra in palavras:
+            manipulador.buscar_eventos_texto(palavra)
+    resultados['buscar_eventos_texto'] = medir(pesquisar, repeticoes, len(palavras))
+
+    def perto():
+        for cep in ceps:
+            manipulador.buscar_eventos_perto(cep)
+    resultados['buscar_eventos_perto'] = medir(perto, repeticoes, len(ceps))
+
+    painel = analises.PainelAnalises(manipulador)
+    def consultar_painel():
+        for evento in eventos:
+            painel.inscritos_do_evento(evento)
+            painel.perfil_do_evento(evento)
+        painel.receita_por_categoria()
+        painel.perfil_geral()
+    resultados['painel_analises'] = medir(consultar_painel, repeticoes, 2 * len(eventos) + 2)
+    resultados['reconstruir_analises'] = medir(painel.reconstruir, repeticoes, total_participacoes)
+
+    importador = ImportadorExportador(manipulador)
+    arquivo = os.path.join(diretorio, f"participacoes_{participacoes}.csv")
+    resultados['exportar_participacoes'] = medir(lambda: importador.exportar('participacoes', arquivo), 1,
+                                                 total_participacoes)
+    resultados['importar_participacoes'] = medir(lambda: importador.importar('participacoes', arquivo), 1,
+                                                 total_participacoes)
+    manipulador.fechar()
+
+    return {'participacoes': total_participacoes, 'usuarios': total_usuarios, 'eventos': total_eventos,
+            'resultados': resultados}
+
+def comparar(atual, anterior):
+    # Mostra a razão entre as medianas (atual / anterior) de cada benchmark presente nas duas execuções
+    anteriores = {escala['participacoes']: escala['resultados'] for escala in anterior['escalas']}
+    for escala in atual['escalas']:
+        resultados_anteriores = anteriores.get(escala['participacoes'])
+        if not resultados_anteriores:
+            continue
+        print(f"\nComparação com a execução anterior ({escala['participacoes']} participações):")
+        for nome, resultado in escala['resultados'].items():
+            anterior_resultado = resultados_anteriores.get(nome)
+            if not anterior_resultado or 'mediana' not in resultado or not anterior_resultado.get('mediana'):
+                continue
+            razao = resultado['mediana'] / anterior_resultado['mediana']
+            marca = "  <- mais lento" if razao > LIMIAR_REGRESSAO else ""
+            print(f"  {nome:28} {razao:6.2f}x{marca}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do EventFest com dados sintéticos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 100000],
+                        help="quantidades de participações (usuários = N/10, eventos = N/100)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default='resultados_benchmark.json')
+    parser.add_argument('--comparar', help="JSON de uma execução anterior")
+    argumentos = parser.parse_args()
+
+    resultado = {'gerado_em': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'sqlite': sqlite3.sqlite_version, 'numpy': analises.carregar_numpy() is not None, 'semente': argumentos.semente,
+                 'repeticoes': argumentos.repeticoes, 'escalas': []}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for tamanho in argumentos.tamanhos:
+            escala = executar_escala(tamanho, argumentos.repeticoes, argumentos.semente, diretorio)
+            resultado['escalas'].append(escala)
+            print(f"\n{escala['participacoes']} participações, {escala['usuarios']} usuários, {escala['eventos']} eventos")
+            for nome, medida in escala['resultados'].items():
+                if 'mediana' in medida:
+                    por_segundo = medida['operacoes_por_segundo']
+                    print(f"  {nome:28} {medida['mediana'] * 1000:10.2f} ms  {por_segundo:12.0f} op/s")
+                else:
+                    print(f"  {nome:28} {medida['segundos'] * 1000:10.2f} ms")
+
+    with open(argumentos.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {argumentos.saida}")
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as arquivo:
+            comparar(resultado, json.load(arquivo))
+
+    acima = [escala['participacoes'] for escala in resultado['escalas']
+             if escala['resultados']['inicializacao']['mediana'] > ORCAMENTO_INICIALIZACAO]
+    if acima:
+        print(f"\nInicialização acima do orçamento de {ORCAMENTO_INICIALIZACAO * 1000:.0f} ms em: "
+              f"{', '.join(map(str, acima))} participações")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
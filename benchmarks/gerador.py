@@ -0,0 +1,128 @@
+# Gerador de dados sintéticos reproduzíveis (mesma semente = mesmos dados) para os benchmarks
+# Produz linhas prontas para INSERT em Usuarios, Eventos, Participacoes e Ceps de um banco novo (ids 1..n)
+import os
+import sys
+import random
+import string
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analises
+from EventFest import calcular_data_hora, normalizar_cep
+
+# Categorias com peso aproximado de popularidade
+CATEGORIAS = {'Música': 30, 'Teatro': 15, 'Esporte': 15, 'Tecnologia': 10, 'Gastronomia': 10,
+              'Cinema': 8, 'Feira': 7, 'Palestra': 5}
+
+PALAVRAS = ['show', 'festival', 'música', 'rock', 'samba', 'forró', 'jazz', 'teatro', 'comédia', 'drama',
+            'corrida', 'maratona', 'futebol', 'vôlei', 'palestra', 'workshop', 'tecnologia', 'python', 'dados',
+            'feira', 'artesanato', 'gastronômica', 'café', 'vinho', 'cerveja', 'cinema', 'mostra', 'clássico',
+            'infantil', 'família', 'noite', 'verão', 'inverno', 'primavera', 'junina', 'ação', 'encontro', 'são',
+            'paulo', 'rio', 'centro', 'praça', 'parque', 'praia', 'estação', 'orquestra', 'coral', 'dança']
+
+# Centros (latitude, longitude) em volta dos quais os CEPs são espalhados, com o peso de cada cidade
+CIDADES = [((-23.55, -46.63), 50), ((-22.91, -43.17), 30), ((-19.92, -43.94), 20)]
+
+HORAS = ['09:00', '10:00', '14:00', '16:00', '18:00', '19:00', '20:00', '21:00', '22:00']
+PESOS_HORAS = [3, 4, 4, 5, 8, 12, 16, 12, 6]
+
+def proporcoes(participacoes):
+    # Tamanhos usados na escala "N participações": N/10 usuários e N/100 eventos
+    return max(participacoes // 10, 10), max(participacoes // 100, 5), participacoes
+
+def palavra_aleatoria(aleatorio):
+    # Mistura o vocabulário fixo com palavras inventadas, para um vocabulário grande como o de dados reais
+    if aleatorio.random() < 0.6:
+        return aleatorio.choice(PALAVRAS)
+    return ''.join(aleatorio.choice(string.ascii_lowercase) for _ in range(aleatorio.randint(4, 9)))
+
+def gerar_ceps(quantidade, aleatorio):
+    # Lista de (cep, latitude, longitude) concentrados nas cidades de CIDADES
+    centros = [centro for centro, _ in CIDADES]
+    pesos = [peso for _, peso in CIDADES]
+    ceps = {}
+    while len(ceps) < quantidade:
+        latitude, longitude = aleatorio.choices(centros, pesos)[0]
+        cep = f"{aleatorio.randrange(1000, 99999):05d}-{aleatorio.randrange(1000):03d}"
+        ceps[cep] = (round(latitude + aleatorio.gauss(0, 0.15), 6), round(longitude + aleatorio.gauss(0, 0.15), 6))
+    return [(cep, latitude, longitude) for cep, (latitude, longitude) in ceps.items()]
+
+def gerar_usuarios(quantidade, ceps, aleatorio):
+    # Linhas (nome, idade, sexo, telefone, endereco, cep)
+    return [(f"Usuario {i}", min(max(int(aleatorio.gauss(34, 12)), 14), 90), aleatorio.choice('MF'),
+             f"9{aleatorio.randrange(10 ** 8):08d}", f"Rua {palavra_aleatoria(aleatorio).title()}, {aleatorio.randint(1, 2000)}",
+             aleatorio.choice(ceps)[0])
+            for i in range(1, quantidade + 1)]
+
+def gerar_eventos(quantidade, ceps, aleatorio, hoje=None):
+    # Linhas (nome, endereco, cep, preco, categoria, data, hora, descricao, data_hora, capacidade)
+    # As datas vão de um ano atrás a um ano à frente, com mais eventos no fim de semana e à noite
+    hoje = (hoje or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    categorias = list(CATEGORIAS)
+    acumulado_categorias = list(accumulate(CATEGORIAS.values()))
+    eventos = []
+    for i in range(1, quantidade + 1):
+        data = hoje + timedelta(days=aleatorio.randint(-365, 365))
+        if data.weekday() < 4 and aleatorio.random() < 0.4:
+            data += timedelta(days=5 - data.weekday())
+        hora = aleatorio.choices(HORAS, PESOS_HORAS)[0]
+        categoria = aleatorio.choices(categorias, cum_weights=acumulado_categorias)[0]
+        preco = 0.0 if aleatorio.random() < 0.1 else round(aleatorio.lognormvariate(3.5, 0.8), 2)
+        nome = f"{categoria} {' '.join(palavra_aleatoria(aleatorio) for _ in range(2))} {i}"
+        descricao = ' '.join(palavra_aleatoria(aleatorio) for _ in range(aleatorio.randint(5, 20)))
+        eventos.append((nome, f"Avenida {palavra_aleatoria(aleatorio).title()}, {aleatorio.randint(1, 5000)}",
+                        aleatorio.choice(ceps)[0], preco, categoria, data.strftime('%Y-%m-%d'), hora, descricao,
+                        calcular_data_hora(data, hora), None))
+    return eventos
+
+def gerar_participacoes(quantidade, total_usuarios, total_eventos, aleatorio):
+    # Pares (evento_id, usuario_id) sem repetição; a popularidade dos eventos segue uma lei de Zipf
+    quantidade = min(quantidade, total_usuarios * total_eventos)
+    acumulado = list(accumulate(1.0 / posicao for posicao in range(1, total_eventos + 1)))
+    ordem = list(range(1, total_eventos + 1))
+    aleatorio.shuffle(ordem)
+    pares = set()
+    while len(pares) < quantidade:
+        faltam = quantidade - len(pares)
+        eventos = aleatorio.choices(ordem, cum_weights=acumulado, k=faltam)
+        pares.update(zip(eventos, (aleatorio.randint(1, total_usuarios) for _ in range(faltam))))
+    return sorted(pares, key=lambda par: aleatorio.random())
+
+def definir_capacidades(eventos, participacoes, aleatorio, fracao=0.2):
+    # Dá capacidade a uma parte dos eventos, sempre maior ou igual aos inscritos gerados (sem venda além do limite)
+    inscritos = {}
+    for evento_id, _ in participacoes:
+        inscritos[evento_id] = inscritos.get(evento_id, 0) + 1
+    for posicao, evento in enumerate(eventos):
+        if aleatorio.random() < fracao:
+            capacidade = inscritos.get(posicao + 1, 0) + aleatorio.randint(0, 50)
+            eventos[posicao] = evento[:9] + (capacidade,)
+
+def gerar(usuarios, eventos, participacoes, semente=42, hoje=None):
+    # Gera todos os dados de uma vez; retorna um dicionário com as listas de linhas
+    aleatorio = random.Random(semente)
+    ceps = gerar_ceps(max(eventos // 10, 50), aleatorio)
+    linhas_usuarios = gerar_usuarios(usuarios, ceps, aleatorio)
+    linhas_eventos = gerar_eventos(eventos, ceps, aleatorio, hoje)
+    pares = gerar_participacoes(participacoes, usuarios, eventos, aleatorio)
+    definir_capacidades(linhas_eventos, pares, aleatorio)
+    return {'ceps': ceps, 'usuarios': linhas_usuarios, 'eventos': linhas_eventos, 'participacoes': pares}
+
+def popular_banco(manipulador, dados):
+    # Grava os dados gerados em um banco novo, em uma transação; os agregados são calculados uma vez no fim
+    with manipulador.unidade_de_trabalho():
+        cursor = manipulador.conexao.cursor()
+        cursor.executemany("INSERT INTO Ceps (cep, latitude, longitude) VALUES (?, ?, ?)",
+                           ((normalizar_cep(cep), latitude, longitude) for cep, latitude, longitude in dados['ceps']))
+        cursor.executemany("""
+            INSERT INTO Usuarios (nome, idade, sexo, telefone, endereco, cep) VALUES (?, ?, ?, ?, ?, ?)
+        """, dados['usuarios'])
+        cursor.executemany("""
+            INSERT INTO Eventos (nome, endereco, cep, preco, categoria, data, hora, descricao, data_hora, capacidade)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, dados['eventos'])
+        with analises.pausar(cursor):
+            cursor.executemany("INSERT INTO Participacoes (evento_id, usuario_id) VALUES (?, ?)", dados['participacoes'])
+    manipulador.cache.invalidar()
@@ -0,0 +1,104 @@
+# Mede a memória ocupada pelo RegistroEventos antes e depois do uso de __slots__ e dos arrays de ids,
+# no total e por registro (bytes por usuário, por evento e por participação)
+# Uso: python benchmarks/memoria.py [usuarios] [eventos] [participacoes]
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gerador
+from EventFest import EventoConcreto, Usuario, RegistroEventos, converter_data, combinar_data_hora
+
+# Versões antigas dos registros (com __dict__ e nomes como chave da adjacência), só para comparação
+class EventoAntigo:
+    def __init__(self, nome, endereco, cep, preco, categoria, data, hora, descricao, id=None):
+        self.id = id
+        self.nome = nome
+        self.endereco = endereco
+        self.cep = cep
+        self.preco = float(preco)
+        self.categoria = categoria
+        self.data = converter_data(data)
+        self.hora = hora
+        self.descricao = descricao
+        self.participantes = []
+        self.data_hora = combinar_data_hora(self.data, hora)
+
+class UsuarioAntigo:
+    def __init__(self, nome, idade, sexo, telefone, endereco, cep, id=None):
+        self.id = id
+        self.nome = nome
+        self.idade = int(idade)
+        self.sexo = sexo
+        self.telefone = telefone
+        self.endereco = endereco
+        self.cep = cep
+
+def gerar_linhas(total_usuarios, total_eventos, total_participacoes, semente=42):
+    # Linhas do gerador de benchmarks com o id na frente, como viriam de um SELECT id, ...
+    dados = gerador.gerar(total_usuarios, total_eventos, total_participacoes, semente)
+    usuarios = [(id,) + linha for id, linha in enumerate(dados['usuarios'], start=1)]
+    eventos = [(id,) + linha[:8] for id, linha in enumerate(dados['eventos'], start=1)]
+    return usuarios, eventos, sorted(dados['participacoes'])
+
+def carregar_antigo(usuarios, eventos, pares):
+    # Reproduz o formato anterior: objetos com __dict__ e dicionários de nomes por evento/usuário
+    # Os demais índices (por nome, categoria, CEP, data) são os mesmos nas duas versões
+    registro = RegistroEventos()
+    for linha in usuarios:
+        registro.adicionar_usuario(UsuarioAntigo(*linha[1:], id=linha[0]))
+    for linha in eventos:
+        registro.adicionar_evento(EventoAntigo(*linha[1:], id=linha[0]))
+    for evento_id, usuario_id in pares:
+        nome_evento = registro.eventos_por_id[evento_id].nome
+        nome_usuario = registro.usuarios_por_id[usuario_id].nome
+        registro.participantes_por_evento.setdefault(nome_evento, {})[nome_usuario] = None
+        registro.eventos_por_participante.setdefault(nome_usuario, {})[nome_evento] = None
+    return registro
+
+def carregar_novo(usuarios, eventos, pares):
+    registro = RegistroEventos()
+    dados = {'usuarios': [Usuario(*linha[1:], id=linha[0]) for linha in usuarios],
+             'eventos': [EventoConcreto(*linha[1:], id=linha[0]) for linha in eventos]}
+    registro.carregar(dados, pares)
+    return registro
+
+def medir(funcao, *argumentos):
+    tracemalloc.start()
+    resultado = funcao(*argumentos)
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, atual
+
+def bytes_por_registro(carregar, usuarios, eventos, pares):
+    # Carrega cada tipo por cima dos anteriores e divide a diferença de memória pela quantidade de registros
+    # (um evento inclui os índices por nome, categoria, CEP e data; uma participação, as duas adjacências)
+    _, vazio = medir(carregar, [], [], [])
+    _, com_usuarios = medir(carregar, usuarios, [], [])
+    _, com_eventos = medir(carregar, usuarios, eventos, [])
+    _, total = medir(carregar, usuarios, eventos, pares)
+    return total, {'usuário': (com_usuarios - vazio) / max(len(usuarios), 1),
+                   'evento': (com_eventos - com_usuarios) / max(len(eventos), 1),
+                   'participação': (total - com_eventos) / max(len(pares), 1)}
+
+def main():
+    total_usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    total_eventos = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    total_participacoes = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    linhas = gerar_linhas(total_usuarios, total_eventos, total_participacoes)
+
+    antes, por_registro_antes = bytes_por_registro(carregar_antigo, *linhas)
+    depois, por_registro_depois = bytes_por_registro(carregar_novo, *linhas)
+
+    print("Usuários: %d  Eventos: %d  Participações: %d" % (total_usuarios, total_eventos, len(linhas[2])))
+    print("Antes:  %8.1f MB" % (antes / 2 ** 20))
+    print("Depois: %8.1f MB" % (depois / 2 ** 20))
+    print("Redução: %.0f%%" % (100 * (1 - depois / antes)))
+    print("\nBytes por registro      Antes    Depois")
+    for tipo in por_registro_antes:
+        print("  %-16s %9.0f %9.0f" % (tipo, por_registro_antes[tipo], por_registro_depois[tipo]))
+
+if __name__ == "__main__":
+    main()
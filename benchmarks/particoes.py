@@ -0,0 +1,106 @@
+# Compara a vazão de leitura de um banco único com a do BancoParticionado (uma partição por região do CEP),
+# com os mesmos dados sintéticos de benchmarks/gerador.py. As consultas das partições rodam em processos separados,
+# então o ganho aparece com mais de um núcleo; com um só, a diferença mostra o custo da distribuição.
+# Uso: python benchmarks/particoes.py [--participacoes 200000] [--particoes 4] [--consultas 200]
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gerador
+from EventFest import ManipuladorDados
+from particoes import BancoParticionado, ParticaoPorCep
+
+def dividir_dados(dados, regra):
+    # Separa os eventos (e as participações deles) por partição, renumerando os ids de cada banco a partir de 1;
+    # usuários e CEPs vão inteiros para todas as partições
+    por_particao = {nome: {'ceps': dados['ceps'], 'usuarios': dados['usuarios'], 'eventos': [], 'participacoes': []}
+                    for nome in regra.nomes()}
+    novo_id = {}
+    for id_antigo, linha in enumerate(dados['eventos'], start=1):
+        destino = por_particao[regra.particao(linha[2], linha[5])]
+        destino['eventos'].append(linha)
+        novo_id[id_antigo] = (destino, len(destino['eventos']))
+    for evento_id, usuario_id in dados['participacoes']:
+        destino, id_local = novo_id[evento_id]
+        destino['participacoes'].append((id_local, usuario_id))
+    return por_particao
+
+def consultas(aleatorio, palavras, quantidade):
+    # Mistura de listagens filtradas, ordenações e buscas textuais, sempre com os mesmos sorteios
+    categorias = list(gerador.CATEGORIAS)
+    for _ in range(quantidade):
+        tipo = aleatorio.random()
+        if tipo < 0.4:
+            yield 'buscar_eventos', ('preco', True), {'categoria': aleatorio.choice(categorias), 'limite': 50}
+        elif tipo < 0.7:
+            yield 'buscar_eventos_proximos', (50,), {'preco_max': aleatorio.randint(10, 100)}
+        else:
+            yield 'buscar_eventos_texto', (aleatorio.choice(palavras),), {}
+
+def executar_unico(manipulador, consulta):
+    # Mesmas consultas no banco único, pelos métodos equivalentes do ManipuladorDados
+    metodo, argumentos, opcoes = consulta
+    if metodo == 'buscar_eventos':
+        opcoes = dict(opcoes)
+        limite = opcoes.pop('limite')
+        eventos = manipulador.iterar_eventos(*argumentos, **opcoes)
+        return [evento for _, evento in zip(range(limite), eventos)]
+    return getattr(manipulador, metodo)(*argumentos, **opcoes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de leitura: banco único x partições por região do CEP")
+    parser.add_argument('--participacoes', type=int, default=200000)
+    parser.add_argument('--particoes', type=int, default=4)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semente', type=int, default=42)
+    argumentos = parser.parse_args()
+
+    usuarios, eventos, participacoes = gerador.proporcoes(argumentos.participacoes)
+    dados = gerador.gerar(usuarios, eventos, participacoes, argumentos.semente)
+    # O primeiro dígito do CEP gerado é uniforme: as partições dividem os dígitos 0-9 entre si
+    digitos = {f"regiao{i}": tuple(str(d) for d in range(10) if d % argumentos.particoes == i)
+               for i in range(1, argumentos.particoes)}
+    regra = ParticaoPorCep(digitos, 'regiao0')
+    palavras = [linha[7].split()[0] for linha in random.Random(argumentos.semente).sample(dados['eventos'], 50)]
+    lista = list(consultas(random.Random(argumentos.semente), palavras, argumentos.consultas))
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        unico = ManipuladorDados(os.path.join(diretorio, 'unico.db'))
+        gerador.popular_banco(unico, dados)
+        caminhos = {}
+        for nome, parte in dividir_dados(dados, regra).items():
+            caminhos[nome] = os.path.join(diretorio, f"{nome}.db")
+            manipulador = ManipuladorDados(caminhos[nome])
+            gerador.popular_banco(manipulador, parte)
+            manipulador.fechar()
+        del dados
+
+        inicio = time.perf_counter()
+        for consulta in lista:
+            executar_unico(unico, consulta)
+        tempo_unico = time.perf_counter() - inicio
+        unico.fechar()
+
+        banco = BancoParticionado(caminhos, regra)
+        # A primeira rodada abre os processos e as conexões de leitura; só a segunda é medida
+        for metodo, args, opcoes in lista[:len(caminhos)]:
+            getattr(banco, metodo)(*args, **opcoes)
+        inicio = time.perf_counter()
+        for metodo, args, opcoes in lista:
+            getattr(banco, metodo)(*args, **opcoes)
+        tempo_particoes = time.perf_counter() - inicio
+        banco.fechar()
+
+    print(f"{participacoes} participações, {eventos} eventos, {len(caminhos)} partições, "
+          f"{banco.processos} processos de leitura, {os.cpu_count()} núcleos")
+    print(f"Banco único: {len(lista) / tempo_unico:8.1f} consultas/s")
+    print(f"Partições:   {len(lista) / tempo_particoes:8.1f} consultas/s ({tempo_unico / tempo_particoes:.2f}x)")
+
+if __name__ == "__main__":
+    main()
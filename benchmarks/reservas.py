@@ -0,0 +1,135 @@
+# Teste de estresse da reserva de vagas: vários processos, cada um com várias threads, disputando as vagas
+# de um mesmo evento em um único arquivo de banco. Verifica que nunca há mais inscritos que a capacidade e que a
+# lista de espera é promovida em ordem de chegada, e mostra a vazão (reservas/s).
+# Uso: python benchmarks/reservas.py [--processos 4] [--threads 4] [--usuarios 2000] [--capacidade 500]
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from EventFest import ManipuladorDados, EventoConcreto, Usuario, SituacaoReserva
+
+NOME_EVENTO = 'Lançamento'
+
+def preparar_banco(caminho, total_usuarios, capacidade):
+    manipulador = ManipuladorDados(caminho)
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.executemany(
+            "INSERT INTO Usuarios (nome, idade, sexo, telefone, endereco, cep) VALUES (?, 30, 'F', '', '', '')",
+            ((f'Usuario {i}',) for i in range(total_usuarios)))
+    evento = EventoConcreto(NOME_EVENTO, 'Rua', '00000-000', 100, 'Show', '01/01/2030', '20:00', 'Estresse',
+                            capacidade=capacidade)
+    manipulador.salvar_evento(evento)
+    manipulador.fechar()
+
+def reservar_parte(argumentos):
+    # Executado em cada processo: abre o próprio ManipuladorDados e divide os usuários entre as threads
+    caminho, ids_usuarios, threads, semente = argumentos
+    manipulador = ManipuladorDados(caminho)
+    evento_id = manipulador.conexao.execute("SELECT id FROM Eventos WHERE nome = ?", (NOME_EVENTO,)).fetchone()[0]
+    evento = EventoConcreto(NOME_EVENTO, '', '', 0, '', '01/01/2030', '20:00', '', id=evento_id)
+    contagem = {situacao.value: 0 for situacao in SituacaoReserva}
+    trava_contagem = threading.Lock()
+    ids_usuarios = list(ids_usuarios)
+    random.Random(semente).shuffle(ids_usuarios)
+
+    def trabalhar(ids):
+        for usuario_id in ids:
+            usuario = Usuario('', 0, '', '', '', '', id=usuario_id)
+            situacao, _ = manipulador.reservar_vaga(evento, usuario)
+            with trava_contagem:
+                contagem[situacao.value] += 1
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhar, args=(ids_usuarios[i::threads],)) for i in range(threads)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    segundos = time.perf_counter() - inicio
+    manipulador.fechar()
+    return contagem, segundos
+
+def verificar(caminho, total_usuarios, capacidade, cancelamentos, semente):
+    manipulador = ManipuladorDados(caminho)
+    conexao = manipulador.conexao
+    evento_id = conexao.execute("SELECT id FROM Eventos WHERE nome = ?", (NOME_EVENTO,)).fetchone()[0]
+    inscritos = conexao.execute("SELECT COUNT(*) FROM Participacoes WHERE evento_id = ?", (evento_id,)).fetchone()[0]
+    na_fila = conexao.execute("SELECT COUNT(*) FROM ListaEspera WHERE evento_id = ?", (evento_id,)).fetchone()[0]
+    em_ambos = conexao.execute("""
+        SELECT COUNT(*) FROM Participacoes p JOIN ListaEspera l USING (evento_id, usuario_id)
+    """).fetchone()[0]
+    assert inscritos == min(capacidade, total_usuarios), f"{inscritos} inscritos para {capacidade} vagas"
+    assert inscritos + na_fila == total_usuarios, f"{inscritos} inscritos + {na_fila} na fila != {total_usuarios}"
+    assert em_ambos == 0, f"{em_ambos} usuários inscritos e na fila ao mesmo tempo"
+
+    # Cancela alguns inscritos: os primeiros da fila devem ocupar as vagas, na ordem de chegada
+    evento = EventoConcreto(NOME_EVENTO, '', '', 0, '', '01/01/2030', '20:00', '', id=evento_id)
+    fila = [usuario_id for (usuario_id,) in conexao.execute(
+        "SELECT usuario_id FROM ListaEspera WHERE evento_id = ? ORDER BY id", (evento_id,))]
+    participantes = [usuario_id for (usuario_id,) in conexao.execute(
+        "SELECT usuario_id FROM Participacoes WHERE evento_id = ?", (evento_id,))]
+    promovidos = []
+    for usuario_id in random.Random(semente).sample(participantes, min(cancelamentos, len(participantes))):
+        removido, novos = manipulador.cancelar_reserva(evento, Usuario('', 0, '', '', '', '', id=usuario_id))
+        assert removido
+        promovidos.extend(novos)
+    assert promovidos == fila[:len(promovidos)], "a lista de espera não foi promovida em ordem de chegada"
+    assert len(promovidos) == min(len(fila), cancelamentos)
+    inscritos = conexao.execute("SELECT COUNT(*) FROM Participacoes WHERE evento_id = ?", (evento_id,)).fetchone()[0]
+    assert inscritos <= capacidade, f"{inscritos} inscritos para {capacidade} vagas após os cancelamentos"
+    manipulador.fechar()
+    return inscritos, na_fila, len(promovidos)
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de estresse da reserva de vagas com lista de espera")
+    parser.add_argument('--banco', help="arquivo do banco (padrão: um dados.db em diretório temporário)")
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--capacidade', type=int, default=500)
+    parser.add_argument('--cancelamentos', type=int, default=100)
+    parser.add_argument('--semente', type=int, default=42)
+    argumentos = parser.parse_args()
+
+    diretorio = None
+    caminho = argumentos.banco
+    if caminho is None:
+        diretorio = tempfile.TemporaryDirectory()
+        caminho = os.path.join(diretorio.name, 'dados.db')
+    preparar_banco(caminho, argumentos.usuarios, argumentos.capacidade)
+
+    ids = list(range(1, argumentos.usuarios + 1))
+    partes = [(caminho, ids[i::argumentos.processos], argumentos.threads, argumentos.semente + i)
+              for i in range(argumentos.processos)]
+    inicio = time.perf_counter()
+    with Pool(argumentos.processos) as pool:
+        resultados = pool.map(reservar_parte, partes)
+    segundos = time.perf_counter() - inicio
+
+    contagem = {situacao.value: 0 for situacao in SituacaoReserva}
+    for parcial, _ in resultados:
+        for situacao, quantidade in parcial.items():
+            contagem[situacao] += quantidade
+    inscritos, na_fila, promovidos = verificar(caminho, argumentos.usuarios, argumentos.capacidade,
+                                               argumentos.cancelamentos, argumentos.semente)
+
+    print(f"{argumentos.processos} processos x {argumentos.threads} threads, {argumentos.usuarios} usuários, "
+          f"capacidade {argumentos.capacidade}")
+    print(f"Inscritos: {contagem['inscrito']}  Lista de espera: {contagem['lista_de_espera']}  "
+          f"Repetidos: {contagem['ja_inscrito'] + contagem['ja_na_lista']}")
+    print(f"Reservas: {argumentos.usuarios} em {segundos:.2f}s ({argumentos.usuarios / segundos:.0f} reservas/s)")
+    print(f"Após {argumentos.cancelamentos} cancelamentos: {inscritos} inscritos, {promovidos} promovidos da fila "
+          f"de {na_fila}")
+    print("OK: nenhuma vaga vendida além da capacidade")
+    if diretorio:
+        diretorio.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+# Diário (journal) só de acréscimo com os fatos do domínio: usuário registrado, evento criado, participação
+# adicionada/cancelada etc., cada um com um número de sequência crescente. Triggers gravam as entradas na mesma
+# transação da alteração, então qualquer caminho de gravação (menu, servidor, importação) aparece no diário
+# Consumidores (e-mails, análises, impressão de crachás) leem só o que veio depois do último número que processaram;
+# instantâneos compactados do estado completo permitem começar do último instantâneo e reaplicar só o final do diário
+# Uso como consumidor: python diario.py --banco dados.db [--apos N | --consumidor nome] [--seguir]
+import json
+import time
+import zlib
+
+# Entradas lidas por consulta na assinatura
+TAMANHO_LOTE = 500
+
+# Espera (segundos) entre consultas quando a assinatura já entregou tudo
+INTERVALO_ASSINATURA = 0.5
+
+# Novas entradas a partir das quais manter() grava um instantâneo e compacta o diário
+ENTRADAS_POR_INSTANTANEO = 10000
+
+# Instantâneos mantidos pela compactação; o diário é podado só até o mais antigo deles
+INSTANTANEOS_MANTIDOS = 2
+
+# Colunas de cada registro gravadas nas entradas e nos instantâneos
+COLUNAS_USUARIO = ('id', 'nome', 'idade', 'sexo', 'telefone', 'endereco', 'cep')
+COLUNAS_EVENTO = ('id', 'nome', 'endereco', 'cep', 'preco', 'categoria', 'data', 'hora', 'descricao', 'capacidade')
+
+# Instante atual em segundos desde a época, com frações, calculado pelo SQLite
+AGORA_SQL = "(julianday('now') - 2440587.5) * 86400.0"
+
+def objeto_json(linha, colunas):
+    # json_object('id', new.id, 'nome', new.nome, ...) para usar nos triggers
+    return "json_object(" + ", ".join(f"'{coluna}', {linha}.{coluna}" for coluna in colunas) + ")"
+
+def participacao_json(linha):
+    # Participação ou lugar na fila com os ids e os nomes (os consumidores não precisam consultar as tabelas)
+    return (f"json_object('evento_id', {linha}.evento_id, 'usuario_id', {linha}.usuario_id, "
+            f"'evento', (SELECT nome FROM Eventos WHERE id = {linha}.evento_id), "
+            f"'usuario', (SELECT nome FROM Usuarios WHERE id = {linha}.usuario_id))")
+
+def criar_tabelas(cursor):
+    # Cria o diário, os instantâneos, os cursores dos consumidores e os triggers; retorna True se o diário não existia
+    novo = cursor.execute("""
+        SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'Diario'
+    """).fetchone()[0] == 0
+    # AUTOINCREMENT: um número nunca é reaproveitado, mesmo depois que a compactação apaga o começo do diário
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Diario (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            instante REAL NOT NULL,
+            tipo TEXT NOT NULL,
+            dados TEXT NOT NULL
+        )
+    """)
+    # Estado completo (JSON comprimido com zlib) depois de aplicada a entrada seq
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS InstantaneosDiario (
+            seq INTEGER PRIMARY KEY,
+            instante REAL NOT NULL,
+            dados BLOB NOT NULL
+        )
+    """)
+    # Última entrada confirmada por cada consumidor com nome; a compactação não poda além do mais atrasado
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS CursoresDiario (
+            consumidor TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    """)
+
+    gatilhos = [
+        ('usuario_registrado', 'INSERT', 'Usuarios', 'new', objeto_json('new', COLUNAS_USUARIO), None),
+        ('usuario_atualizado', 'UPDATE', 'Usuarios', 'new', objeto_json('new', COLUNAS_USUARIO), COLUNAS_USUARIO),
+        ('usuario_removido', 'DELETE', 'Usuarios', 'old', "json_object('id', old.id, 'nome', old.nome)", None),
+        ('evento_criado', 'INSERT', 'Eventos', 'new', objeto_json('new', COLUNAS_EVENTO), None),
+        ('evento_atualizado', 'UPDATE', 'Eventos', 'new', objeto_json('new', COLUNAS_EVENTO), COLUNAS_EVENTO),
+        ('evento_removido', 'DELETE', 'Eventos', 'old', "json_object('id', old.id, 'nome', old.nome)", None),
+        ('participacao_adicionada', 'INSERT', 'Participacoes', 'new', participacao_json('new'), None),
+        ('participacao_cancelada', 'DELETE', 'Participacoes', 'old', participacao_json('old'), None),
+        ('espera_adicionada', 'INSERT', 'ListaEspera', 'new', participacao_json('new'), None),
+        ('espera_removida', 'DELETE', 'ListaEspera', 'old', participacao_json('old'), None),
+    ]
+    for tipo, operacao, tabela, linha, dados, colunas_alteradas in gatilhos:
+        # Participação ou fila apagada: BEFORE, para os nomes ainda estarem lá quando um evento é apagado e leva junto
+        # as participações; a remoção do próprio evento/usuário fica AFTER e entra no diário depois delas
+        momento = 'BEFORE' if operacao == 'DELETE' and tabela in ('Participacoes', 'ListaEspera') else 'AFTER'
+        # O upsert de salvar_usuario/salvar_evento faz UPDATE mesmo sem mudança; só mudanças de fato entram no diário
+        condicao = ""
+        if colunas_alteradas:
+            condicao = "WHEN " + " OR ".join(f"old.{coluna} IS NOT new.{coluna}" for coluna in colunas_alteradas)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS diario_{tipo} {momento} {operacao} ON {tabela} {condicao}
+            BEGIN
+                INSERT INTO Diario (instante, tipo, dados) VALUES ({AGORA_SQL}, '{tipo}', {dados});
+            END
+        """)
+    return novo
+
+def estado_atual(cursor):
+    # Lê o estado completo das tabelas e o número da última entrada do diário que ele já inclui
+    # (chamar dentro de uma transação, para as leituras enxergarem o mesmo momento)
+    seq = ultima_seq_atribuida(cursor)
+    estado = {
+        'usuarios': [dict(zip(COLUNAS_USUARIO, linha))
+                     for linha in cursor.execute(f"SELECT {', '.join(COLUNAS_USUARIO)} FROM Usuarios ORDER BY id")],
+        'eventos': [dict(zip(COLUNAS_EVENTO, linha))
+                    for linha in cursor.execute(f"SELECT {', '.join(COLUNAS_EVENTO)} FROM Eventos ORDER BY id")],
+        'participacoes': cursor.execute("SELECT evento_id, usuario_id FROM Participacoes ORDER BY id").fetchall(),
+        'lista_espera': cursor.execute("SELECT evento_id, usuario_id FROM ListaEspera ORDER BY id").fetchall(),
+    }
+    return seq, estado
+
+def ultima_seq_atribuida(cursor):
+    # Maior número já usado pelo diário, mesmo que a entrada tenha sido podada
+    linha = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'Diario'").fetchone()
+    return linha[0] if linha else 0
+
+def gravar_instantaneo(cursor, seq, estado):
+    # Grava o estado comprimido como instantâneo da entrada seq (se já existir um para seq, é substituído)
+    dados = zlib.compress(json.dumps(estado, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    cursor.execute(f"INSERT OR REPLACE INTO InstantaneosDiario (seq, instante, dados) VALUES (?, {AGORA_SQL}, ?)",
+                   (seq, dados))
+    return seq
+
+# Estado reconstruído a partir de um instantâneo mais as entradas seguintes do diário
+class EstadoDiario:
+    def __init__(self, dados=None, seq=0):
+        dados = dados or {}
+        self.seq = seq
+        self.usuarios = {usuario['id']: usuario for usuario in dados.get('usuarios', [])}
+        self.eventos = {evento['id']: evento for evento in dados.get('eventos', [])}
+        # Dicionários usados como conjuntos ordenados: a ordem é a de chegada
+        self.participacoes = dict.fromkeys(map(tuple, dados.get('participacoes', [])))
+        self.lista_espera = dict.fromkeys(map(tuple, dados.get('lista_espera', [])))
+
+    def aplicar(self, seq, tipo, dados):
+        # Aplica uma entrada do diário; entradas já incluídas no estado (seq menor ou igual) são ignoradas
+        if seq <= self.seq:
+            return
+        self.seq = seq
+        if tipo in ('usuario_registrado', 'usuario_atualizado'):
+            self.usuarios[dados['id']] = dados
+        elif tipo == 'usuario_removido':
+            self.usuarios.pop(dados['id'], None)
+        elif tipo in ('evento_criado', 'evento_atualizado'):
+            self.eventos[dados['id']] = dados
+        elif tipo == 'evento_removido':
+            self.eventos.pop(dados['id'], None)
+        elif tipo == 'participacao_adicionada':
+            self.participacoes[(dados['evento_id'], dados['usuario_id'])] = None
+        elif tipo == 'participacao_cancelada':
+            self.participacoes.pop((dados['evento_id'], dados['usuario_id']), None)
+        elif tipo == 'espera_adicionada':
+            self.lista_espera[(dados['evento_id'], dados['usuario_id'])] = None
+        elif tipo == 'espera_removida':
+            self.lista_espera.pop((dados['evento_id'], dados['usuario_id']), None)
+
+    def como_dict(self):
+        return {'usuarios': list(self.usuarios.values()), 'eventos': list(self.eventos.values()),
+                'participacoes': [list(par) for par in self.participacoes],
+                'lista_espera': [list(par) for par in self.lista_espera]}
+
+# Leitura, assinatura e manutenção do diário de um banco
+class Diario:
+    def __init__(self, manipulador_dados):
+        self.manipulador_dados = manipulador_dados
+
+    def primeira_seq_disponivel(self, conexao):
+        # Número da entrada mais antiga ainda no diário (ou o próximo a ser gravado, se o diário estiver vazio)
+        primeira = conexao.execute("SELECT min(seq) FROM Diario").fetchone()[0]
+        return primeira if primeira is not None else ultima_seq_atribuida(conexao) + 1
+
+    def ler(self, apos=0, limite=TAMANHO_LOTE):
+        # Entradas (seq, instante, tipo, dados) com seq > apos, em ordem; lança LookupError se a compactação já
+        # apagou entradas depois de apos (o consumidor precisa recomeçar pelo instantâneo)
+        with self.manipulador_dados.leitura() as conexao:
+            if apos < self.primeira_seq_disponivel(conexao) - 1:
+                raise LookupError(f"As entradas depois de {apos} já foram compactadas; recomece pelo instantâneo.")
+            linhas = conexao.execute("""
+                SELECT seq, instante, tipo, dados FROM Diario WHERE seq > ? ORDER BY seq LIMIT ?
+            """, (apos, limite)).fetchall()
+        return [(seq, instante, tipo, json.loads(dados)) for seq, instante, tipo, dados in linhas]
+
+    def ultima_seq(self):
+        with self.manipulador_dados.leitura() as conexao:
+            return ultima_seq_atribuida(conexao)
+
+    def cursor_do_consumidor(self, consumidor):
+        # Última entrada confirmada pelo consumidor (0 se ele nunca confirmou nada)
+        with self.manipulador_dados.leitura() as conexao:
+            linha = conexao.execute("SELECT seq FROM CursoresDiario WHERE consumidor = ?", (consumidor,)).fetchone()
+        return linha[0] if linha else 0
+
+    def confirmar(self, consumidor, seq):
+        # Registra que o consumidor processou tudo até seq (nunca volta o cursor para trás)
+        # As tabelas do diário ficam fora do cache: gravar nelas não o invalida
+        with self.manipulador_dados.gravacao_no_cache():
+            self.manipulador_dados.conexao.execute("""
+                INSERT INTO CursoresDiario (consumidor, seq) VALUES (?, ?)
+                ON CONFLICT (consumidor) DO UPDATE SET seq = max(seq, excluded.seq)
+            """, (consumidor, seq))
+
+    def assinar(self, apos=None, consumidor=None, seguir=True, tamanho_lote=TAMANHO_LOTE,
+                intervalo=INTERVALO_ASSINATURA, parar=None):
+        # Gerador das entradas depois de apos (ou do cursor salvo do consumidor), lote a lote
+        # seguir=True espera por novas entradas em vez de terminar; parar (threading.Event) encerra a espera
+        # Com consumidor, o cursor é confirmado quando o lote seguinte é pedido: quem para no meio de um lote
+        # recebe de novo as entradas não confirmadas (entrega pelo menos uma vez)
+        if apos is None:
+            apos = self.cursor_do_consumidor(consumidor) if consumidor else 0
+        while parar is None or not parar.is_set():
+            entradas = self.ler(apos, tamanho_lote)
+            if entradas:
+                yield from entradas
+                apos = entradas[-1][0]
+                if consumidor:
+                    self.confirmar(consumidor, apos)
+                if len(entradas) == tamanho_lote:
+                    continue
+            if not seguir:
+                return
+            if parar is not None:
+                parar.wait(intervalo)
+            else:
+                time.sleep(intervalo)
+
+    def instantaneo(self):
+        # Grava um instantâneo do estado atual; retorna o seq que ele cobre
+        # A leitura é feita em uma transação de leitura (WAL), sem bloquear as gravações enquanto o estado é lido
+        with self.manipulador_dados.leitura() as conexao:
+            em_transacao = conexao.in_transaction
+            if not em_transacao:
+                conexao.execute("BEGIN")
+            try:
+                seq, estado = estado_atual(conexao.cursor())
+            finally:
+                if not em_transacao:
+                    conexao.rollback()
+        with self.manipulador_dados.gravacao_no_cache():
+            return gravar_instantaneo(self.manipulador_dados.conexao.cursor(), seq, estado)
+
+    def ultimo_instantaneo(self):
+        # (seq, estado em dicionário) do instantâneo mais recente, ou (0, None) se não houver nenhum
+        with self.manipulador_dados.leitura() as conexao:
+            linha = conexao.execute("SELECT seq, dados FROM InstantaneosDiario ORDER BY seq DESC LIMIT 1").fetchone()
+        if linha is None:
+            return 0, None
+        return linha[0], json.loads(zlib.decompress(linha[1]))
+
+    def restaurar(self):
+        # Estado atual montado a partir do último instantâneo mais as entradas gravadas depois dele
+        seq, dados = self.ultimo_instantaneo()
+        estado = EstadoDiario(dados, seq)
+        for seq, _, tipo, dados in self.assinar(apos=seq, seguir=False):
+            estado.aplicar(seq, tipo, dados)
+        return estado
+
+    def compactar(self, manter=INSTANTANEOS_MANTIDOS):
+        # Apaga os instantâneos mais antigos que os manter últimos e as entradas já cobertas pelo mais antigo mantido,
+        # sem passar do cursor do consumidor registrado mais atrasado; retorna a quantidade de entradas apagadas
+        with self.manipulador_dados.gravacao_no_cache():
+            conexao = self.manipulador_dados.conexao
+            mantidos = [seq for (seq,) in conexao.execute(
+                "SELECT seq FROM InstantaneosDiario ORDER BY seq DESC LIMIT ?", (max(manter, 1),))]
+            if not mantidos:
+                return 0
+            limite = mantidos[-1]
+            conexao.execute("DELETE FROM InstantaneosDiario WHERE seq < ?", (limite,))
+            mais_atrasado = conexao.execute("SELECT min(seq) FROM CursoresDiario").fetchone()[0]
+            if mais_atrasado is not None:
+                limite = min(limite, mais_atrasado)
+            return conexao.execute("DELETE FROM Diario WHERE seq <= ?", (limite,)).rowcount
+
+    def manter(self, entradas_por_instantaneo=ENTRADAS_POR_INSTANTANEO):
+        # Manutenção periódica: novo instantâneo e compactação quando o diário cresceu o bastante desde o último
+        # Retorna o seq do novo instantâneo, ou None se ainda não era preciso
+        with self.manipulador_dados.leitura() as conexao:
+            ultimo = conexao.execute("SELECT coalesce(max(seq), 0) FROM InstantaneosDiario").fetchone()[0]
+            novas = ultima_seq_atribuida(conexao) - ultimo
+        if novas < entradas_por_instantaneo:
+            return None
+        seq = self.instantaneo()
+        self.compactar()
+        return seq
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    from EventFest import ManipuladorDados
+
+    argumentos = argparse.ArgumentParser(description="Lê o diário do EventFest como linhas JSON")
+    argumentos.add_argument('--banco', default='dados.db')
+    argumentos.add_argument('--apos', type=int, help="número da última entrada já processada")
+    argumentos.add_argument('--consumidor', help="nome do consumidor: retoma do cursor salvo e o confirma")
+    argumentos.add_argument('--seguir', action='store_true', help="continua esperando novas entradas")
+    argumentos.add_argument('--instantaneo', action='store_true', help="grava um instantâneo e compacta o diário")
+    opcoes = argumentos.parse_args()
+
+    diario = Diario(ManipuladorDados(opcoes.banco))
+    if opcoes.instantaneo:
+        print(f"Instantâneo gravado até a entrada {diario.instantaneo()}; "
+              f"{diario.compactar()} entradas compactadas.", file=sys.stderr)
+    else:
+        try:
+            for seq, instante, tipo, dados in diario.assinar(opcoes.apos, opcoes.consumidor, opcoes.seguir):
+                print(json.dumps({'seq': seq, 'instante': instante, 'tipo': tipo, 'dados': dados}, ensure_ascii=False),
+                      flush=True)
+        except KeyboardInterrupt:
+            pass
+        except LookupError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,298 @@
+# Métricas opcionais do EventFest: latência das operações, instruções SQL executadas, linhas lidas e uso do cache
+# Desligadas por padrão. Desligadas, nenhuma operação é embrulhada e as conexões são sqlite3.Connection comuns;
+# o único custo que sobra é testar metricas.ativo nos contadores do cache
+# Ligue com EVENTFEST_METRICAS=1 ou chamando EventFest.ligar_metricas() antes de abrir o banco
+import os
+import re
+import json
+import time
+import sqlite3
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import lru_cache, wraps
+
+# Limites (em segundos) dos baldes dos histogramas de latência, como no Prometheus (le = menor ou igual)
+LIMITES_LATENCIA = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefixo dos nomes das métricas no formato texto do Prometheus
+PREFIXO = "eventfest"
+
+# Literais trocados por ? para agrupar instruções iguais escritas com valores diferentes
+LITERAIS_SQL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+ESPACOS = re.compile(r"\s+")
+
+ativo = os.environ.get('EVENTFEST_METRICAS', '') not in ('', '0')
+
+@lru_cache(maxsize=4096)
+def normalizar_instrucao(sql):
+    # Uma linha só, sem literais, para usar como rótulo (o texto com ? se repete, então o resultado fica em cache)
+    return ESPACOS.sub(' ', LITERAIS_SQL.sub('?', sql)).strip()
+
+# Histograma de durações com os baldes de LIMITES_LATENCIA, mais a soma e a quantidade de observações
+class Histograma:
+    __slots__ = ('baldes', 'soma', 'quantidade')
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES_LATENCIA) + 1)
+        self.soma = 0.0
+        self.quantidade = 0
+
+    def registrar(self, segundos):
+        self.baldes[bisect_left(LIMITES_LATENCIA, segundos)] += 1
+        self.soma += segundos
+        self.quantidade += 1
+
+    def acumulados(self):
+        # Pares (limite, observações <= limite), no formato dos baldes do Prometheus
+        total = 0
+        for limite, quantidade in zip(LIMITES_LATENCIA + (float('inf'),), self.baldes):
+            total += quantidade
+            yield limite, total
+
+    def como_dict(self):
+        return {'quantidade': self.quantidade, 'soma': self.soma,
+                'baldes': {('+Inf' if limite == float('inf') else repr(limite)): total
+                           for limite, total in self.acumulados()}}
+
+# Registro de todas as métricas do processo; as threads do servidor gravam nele ao mesmo tempo
+class RegistroMetricas:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self.trava:
+            self.operacoes = {}
+            self.instrucoes = {}
+            self.linhas = {}
+            self.leitura_segundos = {}
+            self.execucoes_sqlite = {}
+            self.contadores = {}
+
+    def registrar_operacao(self, nome, segundos):
+        with self.trava:
+            histograma = self.operacoes.get(nome)
+            if histograma is None:
+                histograma = self.operacoes[nome] = Histograma()
+            histograma.registrar(segundos)
+
+    def registrar_instrucao(self, instrucao, segundos, linhas=0):
+        with self.trava:
+            histograma = self.instrucoes.get(instrucao)
+            if histograma is None:
+                histograma = self.instrucoes[instrucao] = Histograma()
+            histograma.registrar(segundos)
+            if linhas:
+                self.linhas[instrucao] = self.linhas.get(instrucao, 0) + linhas
+
+    def registrar_linhas(self, instrucao, segundos, linhas):
+        # Tempo e linhas de um fetch, em contadores próprios: o histograma da instrução mede só as execuções
+        if instrucao is None:
+            return
+        with self.trava:
+            self.leitura_segundos[instrucao] = self.leitura_segundos.get(instrucao, 0.0) + segundos
+            if linhas:
+                self.linhas[instrucao] = self.linhas.get(instrucao, 0) + linhas
+
+    def registrar_trace(self, sql):
+        # Chamado pelo SQLite a cada instrução iniciada, inclusive BEGIN/COMMIT implícitos e programas de trigger
+        # O texto chega com os valores expandidos, então só o tipo (primeira palavra) é contado;
+        # as instruções dos triggers chegam como "-- TRIGGER nome" e ficam todas sob TRIGGER
+        palavras = sql.split(None, 1)
+        tipo = 'TRIGGER' if sql.lstrip().startswith('--') else palavras[0].upper() if palavras else ''
+        with self.trava:
+            self.execucoes_sqlite[tipo] = self.execucoes_sqlite.get(tipo, 0) + 1
+
+    def contar(self, nome, quantidade=1):
+        with self.trava:
+            self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def como_dict(self):
+        with self.trava:
+            return {'operacoes': {nome: h.como_dict() for nome, h in self.operacoes.items()},
+                    'sql': {instrucao: dict(h.como_dict(), linhas=self.linhas.get(instrucao, 0),
+                                            leitura_segundos=self.leitura_segundos.get(instrucao, 0.0))
+                            for instrucao, h in self.instrucoes.items()},
+                    'execucoes_sqlite': dict(self.execucoes_sqlite),
+                    'contadores': dict(self.contadores)}
+
+registro = RegistroMetricas()
+
+def contar(nome, quantidade=1):
+    registro.contar(nome, quantidade)
+
+# Cursor que mede cada execute/executemany e conta as linhas lidas por instrução
+class CursorMedido(sqlite3.Cursor):
+    instrucao = None
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self.instrucao = normalizar_instrucao(sql)
+            registro.registrar_instrucao(self.instrucao, time.perf_counter() - inicio)
+
+    def executemany(self, sql, sequencia):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            self.instrucao = normalizar_instrucao(sql)
+            registro.registrar_instrucao(self.instrucao, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        registro.registrar_linhas(self.instrucao, time.perf_counter() - inicio, linha is not None)
+        return linha
+
+    def fetchmany(self, tamanho=None):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(self.arraysize if tamanho is None else tamanho)
+        registro.registrar_linhas(self.instrucao, time.perf_counter() - inicio, len(linhas))
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        registro.registrar_linhas(self.instrucao, time.perf_counter() - inicio, len(linhas))
+        return linhas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        linha = super().__next__()
+        registro.registrar_linhas(self.instrucao, time.perf_counter() - inicio, 1)
+        return linha
+
+# Conexão que cria cursores medidos e registra no trace do SQLite toda instrução executada
+class ConexaoMedida(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(registro.registrar_trace)
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    # Connection.execute do sqlite3 não passa pelo execute do cursor; estes passam
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+def fabrica_conexao():
+    # Classe passada a sqlite3.connect(factory=...): a medida só se as métricas estão ligadas
+    return ConexaoMedida if ativo else sqlite3.Connection
+
+# Métodos originais substituídos por instrumentar, para desligar() restaurá-los
+originais = {}
+
+def instrumentar(classe, nomes):
+    # Troca os métodos indicados da classe por versões que registram a latência como "Classe.metodo"
+    for nome in nomes:
+        if (classe, nome) in originais:
+            continue
+        original = getattr(classe, nome)
+        operacao = f"{classe.__name__}.{nome}"
+
+        def medido(*args, _original=original, _operacao=operacao, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                registro.registrar_operacao(_operacao, time.perf_counter() - inicio)
+        originais[(classe, nome)] = original
+        setattr(classe, nome, wraps(original)(medido))
+
+def ligar():
+    global ativo
+    ativo = True
+
+def desligar():
+    # Restaura os métodos originais; conexões já abertas continuam medidas até serem fechadas
+    global ativo
+    ativo = False
+    for (classe, nome), original in originais.items():
+        setattr(classe, nome, original)
+    originais.clear()
+
+def escapar_rotulo(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def linhas_histograma(nome, rotulo, valores):
+    # Linhas _bucket/_sum/_count de um histograma por valor de rótulo
+    for valor, histograma in sorted(valores.items()):
+        rotulos = f'{rotulo}="{escapar_rotulo(valor)}"'
+        for limite, total in histograma.acumulados():
+            le = '+Inf' if limite == float('inf') else repr(limite)
+            yield f'{nome}_bucket{{{rotulos},le="{le}"}} {total}'
+        yield f'{nome}_sum{{{rotulos}}} {histograma.soma:.6f}'
+        yield f'{nome}_count{{{rotulos}}} {histograma.quantidade}'
+
+def texto_prometheus():
+    # Todas as métricas no formato texto de exposição do Prometheus
+    with registro.trava:
+        operacoes = dict(registro.operacoes)
+        instrucoes = dict(registro.instrucoes)
+        linhas = dict(registro.linhas)
+        leitura = dict(registro.leitura_segundos)
+        execucoes = dict(registro.execucoes_sqlite)
+        contadores = dict(registro.contadores)
+    saida = [f"# HELP {PREFIXO}_operacao_segundos Latência das operações de dados e dos gerenciadores.",
+             f"# TYPE {PREFIXO}_operacao_segundos histogram"]
+    saida.extend(linhas_histograma(f"{PREFIXO}_operacao_segundos", 'operacao', operacoes))
+    saida += [f"# HELP {PREFIXO}_sql_segundos Duração da execução das instruções SQL (execute/executemany).",
+              f"# TYPE {PREFIXO}_sql_segundos histogram"]
+    saida.extend(linhas_histograma(f"{PREFIXO}_sql_segundos", 'instrucao', instrucoes))
+    saida += [f"# HELP {PREFIXO}_sql_linhas_total Linhas lidas por instrução SQL.",
+              f"# TYPE {PREFIXO}_sql_linhas_total counter"]
+    saida += [f'{PREFIXO}_sql_linhas_total{{instrucao="{escapar_rotulo(instrucao)}"}} {quantidade}'
+              for instrucao, quantidade in sorted(linhas.items())]
+    saida += [f"# HELP {PREFIXO}_sql_leitura_segundos_total Tempo gasto lendo as linhas (fetch) por instrução SQL.",
+              f"# TYPE {PREFIXO}_sql_leitura_segundos_total counter"]
+    saida += [f'{PREFIXO}_sql_leitura_segundos_total{{instrucao="{escapar_rotulo(instrucao)}"}} {segundos}'
+              for instrucao, segundos in sorted(leitura.items())]
+    saida += [f"# HELP {PREFIXO}_sqlite_execucoes_total Instruções iniciadas pelo SQLite (trace), com triggers e BEGIN/COMMIT.",
+              f"# TYPE {PREFIXO}_sqlite_execucoes_total counter"]
+    saida += [f'{PREFIXO}_sqlite_execucoes_total{{tipo="{escapar_rotulo(tipo)}"}} {quantidade}'
+              for tipo, quantidade in sorted(execucoes.items())]
+    for nome, quantidade in sorted(contadores.items()):
+        saida += [f"# TYPE {PREFIXO}_{nome}_total counter", f"{PREFIXO}_{nome}_total {quantidade}"]
+    return '\n'.join(saida) + '\n'
+
+def gravar_log(caminho):
+    # Acrescenta ao arquivo uma linha JSON com o instante e todas as métricas (log estruturado)
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(dict(registro.como_dict(), instante=datetime.now().isoformat(timespec='seconds')),
+                                 ensure_ascii=False) + '\n')
+
+def gravar(caminho):
+    # .jsonl/.json recebem uma linha de log estruturado; qualquer outra extensão, o texto do Prometheus
+    if caminho.endswith(('.jsonl', '.json')):
+        gravar_log(caminho)
+    else:
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto_prometheus())
+
+@contextmanager
+def perfilar(caminho):
+    # Executa o bloco sob o cProfile e grava as estatísticas em caminho (abrir com pstats ou snakeviz)
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield perfil
+    finally:
+        perfil.disable()
+        perfil.dump_stats(caminho)
+
+def perfil_do_comando(diretorio, comando):
+    # Contexto de cProfile para um comando, gravado em diretorio/comando_AAAAMMDD_HHMMSS.prof; nada se diretorio é None
+    if diretorio is None:
+        return nullcontext()
+    os.makedirs(diretorio, exist_ok=True)
+    comando = re.sub(r'[^\w-]', '_', comando)
+    return perfilar(os.path.join(diretorio, f"{comando}_{datetime.now():%Y%m%d_%H%M%S_%f}.prof"))
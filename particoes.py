@@ -0,0 +1,253 @@
+# Camada de dados dividida em vários arquivos SQLite (partições), para festivais em várias cidades ou períodos
+# Cada partição é um banco EventFest completo. Um evento, com suas participações e lista de espera, fica só na
+# partição dona, escolhida pela regra (região do CEP ou período da data); os usuários são gravados em todas,
+# porque as participações referenciam o usuário dentro do mesmo arquivo
+# As gravações passam pelos gerenciadores de cada partição neste processo; as listagens e buscas rodam em paralelo,
+# uma tarefa por partição em um conjunto de processos, e os resultados já ordenados são intercalados com heapq.merge
+# Cada arquivo confirma a sua transação separadamente (em WAL nem ATTACH torna atômico um COMMIT em vários arquivos):
+# ver registrar_usuario e reparar_usuarios para o que é garantido quando uma gravação em várias partições falha
+import os
+import heapq
+import sqlite3
+import threading
+import multiprocessing
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from itertools import islice
+
+from EventFest import (ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos, Usuario, ORDENACOES_EVENTOS,
+                       TAMANHO_PAGINA, LIMITE_BUSCA, RAIO_PADRAO_KM, normalizar_cep, converter_data)
+
+# Escolhe a partição pelo começo do CEP normalizado, ex.: {'sp': ('0', '1'), 'rj': ('2',), 'mg': ('3',)}
+# O prefixo mais longo vence; CEPs sem prefixo conhecido (ou vazios) vão para a partição padrao
+class ParticaoPorCep:
+    def __init__(self, prefixos, padrao):
+        self.padrao = padrao
+        self.particao_do_prefixo = {prefixo: nome for nome, lista in prefixos.items() for prefixo in lista}
+
+    def nomes(self):
+        return set(self.particao_do_prefixo.values()) | {self.padrao}
+
+    def particao(self, cep, data):
+        cep = normalizar_cep(cep or '')
+        for tamanho in range(len(cep), 0, -1):
+            nome = self.particao_do_prefixo.get(cep[:tamanho])
+            if nome is not None:
+                return nome
+        return self.padrao
+
+# Escolhe a partição pela data do evento: inicios = {nome: primeira data da partição (dd/mm/aaaa)}
+# Cada partição vai do seu início até o início da seguinte; eventos anteriores ao primeiro início vão para padrao
+class ParticaoPorPeriodo:
+    def __init__(self, inicios, padrao):
+        self.padrao = padrao
+        ordenados = sorted((converter_data(data), nome) for nome, data in inicios.items())
+        self.inicios = [data for data, _ in ordenados]
+        self.particoes = [nome for _, nome in ordenados]
+
+    def nomes(self):
+        return set(self.particoes) | {self.padrao}
+
+    def particao(self, cep, data):
+        posicao = bisect_right(self.inicios, converter_data(data))
+        return self.particoes[posicao - 1] if posicao else self.padrao
+
+# Manipuladores abertos por um processo de leitura, um por arquivo, reaproveitados entre as tarefas
+manipuladores_do_processo = {}
+
+def executar_na_particao(caminho, metodo, argumentos, opcoes, limite=None):
+    # Executado no processo de leitura: chama o método do ManipuladorDados da partição e devolve uma lista
+    # (os geradores, como iterar_eventos, param em limite itens em vez de ler a tabela toda)
+    manipulador = manipuladores_do_processo.get(caminho)
+    if manipulador is None:
+        manipulador = manipuladores_do_processo[caminho] = ManipuladorDados(caminho)
+    try:
+        resultado = getattr(manipulador, metodo)(*argumentos, **opcoes)
+    except LookupError:
+        # Ex.: CEP que não está na tabela de CEPs desta partição
+        return None
+    return list(islice(resultado, limite))
+
+def apagar_usuario(manipulador, nome):
+    # Remove o usuário de uma partição (desfaz um cadastro parcial); o cache da partição é relido depois
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.execute("DELETE FROM Usuarios WHERE nome = ?", (nome,))
+
+def chave_ordenacao(ordenar_por):
+    # Mesma ordem do ORDER BY de ordenacao(): coluna com NULL primeiro, desempate pelo id
+    # Os ids se repetem entre partições; intercalar() acrescenta o nome da partição ao final da chave
+    atributo = ORDENACOES_EVENTOS[ordenar_por]
+    if atributo == 'id':
+        return lambda evento: (evento.id,)
+    return lambda evento: (getattr(evento, atributo) is not None, getattr(evento, atributo), evento.id)
+
+# Dados em várias partições com a mesma interface de leitura/gravação usada pelo servidor e pelo menu
+class BancoParticionado:
+    def __init__(self, caminhos, regra, processos=None):
+        # caminhos: {nome da partição: arquivo .db}; regra: ParticaoPorCep ou ParticaoPorPeriodo
+        faltando = regra.nomes() - set(caminhos)
+        if faltando:
+            raise ValueError(f"Partições sem arquivo: {', '.join(sorted(faltando))}.")
+        self.caminhos = dict(caminhos)
+        self.regra = regra
+        self.manipuladores = {nome: ManipuladorDados(caminho) for nome, caminho in self.caminhos.items()}
+        self.gerenciadores_usuarios = {nome: GerenciadorUsuarios(manipulador)
+                                       for nome, manipulador in self.manipuladores.items()}
+        self.gerenciadores_eventos = {nome: GerenciadorEventos(self.manipuladores[nome], gerenciador)
+                                      for nome, gerenciador in self.gerenciadores_usuarios.items()}
+        # Serializa as gravações que verificam ou gravam mais de uma partição (usuários e nomes de eventos)
+        # Vale para as threads deste processo; dois processos gravando nas mesmas partições não são coordenados
+        self.trava_gravacao = threading.Lock()
+        self.processos = processos or min(len(self.caminhos), os.cpu_count() or 1)
+        # Os processos de leitura só são criados na primeira consulta distribuída
+        self.executor = None
+
+    def executor_leitura(self):
+        # forkserver: os processos não herdam as conexões SQLite nem as threads abertas neste processo
+        if self.executor is None:
+            contexto = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+            self.executor = ProcessPoolExecutor(self.processos, mp_context=contexto)
+        return self.executor
+
+    def em_todas(self, metodo, *argumentos, limite=None, **opcoes):
+        # Executa o método de leitura em todas as partições ao mesmo tempo; devolve um resultado por partição
+        executor = self.executor_leitura()
+        futuros = [executor.submit(executar_na_particao, caminho, metodo, argumentos, opcoes, limite)
+                   for caminho in self.caminhos.values()]
+        return [futuro.result() for futuro in futuros]
+
+    def intercalar(self, resultados, chave, limite, decrescente=False):
+        # Intercala os resultados de em_todas (cada um já ordenado pela chave) até limite itens; a chave de cada item
+        # ganha o nome da partição, para empates entre partições terem sempre a mesma ordem
+        # Resultados None (partição sem o CEP procurado, por exemplo) são ignorados
+        marcados = [[(chave(item) + (nome,), item) for item in resultado]
+                    for nome, resultado in zip(self.caminhos, resultados) if resultado is not None]
+        intercalados = heapq.merge(*marcados, key=lambda par: par[0], reverse=decrescente)
+        return [item for _, item in islice(intercalados, limite)]
+
+    def fechar(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for manipulador in self.manipuladores.values():
+            manipulador.fechar()
+
+    def particao_do_evento(self, nome_evento):
+        # Nome da partição que guarda o evento (consulta os caches de cada partição)
+        for nome, gerenciador in self.gerenciadores_eventos.items():
+            if gerenciador.buscar_evento(nome_evento):
+                return nome
+        raise LookupError(f"Evento {nome_evento.strip()} não encontrado.")
+
+    def registrar_usuario(self, nome, idade, sexo, telefone, endereco, cep):
+        # Grava o usuário em todas as partições, com uma transação aberta em cada uma até todas terem gravado
+        # Uma falha antes dos COMMITs desfaz tudo. Os COMMITs, porém, acontecem um arquivo por vez: se um falhar,
+        # o usuário é apagado das partições que já tinham confirmado. Se o processo morrer entre os COMMITs,
+        # o usuário fica só em parte das partições até reparar_usuarios() completar as demais
+        with self.trava_gravacao:
+            for gerenciador in self.gerenciadores_usuarios.values():
+                if gerenciador.buscar_usuario(nome):
+                    raise ValueError(f"Já existe um usuário com o nome {nome}.")
+            try:
+                with ExitStack() as transacoes:
+                    for manipulador in self.manipuladores.values():
+                        transacoes.enter_context(manipulador.unidade_de_trabalho())
+                    usuarios = [gerenciador.registrar_usuario(nome, idade, sexo, telefone, endereco, cep)
+                                for gerenciador in self.gerenciadores_usuarios.values()]
+            except Exception:
+                # O nome não existia em nenhuma partição: onde ele estiver agora, foi este COMMIT parcial
+                # Uma partição que não puder ser limpa agora fica para reparar_usuarios; o erro original é relançado
+                for manipulador in self.manipuladores.values():
+                    try:
+                        apagar_usuario(manipulador, nome)
+                    except sqlite3.Error as e:
+                        print(f"Não foi possível desfazer o usuário {nome} em {manipulador.nome_banco}: {e}")
+                raise
+        return usuarios[0]
+
+    def reparar_usuarios(self):
+        # Copia para todas as partições os usuários que estão em só parte delas (ex.: o processo morreu entre os
+        # COMMITs de registrar_usuario); retorna quantas gravações foram feitas. Rode ao iniciar, antes de atender
+        with self.trava_gravacao:
+            nomes = {}
+            todos = {}
+            for nome, manipulador in self.manipuladores.items():
+                nomes[nome] = set()
+                for usuario in manipulador.iterar_usuarios():
+                    nomes[nome].add(usuario.nome)
+                    todos.setdefault(usuario.nome, usuario)
+            gravados = 0
+            for nome, manipulador in self.manipuladores.items():
+                for usuario in todos.values():
+                    if usuario.nome not in nomes[nome]:
+                        manipulador.cache.salvar_usuario(Usuario(usuario.nome, usuario.idade, usuario.sexo,
+                                                                 usuario.telefone, usuario.endereco, usuario.cep))
+                        gravados += 1
+            return gravados
+
+    def registrar_evento(self, nome_evento, endereco, cep, preco, categoria, data, hora, descricao, capacidade=None):
+        # Grava o evento só na partição escolhida pela regra; o nome continua único entre todas as partições
+        # (a verificação nas outras partições e a gravação acontecem sob a mesma trava)
+        try:
+            particao = self.regra.particao(cep, data)
+        except (TypeError, ValueError):
+            raise ValueError("Por favor, insira a data no formato dd/mm/aaaa e a hora no formato hh:mm.")
+        with self.trava_gravacao:
+            for nome, gerenciador in self.gerenciadores_eventos.items():
+                if nome != particao and gerenciador.buscar_evento(nome_evento):
+                    raise ValueError(f"Já existe um evento com o nome {nome_evento.strip()}.")
+            return self.gerenciadores_eventos[particao].registrar_evento(nome_evento, endereco, cep, preco, categoria,
+                                                                         data, hora, descricao, capacidade)
+
+    def inscrever(self, nome_evento, nome_usuario):
+        return self.gerenciadores_eventos[self.particao_do_evento(nome_evento)].inscrever(nome_evento, nome_usuario)
+
+    def desinscrever(self, nome_evento, nome_usuario):
+        return self.gerenciadores_eventos[self.particao_do_evento(nome_evento)].desinscrever(nome_evento, nome_usuario)
+
+    def lista_espera(self, nome_evento):
+        return self.gerenciadores_eventos[self.particao_do_evento(nome_evento)].lista_espera(nome_evento)
+
+    def eventos_do_usuario(self, nome_usuario):
+        # Cada partição responde pelo próprio cache em memória, sem precisar dos processos de leitura
+        eventos = []
+        for gerenciador in self.gerenciadores_eventos.values():
+            eventos.extend(gerenciador.eventos_do_usuario(nome_usuario))
+        return eventos
+
+    def iterar_usuarios(self, ordenar_por='id', decrescente=False, cep_prefixo=None):
+        # Os usuários são os mesmos em todas as partições: basta ler uma
+        return next(iter(self.manipuladores.values())).iterar_usuarios(ordenar_por, decrescente, cep_prefixo)
+
+    def buscar_eventos(self, ordenar_por='data', decrescente=False, limite=TAMANHO_PAGINA, categoria=None,
+                       cep_prefixo=None, preco_min=None, preco_max=None):
+        # Primeiros limite eventos de todas as partições na ordem pedida (cada partição lê no máximo limite)
+        chave = chave_ordenacao(ordenar_por)
+        resultados = self.em_todas('iterar_eventos', ordenar_por, decrescente, categoria, cep_prefixo, preco_min,
+                                   preco_max, limite=limite)
+        return self.intercalar(resultados, chave, limite, decrescente)
+
+    def buscar_eventos_proximos(self, limite=TAMANHO_PAGINA, agora=None, **filtros):
+        # O mesmo "agora" para todas as partições, calculado aqui e não em cada processo
+        resultados = self.em_todas('buscar_eventos_proximos', limite, None, agora or datetime.now(), **filtros)
+        return self.intercalar(resultados, chave_ordenacao('data'), limite)
+
+    def buscar_eventos_passados(self, limite=TAMANHO_PAGINA, agora=None, **filtros):
+        resultados = self.em_todas('buscar_eventos_passados', limite, None, agora or datetime.now(), **filtros)
+        return self.intercalar(resultados, chave_ordenacao('data'), limite, decrescente=True)
+
+    def buscar_eventos_texto(self, texto, limite=LIMITE_BUSCA):
+        # Intercala pela relevância bm25 de cada partição (calculada sobre os eventos daquela partição)
+        resultados = self.em_todas('buscar_eventos_texto', texto, limite, com_relevancia=True)
+        return [evento for _, evento in self.intercalar(resultados, lambda par: (par[0],), limite)]
+
+    def buscar_eventos_perto(self, cep, raio_km=RAIO_PADRAO_KM, limite=LIMITE_BUSCA, agora=None):
+        # Lista de (distância em km, evento) de todas as partições, do mais perto para o mais longe
+        resultados = self.em_todas('buscar_eventos_perto', cep, raio_km, limite, agora or datetime.now())
+        if all(resultado is None for resultado in resultados):
+            raise LookupError(f"CEP {cep} não encontrado na tabela de CEPs.")
+        # Cada partição ordena por (distância, id), como buscar_eventos_perto
+        return self.intercalar(resultados, lambda par: (par[0], par[1].id), limite)
@@ -0,0 +1,436 @@
+# Servidor HTTP/JSON assíncrono com as operações do menu do EventFest, sobre o mesmo banco e o mesmo cache
+# As operações do SQLite rodam em um conjunto de threads; inscrições e cancelamentos são gravados em lotes
+# Uso: python servidor.py [--banco dados.db] [--host 127.0.0.1] [--porta 8080] [--metricas]
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import diario
+import metricas
+from EventFest import ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos, TAMANHO_PAGINA, ligar_metricas
+
+# Requisições em andamento a partir das quais o servidor responde 503 em vez de enfileirar mais trabalho
+MAX_REQUISICOES_PENDENTES = 2000
+
+# Inscrições/cancelamentos gravados juntos em uma única transação
+TAMANHO_LOTE_PARTICIPACOES = 256
+
+# Threads que executam as operações bloqueantes do SQLite
+THREADS_BANCO = 8
+
+# Tamanho máximo aceito para o corpo de uma requisição (bytes)
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+
+# Intervalo (segundos) entre as verificações de instantâneo/compactação do diário
+INTERVALO_MANUTENCAO_DIARIO = 60
+
+# Máximo de entradas do diário devolvidas por requisição
+LIMITE_DIARIO = 5000
+
+# Máximo de usuários ou eventos devolvidos por página
+LIMITE_PAGINA = 1000
+
+def usuario_para_dict(usuario):
+    return {'nome': usuario.nome, 'idade': usuario.idade, 'sexo': usuario.sexo, 'telefone': usuario.telefone,
+            'endereco': usuario.endereco, 'cep': usuario.cep}
+
+def evento_para_dict(evento, participantes=None):
+    dados = {'nome': evento.nome, 'endereco': evento.endereco, 'cep': evento.cep, 'preco': evento.preco,
+             'categoria': evento.categoria, 'data': evento.data.strftime('%d/%m/%Y'), 'hora': evento.hora,
+             'descricao': evento.descricao, 'capacidade': evento.capacidade}
+    if participantes is not None:
+        dados['participantes'] = participantes
+    return dados
+
+# Erro que vira diretamente uma resposta HTTP com o status indicado
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+# Servidor HTTP/JSON assíncrono com as mesmas operações do Menu
+class ServidorEventFest:
+    def __init__(self, manipulador_dados, threads=THREADS_BANCO, max_pendentes=MAX_REQUISICOES_PENDENTES):
+        self.manipulador_dados = manipulador_dados
+        self.gerenciador_usuarios = GerenciadorUsuarios(manipulador_dados)
+        self.gerenciador_eventos = GerenciadorEventos(manipulador_dados, self.gerenciador_usuarios)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='eventfest-banco')
+        self.max_pendentes = max_pendentes
+        self.pendentes = 0
+        self.fila_participacoes = None
+        self.tarefa_lotes = None
+        self.tarefa_diario = None
+        self.servidor = None
+        self.conexoes_abertas = set()
+        self.rotas = [
+            ('GET', re.compile(r'^/usuarios$'), self.listar_usuarios),
+            ('POST', re.compile(r'^/usuarios$'), self.cadastrar_usuario),
+            ('GET', re.compile(r'^/usuarios/(?P<nome>[^/]+)/eventos$'), self.listar_eventos_do_usuario),
+            ('GET', re.compile(r'^/eventos$'), self.listar_eventos),
+            ('POST', re.compile(r'^/eventos$'), self.cadastrar_evento),
+            ('GET', re.compile(r'^/eventos/proximos$'), self.listar_eventos_proximos),
+            ('GET', re.compile(r'^/eventos/passados$'), self.listar_eventos_passados),
+            ('POST', re.compile(r'^/participacoes$'), self.participar_evento),
+            ('DELETE', re.compile(r'^/participacoes$'), self.cancelar_participacao),
+            ('GET', re.compile(r'^/metricas$'), self.exibir_metricas),
+            ('GET', re.compile(r'^/diario$'), self.ler_diario),
+            ('GET', re.compile(r'^/diario/instantaneo$'), self.ultimo_instantaneo),
+        ]
+
+    async def iniciar(self, host='127.0.0.1', porta=8080):
+        # Abre o socket e inicia a tarefa que grava as participações em lote
+        self.fila_participacoes = asyncio.Queue(maxsize=self.max_pendentes)
+        self.tarefa_lotes = asyncio.create_task(self.processar_participacoes())
+        self.tarefa_diario = asyncio.create_task(self.manter_diario())
+        self.servidor = await asyncio.start_server(self.atender_conexao, host, porta)
+        return self.servidor
+
+    @property
+    def porta(self):
+        return self.servidor.sockets[0].getsockname()[1]
+
+    async def fechar(self):
+        # Para de aceitar conexões, encerra as abertas e espera os atendimentos em andamento
+        if self.servidor:
+            self.servidor.close()
+            await self.servidor.wait_closed()
+        tarefas = [tarefa for tarefa, escritor in self.conexoes_abertas]
+        for tarefa, escritor in list(self.conexoes_abertas):
+            escritor.close()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        for tarefa in (self.tarefa_lotes, self.tarefa_diario):
+            if tarefa:
+                tarefa.cancel()
+        self.executor.shutdown(wait=True)
+
+    async def executar(self, funcao, *args):
+        # Executa uma operação bloqueante do banco no conjunto de threads
+        return await asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+
+    async def atender_conexao(self, leitor, escritor):
+        # Atende as requisições de uma conexão, mantendo-a aberta (keep-alive) enquanto o cliente quiser
+        conexao = (asyncio.current_task(), escritor)
+        self.conexoes_abertas.add(conexao)
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha.strip():
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    await self.responder(escritor, 400, {'erro': 'Requisição inválida.'}, fechar=True)
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                try:
+                    tamanho = int(cabecalhos.get('content-length') or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self.responder(escritor, 400, {'erro': 'Content-Length inválido.'}, fechar=True)
+                    break
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self.responder(escritor, 413, {'erro': 'Corpo da requisição muito grande.'}, fechar=True)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                fechar = cabecalhos.get('connection', '').lower() == 'close' or versao == 'HTTP/1.0'
+                status, dados = await self.tratar(metodo, alvo, corpo)
+                await self.responder(escritor, status, dados, fechar)
+                if fechar:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.conexoes_abertas.discard(conexao)
+            escritor.close()
+
+    async def responder(self, escritor, status, dados, fechar=False):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        cabecalho = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n")
+        if status == 503:
+            cabecalho += "Retry-After: 1\r\n"
+        if fechar:
+            cabecalho += "Connection: close\r\n"
+        escritor.write(cabecalho.encode('latin-1') + b"\r\n" + corpo)
+        await escritor.drain()
+
+    async def tratar(self, metodo, alvo, corpo=b''):
+        # Encaminha a requisição para a operação correspondente e devolve (status, dados)
+        if self.pendentes >= self.max_pendentes:
+            return 503, {'erro': 'Servidor sobrecarregado, tente novamente.'}
+        self.pendentes += 1
+        try:
+            partes = urlsplit(alvo)
+            parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+            for metodo_rota, padrao, operacao in self.rotas:
+                encontrado = padrao.match(partes.path)
+                if encontrado and metodo_rota == metodo:
+                    dados = json.loads(corpo) if corpo else {}
+                    if not isinstance(dados, dict):
+                        raise ErroHTTP(400, 'O corpo JSON deve ser um objeto.')
+                    argumentos = {chave: unquote(valor) for chave, valor in encontrado.groupdict().items()}
+                    return await operacao(parametros, dados, **argumentos)
+            return 404, {'erro': f'Rota {metodo} {partes.path} não encontrada.'}
+        except ErroHTTP as e:
+            return e.status, {'erro': e.mensagem}
+        except json.JSONDecodeError:
+            return 400, {'erro': 'Corpo JSON inválido.'}
+        except sqlite3.Error as e:
+            return 500, {'erro': f'Erro no banco de dados: {e}'}
+        except Exception as e:
+            # Falha inesperada em uma operação: registra e responde, sem derrubar a conexão do cliente
+            print(f"Erro ao tratar {metodo} {alvo}: {e!r}")
+            return 500, {'erro': 'Erro interno do servidor.'}
+        finally:
+            self.pendentes -= 1
+
+    def paginacao(self, parametros):
+        # limite acima de LIMITE_PAGINA é reduzido; valores negativos seriam "sem limite" no SQLite e no fatiamento
+        try:
+            limite = min(int(parametros.get('limite', TAMANHO_PAGINA)), LIMITE_PAGINA)
+            deslocamento = int(parametros.get('deslocamento', 0))
+        except ValueError:
+            raise ErroHTTP(400, 'limite e deslocamento devem ser números inteiros.')
+        if limite < 1 or deslocamento < 0:
+            raise ErroHTTP(400, f'limite deve estar entre 1 e {LIMITE_PAGINA} e deslocamento não pode ser negativo.')
+        return limite, deslocamento
+
+    def campos_obrigatorios(self, dados, campos):
+        faltando = [campo for campo in campos if dados.get(campo) in (None, '')]
+        if faltando:
+            raise ErroHTTP(400, f"Campos obrigatórios ausentes: {', '.join(faltando)}.")
+        return [dados.get(campo) for campo in campos]
+
+    async def listar_usuarios(self, parametros, dados):
+        # Página lida do banco em ordem de id, sem carregar (nem esperar) o cache em memória
+        limite, deslocamento = self.paginacao(parametros)
+
+        def pagina():
+            # O total vem antes: a página ocupa uma conexão de leitura até ser lida por inteiro
+            total = self.manipulador_dados.contar_usuarios()
+            usuarios = islice(self.manipulador_dados.iterar_usuarios(), deslocamento, deslocamento + limite)
+            return total, [usuario_para_dict(u) for u in usuarios]
+        total, usuarios = await self.executar(pagina)
+        return 200, {'total': total, 'usuarios': usuarios}
+
+    async def cadastrar_usuario(self, parametros, dados):
+        campos = self.campos_obrigatorios(dados, ('nome', 'idade')) + [
+            dados.get('sexo'), dados.get('telefone'), dados.get('endereco'), dados.get('cep')]
+        try:
+            usuario = await self.executar(self.gerenciador_usuarios.registrar_usuario, *campos)
+        except ValueError as e:
+            raise ErroHTTP(409 if 'Já existe' in str(e) else 400, str(e))
+        return 201, usuario_para_dict(usuario)
+
+    async def listar_eventos(self, parametros, dados):
+        # Página lida do banco em ordem de data (índice idx_eventos_data_hora), com os participantes em uma consulta
+        limite, deslocamento = self.paginacao(parametros)
+
+        def pagina():
+            total = self.manipulador_dados.contar_eventos()
+            eventos = self.manipulador_dados.buscar_eventos_por_periodo(limite=limite, deslocamento=deslocamento)
+            with self.manipulador_dados.leitura() as conexao:
+                participantes = self.manipulador_dados.participantes_dos_eventos(conexao, [e.id for e in eventos])
+            return total, [evento_para_dict(e, participantes[e.id]) for e in eventos]
+        total, eventos = await self.executar(pagina)
+        return 200, {'total': total, 'eventos': eventos}
+
+    async def cadastrar_evento(self, parametros, dados):
+        campos = self.campos_obrigatorios(dados, ('nome', 'preco', 'data', 'hora'))
+        nome, preco, data, hora = campos
+        try:
+            evento = await self.executar(self.gerenciador_eventos.registrar_evento, nome, dados.get('endereco'),
+                                         dados.get('cep'), preco, dados.get('categoria'), data, hora,
+                                         dados.get('descricao'), dados.get('capacidade'))
+        except ValueError as e:
+            raise ErroHTTP(409 if 'Já existe' in str(e) else 400, str(e))
+        return 201, evento_para_dict(evento)
+
+    async def listar_eventos_por_tempo(self, buscar, parametros):
+        # Paginação por chave: a resposta traz o cursor da próxima página em 'apos'
+        limite, _ = self.paginacao(parametros)
+        apos = None
+        if parametros.get('apos'):
+            try:
+                data_hora, id = parametros['apos'].split(',')
+                apos = (int(data_hora), int(id))
+            except ValueError:
+                raise ErroHTTP(400, "apos deve ter o formato data_hora,id.")
+        eventos = await self.executar(lambda: buscar(limite=limite, apos=apos))
+        proxima = None
+        if len(eventos) == limite:
+            proxima = f"{int(eventos[-1].data_hora.timestamp())},{eventos[-1].id}"
+        return 200, {'eventos': [evento_para_dict(e) for e in eventos], 'apos': proxima}
+
+    async def listar_eventos_proximos(self, parametros, dados):
+        return await self.listar_eventos_por_tempo(self.manipulador_dados.buscar_eventos_proximos, parametros)
+
+    async def listar_eventos_passados(self, parametros, dados):
+        return await self.listar_eventos_por_tempo(self.manipulador_dados.buscar_eventos_passados, parametros)
+
+    async def listar_eventos_do_usuario(self, parametros, dados, nome):
+        # Usuário pelo índice do nome e eventos pelo índice idx_participacoes_usuario, sem carregar o cache
+        def eventos():
+            usuario = self.gerenciador_usuarios.buscar_usuario(nome)
+            return self.manipulador_dados.buscar_eventos_do_usuario(usuario) if usuario else []
+        return 200, {'usuario': nome, 'eventos': await self.executar(eventos)}
+
+    async def enfileirar_participacao(self, operacao, dados):
+        # Coloca a operação na fila de gravação em lote e espera o seu resultado
+        nome_evento, nome_usuario = self.campos_obrigatorios(dados, ('evento', 'usuario'))
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self.fila_participacoes.put_nowait((operacao, nome_evento, nome_usuario, futuro))
+        except asyncio.QueueFull:
+            raise ErroHTTP(503, 'Fila de participações cheia, tente novamente.')
+        resultado = await futuro
+        if isinstance(resultado, LookupError):
+            raise ErroHTTP(404, str(resultado))
+        if isinstance(resultado, ValueError):
+            raise ErroHTTP(409, str(resultado))
+        if isinstance(resultado, Exception):
+            raise ErroHTTP(500, str(resultado))
+        evento, usuario, detalhe = resultado
+        resposta = {'evento': evento.nome, 'usuario': usuario.nome}
+        if operacao == 'inscrever':
+            # inscrito ou lista_de_espera
+            resposta['situacao'] = detalhe.value
+        else:
+            # Usuários que saíram da lista de espera com a vaga liberada
+            resposta['promovidos'] = detalhe
+        return resposta
+
+    async def participar_evento(self, parametros, dados):
+        return 201, await self.enfileirar_participacao('inscrever', dados)
+
+    async def cancelar_participacao(self, parametros, dados):
+        return 200, await self.enfileirar_participacao('desinscrever', dados or parametros)
+
+    async def exibir_metricas(self, parametros, dados):
+        # Métricas coletadas desde o início do processo (servidor iniciado com --metricas)
+        if not metricas.ativo:
+            raise ErroHTTP(404, 'Métricas desligadas; inicie o servidor com --metricas.')
+        return 200, metricas.registro.como_dict()
+
+    async def ler_diario(self, parametros, dados):
+        # Entradas do diário depois de 'apos'; o consumidor guarda o 'apos' da resposta e o envia na próxima chamada
+        try:
+            apos = int(parametros.get('apos', 0))
+            limite = min(int(parametros.get('limite', diario.TAMANHO_LOTE)), LIMITE_DIARIO)
+        except ValueError:
+            raise ErroHTTP(400, 'apos e limite devem ser números inteiros.')
+        if limite < 1 or apos < 0:
+            raise ErroHTTP(400, f'limite deve estar entre 1 e {LIMITE_DIARIO} e apos não pode ser negativo.')
+        try:
+            entradas = await self.executar(self.manipulador_dados.diario.ler, apos, limite)
+        except LookupError as e:
+            # O começo pedido já foi compactado: o consumidor recomeça por /diario/instantaneo
+            raise ErroHTTP(410, str(e))
+        return 200, {'entradas': [{'seq': seq, 'instante': instante, 'tipo': tipo, 'dados': dados}
+                                  for seq, instante, tipo, dados in entradas],
+                     'apos': entradas[-1][0] if entradas else apos}
+
+    async def ultimo_instantaneo(self, parametros, dados):
+        # Estado completo do último instantâneo; o consumidor continua por /diario?apos=seq
+        seq, estado = await self.executar(self.manipulador_dados.diario.ultimo_instantaneo)
+        return 200, {'seq': seq, 'estado': estado}
+
+    async def manter_diario(self):
+        # Grava um instantâneo e compacta o diário quando ele cresceu o bastante desde o último
+        while True:
+            await asyncio.sleep(INTERVALO_MANUTENCAO_DIARIO)
+            try:
+                await self.executar(self.manipulador_dados.diario.manter)
+            except sqlite3.Error as e:
+                print(f"Erro na manutenção do diário: {e}")
+
+    async def processar_participacoes(self):
+        # Junta as operações que chegaram enquanto o lote anterior era gravado e grava todas em uma transação
+        while True:
+            lote = [await self.fila_participacoes.get()]
+            while len(lote) < TAMANHO_LOTE_PARTICIPACOES and not self.fila_participacoes.empty():
+                lote.append(self.fila_participacoes.get_nowait())
+            operacoes = [(operacao, nome_evento, nome_usuario) for operacao, nome_evento, nome_usuario, _ in lote]
+            try:
+                resultados = await self.executar(self.gerenciador_eventos.processar_lote, operacoes)
+            except Exception as e:
+                resultados = [e] * len(lote)
+            for (_, _, _, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+# Cliente HTTP mínimo, usado para testar o servidor no mesmo processo
+class ClienteHTTP:
+    def __init__(self, host='127.0.0.1', porta=8080):
+        self.host = host
+        self.porta = porta
+        self.leitor = None
+        self.escritor = None
+
+    async def requisitar(self, metodo, caminho, dados=None):
+        # Envia a requisição reaproveitando a conexão aberta e devolve (status, dados da resposta)
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        corpo = json.dumps(dados).encode('utf-8') if dados is not None else b''
+        self.escritor.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+                            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode('latin-1') + corpo)
+        await self.escritor.drain()
+        status = int((await self.leitor.readline()).split()[1])
+        tamanho = 0
+        fechar = False
+        while True:
+            linha = await self.leitor.readline()
+            if linha in (b'\r\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            if nome.strip().lower() == 'content-length':
+                tamanho = int(valor)
+            elif nome.strip().lower() == 'connection' and valor.strip().lower() == 'close':
+                fechar = True
+        resposta = json.loads(await self.leitor.readexactly(tamanho)) if tamanho else None
+        if fechar:
+            await self.fechar()
+        return status, resposta
+
+    async def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+            self.escritor = None
+
+async def servir(nome_banco, host, porta):
+    servidor = ServidorEventFest(ManipuladorDados(nome_banco))
+    await servidor.iniciar(host, porta)
+    print(f"EventFest atendendo em http://{host}:{servidor.porta}")
+    try:
+        await servidor.servidor.serve_forever()
+    finally:
+        await servidor.fechar()
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description="Servidor HTTP/JSON do EventFest")
+    argumentos.add_argument('--banco', default='dados.db')
+    argumentos.add_argument('--host', default='127.0.0.1')
+    argumentos.add_argument('--porta', type=int, default=8080)
+    argumentos.add_argument('--metricas', action='store_true', help="coleta métricas, expostas em GET /metricas")
+    opcoes = argumentos.parse_args()
+    if opcoes.metricas and not metricas.ativo:
+        ligar_metricas()
+    try:
+        asyncio.run(servir(opcoes.banco, opcoes.host, opcoes.porta))
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
@@ -0,0 +1,82 @@
+# Configuração compartilhada pelos testes: importa os módulos da raiz do repositório e monta bancos temporários
+import os
+import sys
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from EventFest import ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos, Usuario, EventoConcreto
+
+CATEGORIAS = ('Música', 'Teatro', 'Esporte', None)
+
+@pytest.fixture
+def manipulador(tmp_path):
+    # Banco novo em um arquivo temporário (com WAL e conexões de leitura, como em produção)
+    manipulador = ManipuladorDados(str(tmp_path / 'dados.db'))
+    yield manipulador
+    manipulador.fechar()
+
+@pytest.fixture
+def gerenciadores(manipulador):
+    # (usuários, eventos) sobre o mesmo manipulador e, portanto, o mesmo cache
+    gerenciador_usuarios = GerenciadorUsuarios(manipulador)
+    return gerenciador_usuarios, GerenciadorEventos(manipulador, gerenciador_usuarios)
+
+@pytest.fixture
+def operacoes_aleatorias(manipulador, gerenciadores):
+    # Função que aplica uma sequência sorteada (e reproduzível pela semente) de cadastros, edições, remoções,
+    # inscrições e cancelamentos, pelos mesmos caminhos do menu e do servidor
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+
+    def executar(quantidade, semente):
+        aleatorio = random.Random(semente)
+        usuarios, eventos = [], []
+        for numero in range(quantidade):
+            sorteio = aleatorio.random()
+            if sorteio < 0.1 or len(usuarios) < 3:
+                nome = f'usuario{semente}_{numero}'
+                gerenciador_usuarios.registrar_usuario(nome, aleatorio.randint(10, 80), aleatorio.choice('MF'),
+                                                       '1', 'Rua A', '01001-000')
+                usuarios.append(nome)
+            elif sorteio < 0.18 or len(eventos) < 2:
+                nome = f'evento{semente}_{numero}'
+                gerenciador_eventos.registrar_evento(
+                    nome, 'Rua B', '01001-000', aleatorio.choice((0, 10, 25.5)), aleatorio.choice(CATEGORIAS),
+                    f'{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/2030', '20:00', 'desc',
+                    aleatorio.choice((None, 2, 5)))
+                eventos.append(nome)
+            elif sorteio < 0.6:
+                try:
+                    gerenciador_eventos.inscrever(aleatorio.choice(eventos), aleatorio.choice(usuarios))
+                except ValueError:
+                    pass
+            elif sorteio < 0.8:
+                try:
+                    gerenciador_eventos.desinscrever(aleatorio.choice(eventos), aleatorio.choice(usuarios))
+                except ValueError:
+                    pass
+            elif sorteio < 0.87:
+                # Edição do evento: preço, categoria, data e capacidade (aumentar a capacidade promove da fila)
+                evento = gerenciador_eventos.buscar_evento(aleatorio.choice(eventos))
+                manipulador.cache.salvar_evento(EventoConcreto(
+                    evento.nome, evento.endereco, evento.cep, aleatorio.choice((0, 10, 40)), aleatorio.choice(CATEGORIAS),
+                    f'{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/2031', evento.hora,
+                    evento.descricao, capacidade=aleatorio.choice((None, 1, 10))))
+            elif sorteio < 0.94:
+                # Edição do usuário: idade e sexo mudam a faixa nos perfis
+                usuario = gerenciador_usuarios.buscar_usuario(aleatorio.choice(usuarios))
+                manipulador.cache.salvar_usuario(Usuario(usuario.nome, aleatorio.randint(10, 80),
+                                                         aleatorio.choice('MF'), usuario.telefone, usuario.endereco,
+                                                         usuario.cep))
+            elif sorteio < 0.97 and len(eventos) > 2:
+                nome = eventos.pop(aleatorio.randrange(len(eventos)))
+                with manipulador.unidade_de_trabalho():
+                    manipulador.conexao.execute("DELETE FROM Eventos WHERE nome = ?", (nome,))
+            elif len(usuarios) > 3:
+                nome = usuarios.pop(aleatorio.randrange(len(usuarios)))
+                with manipulador.unidade_de_trabalho():
+                    manipulador.conexao.execute("DELETE FROM Usuarios WHERE nome = ?", (nome,))
+
+    return executar
@@ -0,0 +1,31 @@
+# Os agregados mantidos pelos triggers precisam ser iguais aos recalculados do zero por reconstruir()
+import pytest
+
+import analises
+
+# Tabelas de agregados e a coluna de contagem de cada uma (linhas com contagem zero equivalem a linhas ausentes)
+TABELAS = {'EstatisticasEvento': 'inscritos', 'ReceitaCategoriaMes': 'inscritos', 'PerfilEvento': 'inscritos',
+           'PerfilParticipantes': 'inscricoes'}
+
+def agregados(conexao):
+    # Conteúdo de cada tabela de agregados, ordenado, sem as linhas zeradas e com os valores reais arredondados
+    resultado = {}
+    for tabela, contagem in TABELAS.items():
+        cursor = conexao.execute(f"SELECT * FROM {tabela} WHERE {contagem} != 0")
+        resultado[tabela] = sorted(tuple(round(valor, 6) if isinstance(valor, float) else valor for valor in linha)
+                                   for linha in cursor)
+    return resultado
+
+@pytest.mark.parametrize('semente', [1, 2, 3])
+@pytest.mark.parametrize('usar_numpy', [False, True])
+def test_triggers_iguais_a_reconstrucao(manipulador, operacoes_aleatorias, semente, usar_numpy):
+    if usar_numpy:
+        pytest.importorskip('numpy')
+    operacoes_aleatorias(400, semente)
+    with manipulador.leitura() as conexao:
+        incrementais = agregados(conexao)
+    assert incrementais['EstatisticasEvento']
+    with manipulador.unidade_de_trabalho():
+        analises.reconstruir(manipulador.conexao.cursor(), usar_numpy)
+    with manipulador.leitura() as conexao:
+        assert agregados(conexao) == incrementais
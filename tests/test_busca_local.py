@@ -0,0 +1,98 @@
+# A busca por eventos perto de um CEP devolve o mesmo que medir a distância até todos os eventos
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+import EventFest
+from EventFest import distancia_km, normalizar_cep
+
+CENTRO = (-23.55, -46.63)
+AGORA = datetime(2029, 1, 1, 12, 0)
+TOLERANCIA_KM = 0.01
+
+@pytest.fixture
+def cenario(manipulador, gerenciadores):
+    # CEPs espalhados até ~40 km do centro, vários eventos por CEP (alguns já passados) e cinco eventos no centro
+    _, gerenciador_eventos = gerenciadores
+    aleatorio = random.Random(13)
+    ceps = {'01001000': CENTRO}
+    for numero in range(120):
+        distancia = 40 * aleatorio.random() ** 2
+        angulo = aleatorio.uniform(0, 2 * math.pi)
+        ceps[f'{2000000 + numero:08d}'] = (CENTRO[0] + distancia / 111.2 * math.sin(angulo),
+                                           CENTRO[1] + distancia / 101.9 * math.cos(angulo))
+    manipulador.preparar()
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.executemany("INSERT INTO Ceps (cep, latitude, longitude) VALUES (?, ?, ?)",
+                                        [(cep, latitude, longitude) for cep, (latitude, longitude) in ceps.items()])
+    lista_ceps = sorted(ceps)
+    for numero in range(300):
+        cep = '01001000' if numero < 5 else aleatorio.choice(lista_ceps)
+        ano = 2020 if numero % 10 == 9 else 2030
+        gerenciador_eventos.registrar_evento(f'evento{numero}', 'Rua A', f'{cep[:5]}-{cep[5:]}', 10, 'Música',
+                                             f'01/01/{ano}', '20:00', 'desc')
+    return ceps
+
+def forca_bruta(manipulador, ceps, raio_km, limite):
+    # Mede a distância até todos os eventos futuros e fica com os limite mais próximos dentro do raio
+    encontrados = []
+    for id_evento, cep, data_hora in manipulador.conexao.execute("SELECT id, cep, data_hora FROM Eventos"):
+        if data_hora <= AGORA.timestamp():
+            continue
+        distancia = distancia_km(*CENTRO, *ceps[normalizar_cep(cep)])
+        if distancia <= raio_km:
+            encontrados.append((distancia, id_evento))
+    encontrados.sort()
+    return encontrados[:limite]
+
+def conferir(resultado, esperado, raio_km):
+    # Mesmas distâncias (a menos do arredondamento do R*Tree) e mesmos eventos, salvo empates no corte
+    assert len(resultado) == len(esperado)
+    for (distancia, _), (distancia_esperada, _) in zip(resultado, esperado):
+        assert distancia == pytest.approx(distancia_esperada, abs=TOLERANCIA_KM)
+    corte = min(raio_km, esperado[-1][0]) - TOLERANCIA_KM if esperado else 0
+    assert ({evento.id for distancia, evento in resultado if distancia < corte}
+            == {id_evento for distancia, id_evento in esperado if distancia < corte})
+
+@pytest.mark.parametrize('indice_espacial', [True, False])
+@pytest.mark.parametrize('raio_km, limite', [(0.5, 20), (3, 2), (10, 50), (50, 30), (50, 1000)])
+def test_igual_a_forca_bruta(manipulador, cenario, monkeypatch, indice_espacial, raio_km, limite):
+    if indice_espacial and not manipulador.indice_espacial:
+        pytest.skip('SQLite sem R*Tree')
+    monkeypatch.setattr(manipulador, 'indice_espacial', indice_espacial)
+    resultado = manipulador.buscar_eventos_perto('01001-000', raio_km=raio_km, limite=limite, agora=AGORA)
+    conferir(resultado, forca_bruta(manipulador, cenario, raio_km, limite), raio_km)
+    assert all(evento.esta_proximo(AGORA) for _, evento in resultado)
+    assert [distancia for distancia, _ in resultado] == sorted(distancia for distancia, _ in resultado)
+
+@pytest.mark.parametrize('indice_espacial', [True, False])
+def test_raio_cresce_ate_achar_o_limite(manipulador, cenario, monkeypatch, indice_espacial):
+    if indice_espacial and not manipulador.indice_espacial:
+        pytest.skip('SQLite sem R*Tree')
+    monkeypatch.setattr(manipulador, 'indice_espacial', indice_espacial)
+    raios = []
+    original = manipulador.buscar_eventos_no_retangulo
+
+    def registrar(retangulo, inicio):
+        raios.append(round((retangulo[1] - retangulo[0]) / 2 * 111.2, 1))
+        return original(retangulo, inicio)
+
+    monkeypatch.setattr(manipulador, 'buscar_eventos_no_retangulo', registrar)
+
+    # Os cinco eventos do centro bastam: uma consulta só, com o raio inicial
+    resultado = manipulador.buscar_eventos_perto('01001-000', raio_km=50, limite=5, agora=AGORA)
+    assert len(raios) == 1 and raios[0] == pytest.approx(EventFest.RAIO_INICIAL_KM, abs=0.1)
+    assert sorted(evento.nome for _, evento in resultado) == [f'evento{numero}' for numero in range(5)]
+
+    # Sem eventos suficientes por perto, o raio cresce (1, 4, 16 km) até chegar a raio_km
+    raios.clear()
+    resultado = manipulador.buscar_eventos_perto('01001-000', raio_km=20, limite=1000, agora=AGORA)
+    assert raios == pytest.approx([1, 4, 16, 20], abs=0.1)
+    assert max(distancia for distancia, _ in resultado) > 16
+    conferir(resultado, forca_bruta(manipulador, cenario, 20, 1000), 20)
+
+def test_cep_desconhecido(manipulador, cenario):
+    with pytest.raises(LookupError):
+        manipulador.buscar_eventos_perto('99999-999', agora=AGORA)
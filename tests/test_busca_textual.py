@@ -0,0 +1,105 @@
+# Busca de eventos por texto: FTS5 sem acentos e por prefixo, índice em dia com os triggers e a alternativa com LIKE
+import pytest
+
+from EventFest import EventoConcreto
+
+@pytest.fixture
+def eventos(manipulador, gerenciadores):
+    # Alguns eventos com acentos, maiúsculas e a mesma palavra no nome ou só na descrição
+    _, gerenciador_eventos = gerenciadores
+    for nome, categoria, data, descricao in [
+        ('Festa de São João', 'Música', '24/06/2030', 'Quadrilha e fogueira'),
+        ('Show de Rock', 'Música', '10/05/2030', 'Bandas locais'),
+        ('Peça de Teatro', 'Teatro', '11/05/2030', 'Comédia com música ao vivo'),
+        ('Maratona', 'Esporte', '12/05/2030', 'Corrida de rua'),
+    ]:
+        gerenciador_eventos.registrar_evento(nome, 'Rua A', '01001-000', 10, categoria, data, '20:00', descricao)
+    return gerenciador_eventos
+
+def nomes(manipulador, texto):
+    return [evento.nome for evento in manipulador.buscar_eventos_texto(texto)]
+
+@pytest.fixture
+def fts(manipulador):
+    manipulador.preparar()
+    if not manipulador.busca_textual:
+        pytest.skip('SQLite sem FTS5')
+
+def test_ignora_acentos_e_maiusculas(manipulador, eventos, fts):
+    assert nomes(manipulador, 'sao joa') == ['Festa de São João']
+    assert nomes(manipulador, 'SÃO JOÃO') == ['Festa de São João']
+    assert nomes(manipulador, 'comedia') == ['Peça de Teatro']
+
+def test_busca_por_prefixo(manipulador, eventos, fts):
+    assert nomes(manipulador, 'marat') == ['Maratona']
+    assert nomes(manipulador, 'ro') == ['Show de Rock']
+    # Todas as palavras precisam aparecer, cada uma como começo de alguma palavra
+    assert nomes(manipulador, 'show band') == ['Show de Rock']
+    assert nomes(manipulador, 'show teatro') == []
+    assert nomes(manipulador, 'aton') == []
+
+def test_nome_pesa_mais_que_descricao(manipulador, eventos, fts):
+    # "música" é categoria de dois eventos e só descrição do terceiro
+    assert nomes(manipulador, 'musica')[-1] == 'Peça de Teatro'
+    relevancias = [relevancia for relevancia, _ in manipulador.buscar_eventos_texto('musica', com_relevancia=True)]
+    assert relevancias == sorted(relevancias)
+    assert len(manipulador.buscar_eventos_texto('musica', limite=2)) == 2
+
+def test_indice_acompanha_alteracoes(manipulador, eventos, fts):
+    # Edição pelo cache (trigger de atualização): a descrição antiga sai do índice e a nova entra
+    evento = eventos.buscar_evento('Maratona')
+    manipulador.cache.salvar_evento(EventoConcreto(evento.nome, evento.endereco, evento.cep, evento.preco,
+                                                   evento.categoria, '12/05/2030', evento.hora, 'Prova de ciclismo'))
+    assert nomes(manipulador, 'corrida') == []
+    assert nomes(manipulador, 'ciclis') == ['Maratona']
+
+    # Renomear direto no banco também reindexa
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.execute("UPDATE Eventos SET nome = 'Pedalada' WHERE nome = 'Maratona'")
+    assert nomes(manipulador, 'maratona') == []
+    assert nomes(manipulador, 'pedal') == ['Pedalada']
+
+    # Mudar só o preço não mexe no índice; apagar tira o evento
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.execute("UPDATE Eventos SET preco = 99 WHERE nome = 'Pedalada'")
+    assert nomes(manipulador, 'pedal') == ['Pedalada']
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.execute("DELETE FROM Eventos WHERE nome = 'Pedalada'")
+    assert nomes(manipulador, 'pedal') == []
+    assert nomes(manipulador, 'ciclismo') == []
+
+    # Um evento novo já aparece na busca
+    eventos.registrar_evento('Pedalada Noturna', 'Rua B', '01001-000', 0, 'Esporte', '13/05/2030', '21:00', 'Passeio')
+    assert nomes(manipulador, 'pedal') == ['Pedalada Noturna']
+
+@pytest.mark.parametrize('texto', ['NEAR(show rock)', '"show', 'show"', 'nome:show', 'show OR rock', 'show AND rock',
+                                   '*show', 'show -rock', '^show', '(show'])
+def test_operadores_sao_texto(manipulador, eventos, fts, texto):
+    # Operadores e aspas da sintaxe do FTS5 não quebram a consulta: contam só as palavras
+    assert nomes(manipulador, texto) in (['Show de Rock'], [])
+
+def test_operadores_viram_palavras(manipulador, eventos, fts):
+    # NEAR e nome: são só mais duas palavras a procurar, que nenhum evento tem
+    assert nomes(manipulador, 'NEAR(show rock)') == []
+    assert nomes(manipulador, 'nome:show') == []
+    assert nomes(manipulador, '"show" "rock"') == ['Show de Rock']
+    assert nomes(manipulador, 'show OR maratona') == []
+
+def test_sem_palavras(manipulador, eventos):
+    assert nomes(manipulador, '') == []
+    assert nomes(manipulador, '"*()') == []
+    assert nomes(manipulador, None) == []
+
+def test_alternativa_sem_fts(manipulador, eventos, monkeypatch):
+    # Sem FTS5: LIKE em todas as colunas, cada palavra em qualquer parte, em ordem de data e sem ignorar acentos
+    manipulador.preparar()
+    monkeypatch.setattr(manipulador, 'busca_textual', False)
+    assert nomes(manipulador, 'ROCK') == ['Show de Rock']
+    assert nomes(manipulador, 'aton') == ['Maratona']
+    assert nomes(manipulador, 'música') == ['Show de Rock', 'Peça de Teatro', 'Festa de São João']
+    assert nomes(manipulador, 'show teatro') == []
+    assert nomes(manipulador, 'NEAR(show rock)') == []
+    assert nomes(manipulador, '100%') == []
+    assert [(relevancia, evento.nome) for relevancia, evento in manipulador.buscar_eventos_texto('rua', com_relevancia=True)] == [
+        (0.0, 'Show de Rock'), (0.0, 'Peça de Teatro'), (0.0, 'Maratona'), (0.0, 'Festa de São João')]
+    assert len(manipulador.buscar_eventos_texto('rua', limite=3)) == 3
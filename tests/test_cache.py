@@ -0,0 +1,107 @@
+# Gravações e buscas por nome não carregam o cache inteiro; só as listagens que precisam dele o carregam
+import threading
+
+import pytest
+
+from EventFest import ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos, SituacaoReserva
+from particoes import BancoParticionado, ParticaoPorCep
+
+@pytest.fixture
+def banco_existente(tmp_path, manipulador, gerenciadores):
+    # Banco com dados gravados por outro manipulador, reaberto sem nada em memória
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('Show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x',
+                                         capacidade=1)
+    outro = ManipuladorDados(manipulador.nome_banco)
+    gerenciador_usuarios = GerenciadorUsuarios(outro)
+    yield outro, gerenciador_usuarios, GerenciadorEventos(outro, gerenciador_usuarios)
+    outro.fechar()
+
+def test_gravacoes_nao_carregam_o_cache(banco_existente, capsys):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = banco_existente
+    gerenciador_usuarios.registrar_usuario('bia', 30, 'F', '2', 'Rua C', '02002-000')
+    with pytest.raises(ValueError):
+        gerenciador_usuarios.registrar_usuario('ana', 40, 'F', '3', 'Rua D', '03003-000')
+    gerenciador_eventos.registrar_evento('Peça', 'Rua B', '01001-000', 5, 'Teatro', '02/01/2030', '19:00', 'y')
+    with pytest.raises(ValueError):
+        gerenciador_eventos.registrar_evento(' Show ', 'Rua B', '01001-000', 5, 'Teatro', '02/01/2030', '19:00', 'y')
+    assert gerenciador_eventos.inscrever('Show', 'ana')[2] == SituacaoReserva.INSCRITO
+    assert gerenciador_eventos.inscrever('Show', 'bia')[2] == SituacaoReserva.LISTA_DE_ESPERA
+    with pytest.raises(ValueError):
+        gerenciador_eventos.inscrever('Show', 'ana')
+    # O cancelamento de ana promove bia; o nome vem do banco
+    assert gerenciador_eventos.desinscrever('Show', 'ana')[2] == ['bia']
+
+    assert not manipulador.cache.carregado
+    assert capsys.readouterr().out == ''
+    # A primeira listagem que usa o registro o carrega já com tudo o que foi gravado
+    assert gerenciador_eventos.registro.participantes_do_evento('Show') == ['bia']
+    assert manipulador.cache.carregado
+    assert sorted(usuario.nome for usuario in gerenciador_usuarios.usuarios) == ['ana', 'bia']
+
+def test_buscas_por_nome_nao_carregam_o_cache(banco_existente):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = banco_existente
+    assert gerenciador_usuarios.buscar_usuario('ana').idade == 20
+    assert gerenciador_usuarios.buscar_usuario('zé') is None
+    assert gerenciador_eventos.buscar_evento(' Show ').capacidade == 1
+    assert gerenciador_eventos.buscar_evento('Nada') is None
+    assert not manipulador.cache.carregado
+
+def test_listagens_vazias_avisam(manipulador, gerenciadores, capsys):
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    assert gerenciador_usuarios.listar_usuarios() == 0
+    assert gerenciador_eventos.listar_eventos() == 0
+    assert gerenciador_eventos.listar_eventos(categoria='Teatro') == 0
+    saida = capsys.readouterr().out
+    assert "Não há usuários registrados no sistema." in saida
+    assert "Não há eventos registrados no sistema." in saida
+    assert "Nenhum evento encontrado." in saida
+
+def test_cadastro_particionado_nao_imprime(tmp_path, capsys):
+    regra = ParticaoPorCep({'sp': ('0', '1'), 'rj': ('2',)}, 'outros')
+    banco = BancoParticionado({nome: str(tmp_path / f'{nome}.db') for nome in regra.nomes()}, regra, processos=1)
+    try:
+        banco.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+        assert not any(manipulador.cache.carregado for manipulador in banco.manipuladores.values())
+    finally:
+        banco.fechar()
+    assert capsys.readouterr().out == ''
+
+def test_leituras_nao_esperam_o_escritor(manipulador, gerenciadores):
+    # Uma thread segura a transação de escrita aberta; as leituras pelo cache precisam terminar mesmo assim
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('Show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x')
+    gerenciador_eventos.inscrever('Show', 'ana')
+    manipulador.cache.obter_registro()
+
+    transacao_aberta, terminar = threading.Event(), threading.Event()
+
+    def escritor():
+        with manipulador.unidade_de_trabalho():
+            manipulador.conexao.execute("UPDATE Usuarios SET telefone = '9' WHERE nome = 'ana'")
+            transacao_aberta.set()
+            terminar.wait(30)
+
+    thread = threading.Thread(target=escritor)
+    thread.start()
+    try:
+        assert transacao_aberta.wait(10)
+        resultados = []
+
+        def leitor():
+            resultados.append(gerenciador_usuarios.buscar_usuario('ana').nome)
+            resultados.append([evento.nome for evento in gerenciador_eventos.eventos_do_usuario('ana')])
+            resultados.append(gerenciador_eventos.registro.participantes_do_evento('Show'))
+
+        thread_leitora = threading.Thread(target=leitor, daemon=True)
+        thread_leitora.start()
+        thread_leitora.join(5)
+        assert not thread_leitora.is_alive(), "a leitura esperou a transação de escrita"
+        assert resultados == ['ana', ['Show'], ['ana']]
+    finally:
+        terminar.set()
+        thread.join()
+    # A gravação fora do cache o invalida no COMMIT; a próxima leitura já vê o telefone novo
+    assert gerenciador_usuarios.buscar_usuario('ana').telefone == '9'
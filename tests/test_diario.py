@@ -0,0 +1,62 @@
+# O estado restaurado do diário (instantâneo + entradas seguintes) precisa ser igual às tabelas
+import pytest
+
+import diario
+
+def estado_das_tabelas(manipulador):
+    with manipulador.leitura() as conexao:
+        conexao.execute("BEGIN")
+        try:
+            return diario.estado_atual(conexao.cursor())[1]
+        finally:
+            conexao.rollback()
+
+def comparar(manipulador):
+    restaurado = manipulador.diario.restaurar().como_dict()
+    tabelas = estado_das_tabelas(manipulador)
+    # Participações e lista de espera na ordem de chegada; usuários e eventos pelo id
+    assert restaurado['participacoes'] == [list(par) for par in tabelas['participacoes']]
+    assert restaurado['lista_espera'] == [list(par) for par in tabelas['lista_espera']]
+    assert sorted(restaurado['usuarios'], key=lambda usuario: usuario['id']) == tabelas['usuarios']
+    assert sorted(restaurado['eventos'], key=lambda evento: evento['id']) == tabelas['eventos']
+
+@pytest.mark.parametrize('semente', [1, 2, 3])
+def test_restaurar_igual_as_tabelas(manipulador, operacoes_aleatorias, semente):
+    operacoes_aleatorias(300, semente)
+    comparar(manipulador)
+    # Com um instantâneo no meio e entradas depois dele
+    manipulador.diario.instantaneo()
+    operacoes_aleatorias(300, semente + 100)
+    comparar(manipulador)
+
+def test_restaurar_depois_de_compactar(manipulador, operacoes_aleatorias):
+    for rodada in range(4):
+        operacoes_aleatorias(200, rodada)
+        manipulador.diario.instantaneo()
+    operacoes_aleatorias(200, 99)
+    primeira = manipulador.diario.primeira_seq_disponivel(manipulador.conexao)
+    assert manipulador.diario.compactar(manter=2) > 0
+    assert manipulador.diario.primeira_seq_disponivel(manipulador.conexao) > primeira
+    comparar(manipulador)
+    # O que foi podado não pode mais ser lido
+    with pytest.raises(LookupError):
+        manipulador.diario.ler(apos=0)
+
+def test_compactar_respeita_o_consumidor_atrasado(manipulador, operacoes_aleatorias):
+    operacoes_aleatorias(200, 5)
+    # Consumidor que processou só as 10 primeiras entradas (o banco começou vazio)
+    consumidor = diario.EstadoDiario()
+    for seq, _, tipo, dados in manipulador.diario.ler(apos=0, limite=10):
+        consumidor.aplicar(seq, tipo, dados)
+    manipulador.diario.confirmar('relatorios', consumidor.seq)
+    for rodada in range(3):
+        operacoes_aleatorias(100, 10 + rodada)
+        manipulador.diario.instantaneo()
+    manipulador.diario.compactar(manter=1)
+    # Ele continua de onde parou e, aplicando o restante por cima do que tinha, chega ao estado das tabelas
+    for seq, _, tipo, dados in manipulador.diario.assinar(apos=consumidor.seq, seguir=False):
+        consumidor.aplicar(seq, tipo, dados)
+    tabelas = estado_das_tabelas(manipulador)
+    assert consumidor.como_dict()['participacoes'] == [list(par) for par in tabelas['participacoes']]
+    assert sorted(consumidor.usuarios) == [usuario['id'] for usuario in tabelas['usuarios']]
+    comparar(manipulador)
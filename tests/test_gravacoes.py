@@ -0,0 +1,109 @@
+# Gravações feitas direto no ManipuladorDados precisam aparecer nas leituras dos gerenciadores (que usam o cache)
+import sqlite3
+
+import pytest
+
+from EventFest import Usuario, EventoConcreto, Participacoes, SituacaoReserva
+
+@pytest.fixture
+def cenario(manipulador, gerenciadores):
+    # Dois usuários e dois eventos, com o cache já carregado antes das gravações diretas
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    for nome in ('ana', 'bia'):
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    for nome in ('Show', 'Peça'):
+        gerenciador_eventos.registrar_evento(nome, 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'desc',
+                                             capacidade=1)
+    manipulador.cache.obter_registro()
+    return manipulador, gerenciador_usuarios, gerenciador_eventos
+
+def nomes_dos_eventos(gerenciador_eventos, nome_usuario):
+    return sorted(evento.nome for evento in gerenciador_eventos.eventos_do_usuario(nome_usuario))
+
+def test_salvar_usuario(cenario):
+    manipulador, gerenciador_usuarios, _ = cenario
+    manipulador.salvar_usuario(Usuario('caio', 30, 'M', '2', 'Rua C', '02002-000'))
+    assert gerenciador_usuarios.buscar_usuario('caio').idade == 30
+    manipulador.salvar_usuario(Usuario('caio', 31, 'M', '2', 'Rua C', '02002-000'))
+    assert gerenciador_usuarios.buscar_usuario('caio').idade == 31
+
+def test_salvar_evento(cenario):
+    manipulador, _, gerenciador_eventos = cenario
+    manipulador.salvar_evento(EventoConcreto('Feira', 'Rua D', '03003-000', 5, 'Gastronomia', '02/02/2030', '10:00', 'x'))
+    assert gerenciador_eventos.buscar_evento('Feira').preco == 5
+
+def test_adicionar_e_remover_participacao(cenario):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = cenario
+    show, ana = gerenciador_eventos.buscar_evento('Show'), gerenciador_usuarios.buscar_usuario('ana')
+    assert manipulador.adicionar_participacao(show, ana)
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == ['Show']
+    assert manipulador.remover_participacao(show, ana)
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == []
+
+def test_reservar_e_cancelar_reserva(cenario):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = cenario
+    show = gerenciador_eventos.buscar_evento('Show')
+    ana, bia = gerenciador_usuarios.buscar_usuario('ana'), gerenciador_usuarios.buscar_usuario('bia')
+    assert manipulador.reservar_vaga(show, ana) == (SituacaoReserva.INSCRITO, [])
+    assert manipulador.reservar_vaga(show, bia) == (SituacaoReserva.LISTA_DE_ESPERA, [])
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == ['Show']
+    # O cancelamento promove bia da lista de espera
+    assert manipulador.cancelar_reserva(show, ana) == (True, [bia.id])
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == []
+    assert nomes_dos_eventos(gerenciador_eventos, 'bia') == ['Show']
+
+def test_cancelar_participacao_permite_nova_inscricao(cenario):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = cenario
+    gerenciador_eventos.inscrever('Show', 'ana')
+    manipulador.cancelar_participacao(gerenciador_eventos.buscar_evento('Show'), gerenciador_usuarios.buscar_usuario('ana'))
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == []
+    gerenciador_eventos.inscrever('Show', 'ana')
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == ['Show']
+
+def test_salvar_dados(cenario):
+    manipulador, gerenciador_usuarios, gerenciador_eventos = cenario
+    bob = Usuario('bob', 40, 'M', '3', 'Rua E', '04004-000')
+    manipulador.salvar_dados(None, bob, None, None, None, None)
+    assert gerenciador_usuarios.buscar_usuario('bob') is not None
+    manipulador.salvar_dados(None, None, None, bob, gerenciador_eventos.buscar_evento('Peça'), None)
+    assert nomes_dos_eventos(gerenciador_eventos, 'bob') == ['Peça']
+
+def test_sincronizar_participacoes(cenario):
+    manipulador, _, gerenciador_eventos = cenario
+    gerenciador_eventos.inscrever('Show', 'ana')
+    gerenciador_eventos.inscrever('Peça', 'bia')
+    manipulador.sincronizar_participacoes([Participacoes(None, 'Show', 'bia'), Participacoes(None, 'Peça', 'bia')])
+    assert nomes_dos_eventos(gerenciador_eventos, 'ana') == []
+    assert nomes_dos_eventos(gerenciador_eventos, 'bia') == ['Peça', 'Show']
+    with manipulador.leitura() as conexao:
+        pares = conexao.execute("SELECT e.nome, u.nome FROM Participacoes p JOIN Eventos e ON e.id = p.evento_id "
+                                "JOIN Usuarios u ON u.id = p.usuario_id ORDER BY p.id").fetchall()
+    # A linha que já existia fica; a nova entra depois
+    assert pares == [('Peça', 'bia'), ('Show', 'bia')]
+
+def test_gravacoes_pelo_cache_nao_o_invalidam(cenario):
+    manipulador, _, gerenciador_eventos = cenario
+    gerenciador_eventos.inscrever('Show', 'ana')
+    assert manipulador.cache.carregado
+
+def test_reserva_que_promove_a_fila_atualiza_o_cache(manipulador, gerenciadores):
+    # Outra conexão aumenta a capacidade; a próxima reserva promove quem esperava e o cache precisa mostrar isso
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    for nome in ('a', 'b', 'c'):
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x',
+                                         capacidade=1)
+    assert gerenciador_eventos.inscrever('show', 'a')[2] == SituacaoReserva.INSCRITO
+    assert gerenciador_eventos.inscrever('show', 'b')[2] == SituacaoReserva.LISTA_DE_ESPERA
+    assert gerenciador_eventos.registro.participantes_do_evento('show') == ['a']
+
+    outra = sqlite3.connect(manipulador.nome_banco)
+    try:
+        with outra:
+            outra.execute("UPDATE Eventos SET capacidade = 2 WHERE nome = 'show'")
+    finally:
+        outra.close()
+
+    assert gerenciador_eventos.inscrever('show', 'c')[2] == SituacaoReserva.LISTA_DE_ESPERA
+    assert sorted(gerenciador_eventos.registro.participantes_do_evento('show')) == ['a', 'b']
+    assert manipulador.buscar_participantes(gerenciador_eventos.buscar_evento('show')) == ['a', 'b']
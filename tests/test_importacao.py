@@ -0,0 +1,66 @@
+# Importação em lote de participações respeitando a capacidade dos eventos
+from EventFest import ImportadorExportador
+
+def escrever(caminho, linhas):
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    return str(caminho)
+
+def test_participacoes_alem_da_capacidade_sao_ignoradas(tmp_path, manipulador, gerenciadores):
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    for nome in ('ana', 'bia', 'caio', 'davi'):
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('Show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x',
+                                         capacidade=3)
+    gerenciador_eventos.registrar_evento('Livre', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x')
+    gerenciador_eventos.inscrever('Show', 'ana')
+
+    importador = ImportadorExportador(manipulador)
+    arquivo = escrever(tmp_path / 'participacoes.csv',
+                       ['evento,usuario', 'Show,ana', 'Show,bia', 'Show,caio', 'Show,davi', 'Livre,ana', 'Livre,davi'])
+    resumo = importador.importar('participacoes', arquivo)
+
+    # ana já estava inscrita; davi chegou depois de a última vaga ser ocupada
+    assert (resumo['importados'], resumo['ignorados']) == (4, 2)
+    assert sorted(gerenciador_eventos.registro.participantes_do_evento('Show')) == ['ana', 'bia', 'caio']
+    assert gerenciador_eventos.painel.inscritos_do_evento(gerenciador_eventos.buscar_evento('Show')) == 3
+    # A tabela e o trigger temporários não sobram depois da importação
+    assert manipulador.conexao.execute("SELECT count(*) FROM temp.sqlite_master").fetchone()[0] == 0
+
+def test_linhas_jsonl_invalidas_nao_abortam_a_importacao(tmp_path, manipulador, gerenciadores):
+    # JSON malformado, linha que não é objeto e campo de texto com outro tipo vão para o relatório de erros
+    gerenciador_usuarios, _ = gerenciadores
+    arquivo = escrever(tmp_path / 'usuarios.jsonl', [
+        '{"nome": "ana", "idade": 20, "sexo": "F", "telefone": "1", "endereco": "Rua A", "cep": "01001-000"}',
+        '{"nome": "quebrado", "idade": ',
+        '[1, 2]',
+        '{"nome": 5, "idade": 30}',
+        '{"nome": "caio", "idade": 40, "telefone": ["1", "2"]}',
+        '{"nome": "bia", "idade": 31, "sexo": "f"}',
+    ])
+    caminho_erros = str(tmp_path / 'erros.csv')
+    resumo = ImportadorExportador(manipulador).importar('usuarios', arquivo, caminho_erros)
+
+    assert (resumo['lidos'], resumo['importados'], resumo['erros']) == (6, 2, 4)
+    assert [numero for numero, _ in resumo['exemplos_erros']] == [2, 3, 4, 5]
+    assert 'JSON inválido' in resumo['exemplos_erros'][0][1]
+    assert 'objeto JSON' in resumo['exemplos_erros'][1][1]
+    assert 'nome deve ser texto' in resumo['exemplos_erros'][2][1]
+    assert 'telefone deve ser texto' in resumo['exemplos_erros'][3][1]
+    with open(caminho_erros, encoding='utf-8') as arquivo_erros:
+        assert [linha.split(',')[0] for linha in arquivo_erros.read().splitlines()] == ['linha', '2', '3', '4', '5']
+    assert gerenciador_usuarios.buscar_usuario('ana') and gerenciador_usuarios.buscar_usuario('bia')
+
+def test_importar_arquivo_mostra_os_erros_sem_interromper_o_menu(tmp_path, manipulador, monkeypatch, capsys):
+    arquivo = escrever(tmp_path / 'eventos.jsonl', [
+        '{"nome": "Show", "preco": 10, "data": "01/01/2030", "hora": "20:00"}',
+        '"texto solto"',
+        '{"nome": "Peça", "preco": 5, "data": "02/01/2030", "hora": ["20:00"]}',
+    ])
+    respostas = iter(['eventos', arquivo, ''])
+    monkeypatch.setattr('builtins.input', lambda _: next(respostas))
+    ImportadorExportador(manipulador).importar_arquivo()
+
+    saida = capsys.readouterr().out
+    assert '3 linhas lidas, 1 importadas, 0 ignoradas, 2 com erro' in saida
+    assert 'Linha 2: a linha deve ser um objeto JSON, não str' in saida
+    assert 'Linha 3: hora deve ser texto' in saida
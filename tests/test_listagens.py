@@ -0,0 +1,64 @@
+# Listagens de eventos lidas do banco aos poucos (cache ainda não carregado)
+import threading
+
+from EventFest import ManipuladorDados, GerenciadorUsuarios, GerenciadorEventos
+
+def popular(manipulador, gerenciadores, eventos=120):
+    # Eventos de 2030 (próximos) com alguns inscritos; devolve o caminho do banco para reabrir sem cache
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    for nome in ('ana', 'bia'):
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    for numero in range(eventos):
+        gerenciador_eventos.registrar_evento(f'evento{numero:03d}', 'Rua B', '01001-000', numero, 'Música',
+                                             f'{numero % 28 + 1:02d}/01/2030', '20:00', 'desc')
+    gerenciador_eventos.inscrever('evento000', 'ana')
+    gerenciador_eventos.inscrever('evento000', 'bia')
+    gerenciador_eventos.inscrever('evento119', 'bia')
+    return manipulador.nome_banco
+
+def abrir(caminho, leitores):
+    manipulador = ManipuladorDados(caminho, leitores=leitores)
+    gerenciador_usuarios = GerenciadorUsuarios(manipulador)
+    return manipulador, GerenciadorEventos(manipulador, gerenciador_usuarios)
+
+def executar_com_prazo(alvos, segundos=20):
+    # Roda cada função em uma thread; uma thread ainda viva no fim do prazo indica que a listagem travou
+    threads = [threading.Thread(target=alvo, daemon=True) for alvo in alvos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(segundos)
+    assert not any(thread.is_alive() for thread in threads), "listagem travou esperando uma conexão de leitura"
+
+def test_listar_eventos_com_um_leitor(manipulador, gerenciadores, capsys):
+    caminho = popular(manipulador, gerenciadores)
+    outro, gerenciador_eventos = abrir(caminho, leitores=1)
+    try:
+        totais = []
+        executar_com_prazo([lambda: totais.append(gerenciador_eventos.listar_eventos(ordenar_por='nome')),
+                            lambda: totais.append(gerenciador_eventos.listar_eventos_proximos())])
+        assert totais == [120, 120]
+        assert not outro.cache.carregado
+    finally:
+        outro.fechar()
+    saida = capsys.readouterr().out
+    assert "'nome': 'evento000'" in saida and "'participantes': ['ana', 'bia']" in saida
+    assert "'participantes': ['bia']" in saida
+
+def test_listagens_simultaneas_nao_esgotam_os_leitores(manipulador, gerenciadores, capsys):
+    caminho = popular(manipulador, gerenciadores)
+    outro, gerenciador_eventos = abrir(caminho, leitores=4)
+    try:
+        totais = []
+        executar_com_prazo([lambda: totais.append(gerenciador_eventos.listar_eventos(tamanho_pagina=10))
+                            for _ in range(8)])
+        assert totais == [120] * 8
+    finally:
+        outro.fechar()
+
+def test_participantes_dos_eventos(manipulador, gerenciadores):
+    popular(manipulador, gerenciadores, eventos=120)
+    ids = [manipulador.cache.obter_registro().buscar_evento(nome).id for nome in ('evento000', 'evento001', 'evento119')]
+    with manipulador.leitura() as conexao:
+        participantes = manipulador.participantes_dos_eventos(conexao, ids)
+    assert participantes == {ids[0]: ['ana', 'bia'], ids[1]: [], ids[2]: ['bia']}
@@ -0,0 +1,43 @@
+# Métricas: tipos de instrução contados pelo trace do SQLite e consistência dos histogramas de SQL
+import sqlite3
+
+import pytest
+
+import metricas
+
+@pytest.fixture
+def conexao():
+    metricas.registro.zerar()
+    conexao = sqlite3.connect(':memory:', factory=metricas.ConexaoMedida)
+    yield conexao
+    conexao.close()
+    metricas.registro.zerar()
+
+def test_tipos_do_trace(conexao):
+    for sql in ("COMMIT", "BEGIN ", "  select 1", "-- TRIGGER registrar", "--", ""):
+        metricas.registro.registrar_trace(sql)
+    assert metricas.registro.como_dict()['execucoes_sqlite'] == {'COMMIT': 1, 'BEGIN': 1, 'SELECT': 1, 'TRIGGER': 2, '': 1}
+
+def test_trace_da_conexao(conexao):
+    conexao.execute("CREATE TABLE t (x)")
+    conexao.execute("INSERT INTO t VALUES (1)")
+    conexao.commit()
+    execucoes = metricas.registro.como_dict()['execucoes_sqlite']
+    assert execucoes['CREATE'] == 1 and execucoes['INSERT'] >= 1 and execucoes['COMMIT'] == 1
+
+def test_leitura_fora_do_histograma(conexao):
+    conexao.execute("CREATE TABLE t (x)")
+    conexao.executemany("INSERT INTO t VALUES (?)", ((numero,) for numero in range(1000)))
+    instrucao = metricas.normalizar_instrucao("SELECT x FROM t")
+    for _ in range(5):
+        cursor = conexao.execute("SELECT x FROM t")
+        histograma = metricas.registro.instrucoes[instrucao]
+        soma, quantidade = histograma.soma, histograma.quantidade
+        cursor.fetchall()
+        # O fetch não muda o histograma: soma e baldes contam as mesmas observações
+        assert (histograma.soma, histograma.quantidade) == (soma, quantidade)
+        assert sum(histograma.baldes) == histograma.quantidade
+    sql = metricas.registro.como_dict()['sql'][instrucao]
+    assert (sql['quantidade'], sql['linhas']) == (5, 5000)
+    assert sql['leitura_segundos'] > 0
+    assert 'eventfest_sql_leitura_segundos_total{instrucao="SELECT x FROM t"}' in metricas.texto_prometheus()
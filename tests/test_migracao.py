@@ -0,0 +1,128 @@
+# Um banco da versão 1 (sem versão gravada, ligado por nomes) é migrado para o esquema atual
+import sqlite3
+
+from EventFest import ManipuladorDados, VERSAO_ESQUEMA
+
+def criar_banco_v1(caminho):
+    # Mesmo esquema e mesmos defeitos dos bancos antigos: nomes repetidos, datas inválidas e participações invertidas
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript("""
+        CREATE TABLE Usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT,
+            idade INTEGER,
+            sexo TEXT,
+            telefone TEXT,
+            endereco TEXT,
+            cep TEXT
+        );
+        CREATE TABLE Eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT,
+            endereco TEXT,
+            cep TEXT,
+            preco REAL,
+            categoria TEXT,
+            data DATE,
+            hora TEXT,
+            descricao TEXT
+        );
+        CREATE TABLE Participacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evento_nome TEXT,
+            participante TEXT,
+            FOREIGN KEY (evento_nome) REFERENCES Eventos (nome)
+        );
+    """)
+    conexao.executemany("INSERT INTO Usuarios (nome, idade, sexo, telefone, endereco, cep) VALUES (?, ?, ?, ?, ?, ?)", [
+        ('Ana', 30, 'F', '1111', 'Rua A', '01001-000'),
+        ('Bruno', 40, 'M', '2222', 'Rua B', '20040-002'),
+        ('Ana', 99, 'F', '3333', 'Rua C', '30130-010'),
+    ])
+    conexao.executemany("""
+        INSERT INTO Eventos (nome, endereco, cep, preco, categoria, data, hora, descricao) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        ('Show', 'Rua A', '01001-000', 50.0, 'Música', '10/05/2030', '20:00', 'Show de rock'),
+        ('Peça', 'Rua B', '20040-002', 20.0, 'Teatro', '2030-06-01', '19:00', 'Comédia'),
+        ('Sem data', 'Rua C', '30130-010', 0.0, None, '31/02/2030', '10:00', 'Data impossível'),
+        ('Show ', 'Rua D', '01001-000', 10.0, 'Música', '11/05/2030', '21:00', 'Nome repetido'),
+    ])
+    conexao.executemany("INSERT INTO Participacoes (evento_nome, participante) VALUES (?, ?)", [
+        ('Show', 'Ana'),
+        ('Bruno', 'Peça'),
+        ('Sem data', 'Ana'),
+        ('Show', 'Ana'),
+        ('Show', 'Bruno'),
+    ])
+    conexao.commit()
+    conexao.close()
+
+def test_migrar_banco_v1(tmp_path):
+    caminho = str(tmp_path / 'antigo.db')
+    criar_banco_v1(caminho)
+
+    manipulador = ManipuladorDados(caminho)
+    try:
+        conexao = manipulador.conexao
+        assert conexao.execute("PRAGMA user_version").fetchone()[0] == VERSAO_ESQUEMA
+        assert not any(manipulador.tabela_existe(f'{tabela}_v1') for tabela in ('Usuarios', 'Eventos', 'Participacoes'))
+
+        # Nomes repetidos ficam no primeiro registro; o evento com data inválida é descartado
+        assert conexao.execute("SELECT id, nome, idade FROM Usuarios ORDER BY id").fetchall() == [
+            (1, 'Ana', 30), (2, 'Bruno', 40)]
+        assert conexao.execute("SELECT id, nome, data, hora, capacidade FROM Eventos ORDER BY id").fetchall() == [
+            (1, 'Show', '2030-05-10', '20:00', None), (2, 'Peça', '2030-06-01', '19:00', None)]
+        assert conexao.execute("SELECT COUNT(*) FROM Eventos WHERE data_hora IS NULL").fetchone()[0] == 0
+
+        # A participação invertida (usuário em evento_nome) é corrigida; a repetida e a do evento descartado somem
+        assert conexao.execute("SELECT evento_id, usuario_id FROM Participacoes ORDER BY id").fetchall() == [
+            (1, 1), (2, 2), (1, 2)]
+
+        # Índices e agregados já contam o conteúdo migrado
+        if manipulador.busca_textual:
+            assert [evento.nome for evento in manipulador.buscar_eventos_texto('rock')] == ['Show']
+            assert [evento.nome for evento in manipulador.buscar_eventos_texto('comedia')] == ['Peça']
+        assert manipulador.tabela_existe('Ceps')
+        if manipulador.indice_espacial:
+            assert conexao.execute("SELECT COUNT(*) FROM EventosLocal").fetchone()[0] == 0
+        assert conexao.execute("SELECT evento_id, inscritos FROM EstatisticasEvento ORDER BY evento_id").fetchall() == [
+            (1, 2), (2, 1)]
+
+        # O diário começa com um instantâneo do estado migrado
+        seq, estado = manipulador.diario.ultimo_instantaneo()
+        assert estado is not None
+        assert conexao.execute("SELECT COUNT(*) FROM Diario").fetchone()[0] == 0
+        assert [usuario['nome'] for usuario in estado['usuarios']] == ['Ana', 'Bruno']
+        assert [evento['nome'] for evento in estado['eventos']] == ['Show', 'Peça']
+        assert manipulador.diario.restaurar().como_dict()['participacoes'] == [[1, 1], [2, 2], [1, 2]]
+    finally:
+        manipulador.fechar()
+
+    # A cópia de segurança guarda o banco como estava antes da migração
+    backup = sqlite3.connect(f"{caminho}.v1.bak")
+    try:
+        assert backup.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert backup.execute("SELECT evento_nome, participante FROM Participacoes ORDER BY id").fetchall()[1] == (
+            'Bruno', 'Peça')
+        assert backup.execute("SELECT COUNT(*) FROM Eventos").fetchone()[0] == 4
+    finally:
+        backup.close()
+
+def test_migracao_nao_repete(tmp_path):
+    # Abrir de novo um banco já migrado não refaz a cópia nem a carga dos agregados
+    caminho = str(tmp_path / 'antigo.db')
+    criar_banco_v1(caminho)
+    manipulador = ManipuladorDados(caminho)
+    manipulador.preparar()
+    manipulador.fechar()
+    (tmp_path / 'antigo.db.v1.bak').unlink()
+
+    manipulador = ManipuladorDados(caminho)
+    try:
+        manipulador.preparar()
+        assert manipulador.versao_esquema() == VERSAO_ESQUEMA
+        assert manipulador.conexao.execute("SELECT COUNT(*) FROM Participacoes").fetchone()[0] == 3
+        assert manipulador.conexao.execute("SELECT COUNT(*) FROM InstantaneosDiario").fetchone()[0] == 1
+    finally:
+        manipulador.fechar()
+    assert not (tmp_path / 'antigo.db.v1.bak').exists()
@@ -0,0 +1,168 @@
+# Gravações que tocam várias partições (cadastro de usuários e unicidade dos nomes de eventos) e consultas
+# distribuídas, intercaladas a partir dos resultados de cada partição
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from particoes import BancoParticionado, ParticaoPorCep
+
+@pytest.fixture
+def banco(tmp_path):
+    regra = ParticaoPorCep({'sp': ('0', '1'), 'rj': ('2',)}, 'outros')
+    banco = BancoParticionado({nome: str(tmp_path / f'{nome}.db') for nome in regra.nomes()}, regra, processos=1)
+    yield banco
+    banco.fechar()
+
+def particoes_com_usuario(banco, nome):
+    return sorted(particao for particao, gerenciador in banco.gerenciadores_usuarios.items()
+                  if gerenciador.buscar_usuario(nome))
+
+def test_usuario_gravado_em_todas(banco):
+    banco.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert particoes_com_usuario(banco, 'ana') == sorted(banco.caminhos)
+    with pytest.raises(ValueError):
+        banco.registrar_usuario('ana', 30, 'F', '1', 'Rua A', '01001-000')
+
+def test_commit_parcial_e_desfeito(banco):
+    # A primeira partição aberta é a última a confirmar: a falha dela vem depois de as outras terem gravado
+    primeira = next(iter(banco.manipuladores.values()))
+    original = primeira.unidade_de_trabalho
+
+    @contextmanager
+    def unidade_que_falha():
+        # Só a unidade mais externa (a do COMMIT) falha, uma vez; as aninhadas do cadastro gravam normalmente
+        externa = primeira.nivel_transacao == 0
+        with original():
+            yield primeira
+            if externa:
+                primeira.unidade_de_trabalho = original
+                raise sqlite3.OperationalError('disk I/O error')
+
+    primeira.unidade_de_trabalho = unidade_que_falha
+    with pytest.raises(sqlite3.OperationalError):
+        banco.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert particoes_com_usuario(banco, 'ana') == []
+    banco.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert particoes_com_usuario(banco, 'ana') == sorted(banco.caminhos)
+
+def test_reparar_usuarios(banco):
+    # Como se o processo tivesse morrido depois do COMMIT da partição rj
+    banco.gerenciadores_usuarios['rj'].registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert banco.reparar_usuarios() == len(banco.caminhos) - 1
+    assert particoes_com_usuario(banco, 'ana') == sorted(banco.caminhos)
+    assert banco.reparar_usuarios() == 0
+
+def test_nome_de_evento_unico_entre_threads(banco):
+    # Mesmo nome em partições diferentes, ao mesmo tempo: só um cadastro pode vencer
+    erros = []
+    def registrar(cep):
+        try:
+            banco.registrar_evento('Show', 'Rua B', cep, 10, 'Música', '01/01/2030', '20:00', 'x')
+        except ValueError as e:
+            erros.append(e)
+    threads = [threading.Thread(target=registrar, args=(cep,)) for cep in ('01001-000', '20000-000', '90000-000') * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(erros) == len(threads) - 1
+    assert sum(bool(gerenciador.buscar_evento('Show')) for gerenciador in banco.gerenciadores_eventos.values()) == 1
+
+# Dois CEPs por partição; o primeiro de cada uma fica no mesmo ponto, para empatar as distâncias entre partições
+CEPS = {'sp': ('01001000', '01002000'), 'rj': ('20000000', '20001000'), 'outros': ('90000000', '90001000')}
+COORDENADAS = {'01002000': (-23.56, -46.64), '20001000': (-23.60, -46.70), '90001000': (-23.50, -46.60)}
+AGORA = datetime(2030, 5, 11)
+
+@pytest.fixture
+def eventos_particionados(banco):
+    # Os mesmos ids (1 a 6) em todas as partições, com datas, preços e categorias repetidos entre elas
+    for manipulador in banco.manipuladores.values():
+        manipulador.preparar()
+        with manipulador.unidade_de_trabalho():
+            manipulador.conexao.executemany("INSERT INTO Ceps (cep, latitude, longitude) VALUES (?, ?, ?)", [
+                (cep, *COORDENADAS.get(cep, (-23.55, -46.63))) for ceps in CEPS.values() for cep in ceps])
+    for particao, ceps in CEPS.items():
+        for numero in range(6):
+            banco.registrar_evento(f'{particao}{numero}', 'Rua A', ceps[numero % 2], (0, 10, 25)[numero % 3],
+                                   ('Música', None)[numero % 2], f'{10 + numero % 3:02d}/05/2030', '20:00', 'festa junina')
+    return banco
+
+def eventos_de_todas(banco):
+    # (partição, id, nome, data_hora, preço, categoria) de todos os eventos, lidos direto de cada arquivo
+    return [(particao, *linha) for particao, manipulador in banco.manipuladores.items()
+            for linha in manipulador.conexao.execute("SELECT id, nome, data_hora, preco, categoria FROM Eventos")]
+
+def com_nulos_primeiro(valor):
+    return (valor is not None, valor)
+
+CHAVES = {
+    'id': lambda evento: (evento[1], evento[0]),
+    'data': lambda evento: (evento[3], evento[1], evento[0]),
+    'nome': lambda evento: (evento[2], evento[1], evento[0]),
+    'preco': lambda evento: (*com_nulos_primeiro(evento[4]), evento[1], evento[0]),
+    'categoria': lambda evento: (*com_nulos_primeiro(evento[5]), evento[1], evento[0]),
+}
+
+def nomes(eventos):
+    return [evento.nome for evento in eventos]
+
+def consultas(banco):
+    # Todas as consultas distribuídas, com limites menores e maiores que uma partição
+    resultados = {}
+    for ordenar_por in CHAVES:
+        for decrescente in (False, True):
+            for limite in (4, 100):
+                resultados[ordenar_por, decrescente, limite] = nomes(banco.buscar_eventos(ordenar_por, decrescente, limite))
+    for limite in (3, 100):
+        resultados['proximos', limite] = nomes(banco.buscar_eventos_proximos(limite, agora=AGORA))
+        resultados['passados', limite] = nomes(banco.buscar_eventos_passados(limite, agora=AGORA))
+        resultados['texto', limite] = nomes(banco.buscar_eventos_texto('festa', limite))
+        resultados['perto', limite] = [(round(distancia, 6), evento.nome) for distancia, evento in
+                                       banco.buscar_eventos_perto('01001-000', 1000, limite, agora=AGORA)]
+    return resultados
+
+def test_consultas_distribuidas(eventos_particionados):
+    banco = eventos_particionados
+    todos = eventos_de_todas(banco)
+    resultados = consultas(banco)
+
+    # Ordenações: a mesma ordem de um único banco, com o nome da partição desempatando ids repetidos
+    for (ordenar_por, decrescente, limite), obtidos in ((chave, valor) for chave, valor in resultados.items()
+                                                        if chave[0] in CHAVES):
+        esperados = sorted(todos, key=CHAVES[ordenar_por], reverse=decrescente)[:limite]
+        assert obtidos == [evento[2] for evento in esperados], (ordenar_por, decrescente, limite)
+
+    proximos = sorted((evento for evento in todos if evento[3] > AGORA.timestamp()), key=CHAVES['data'])
+    passados = sorted((evento for evento in todos if evento[3] <= AGORA.timestamp()), key=CHAVES['data'], reverse=True)
+    for limite in (3, 100):
+        assert resultados['proximos', limite] == [evento[2] for evento in proximos][:limite]
+        assert resultados['passados', limite] == [evento[2] for evento in passados][:limite]
+
+    # Texto: relevância de cada partição e, nos empates, o nome da partição
+    por_relevancia = sorted(((relevancia, particao), evento.nome) for particao, manipulador in banco.manipuladores.items()
+                            for relevancia, evento in manipulador.buscar_eventos_texto('festa', 100, com_relevancia=True))
+    assert resultados['texto', 100] == [nome for _, nome in por_relevancia]
+    assert resultados['texto', 3] == resultados['texto', 100][:3]
+    assert len(resultados['texto', 100]) == len(todos)
+
+    # Perto: distância, id e partição; os eventos no ponto de origem têm distância 0 e ids repetidos
+    por_distancia = sorted((round(distancia, 6), evento.id, particao, evento.nome)
+                           for particao, manipulador in banco.manipuladores.items()
+                           for distancia, evento in manipulador.buscar_eventos_perto('01001-000', 1000, 100, AGORA))
+    assert resultados['perto', 100] == [(distancia, nome) for distancia, _, _, nome in por_distancia]
+    assert resultados['perto', 3] == resultados['perto', 100][:3]
+    assert [nome for _, nome in resultados['perto', 3]] == ['outros2', 'rj2', 'sp2']
+
+def test_ordem_nao_depende_das_particoes(tmp_path, eventos_particionados):
+    # Com as partições em outra ordem, os empates saem iguais
+    banco = eventos_particionados
+    invertido = BancoParticionado(dict(reversed(list(banco.caminhos.items()))), banco.regra, processos=1)
+    try:
+        assert consultas(invertido) == consultas(banco)
+    finally:
+        invertido.fechar()
+    with pytest.raises(LookupError):
+        banco.buscar_eventos_perto('99999-999')
@@ -0,0 +1,95 @@
+# Limites das buscas por período (próximos, passados, próximos dias, acontecendo, perto) e paginação por chave
+from datetime import datetime, timedelta
+
+import pytest
+
+AGORA = datetime(2030, 5, 10, 20, 0)
+
+@pytest.fixture
+def eventos(manipulador, gerenciadores):
+    # Eventos exatamente nos cortes (agora, agora - 4h, agora + 7 dias), logo antes e logo depois deles,
+    # e vários no mesmo horário para a paginação desempatar pelo id
+    _, gerenciador_eventos = gerenciadores
+    manipulador.preparar()
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.execute("INSERT INTO Ceps (cep, latitude, longitude) VALUES ('01001000', -23.55, -46.63)")
+    for nome, data, hora in [
+        ('quatro_horas_antes', '10/05/2030', '16:00'),
+        ('antes_de_quatro_horas', '10/05/2030', '15:59'),
+        ('minuto_antes', '10/05/2030', '19:59'),
+        ('agora', '10/05/2030', '20:00'),
+        ('minuto_depois', '10/05/2030', '20:01'),
+        ('antes_de_sete_dias', '17/05/2030', '19:59'),
+        ('sete_dias', '17/05/2030', '20:00'),
+        ('empate1', '20/05/2030', '10:00'),
+        ('empate2', '20/05/2030', '10:00'),
+        ('empate3', '20/05/2030', '10:00'),
+        ('empate4', '20/05/2030', '10:00'),
+        ('passado1', '01/01/2030', '10:00'),
+        ('passado2', '01/01/2030', '10:00'),
+        ('passado3', '01/01/2030', '10:00'),
+    ]:
+        gerenciador_eventos.registrar_evento(nome, 'Rua A', '01001-000', 10, 'Música', data, hora, 'desc')
+    return gerenciador_eventos
+
+def nomes(eventos):
+    return [evento.nome for evento in eventos]
+
+PROXIMOS = ['minuto_depois', 'antes_de_sete_dias', 'sete_dias', 'empate1', 'empate2', 'empate3', 'empate4']
+PASSADOS = ['agora', 'minuto_antes', 'quatro_horas_antes', 'antes_de_quatro_horas', 'passado3', 'passado2', 'passado1']
+
+# O evento que começa no segundo atual já começou, com ou sem fração de segundo em agora
+@pytest.mark.parametrize('agora', [AGORA, AGORA + timedelta(microseconds=500000)])
+def test_cortes(manipulador, eventos, agora):
+    assert nomes(manipulador.buscar_eventos_proximos(limite=None, agora=agora)) == PROXIMOS
+    assert nomes(manipulador.buscar_eventos_passados(limite=None, agora=agora)) == PASSADOS
+    # Próximos 7 dias: depois de agora e antes de agora + 7 dias
+    assert nomes(manipulador.buscar_eventos_proximos_dias(7, limite=None, agora=agora)) == [
+        'minuto_depois', 'antes_de_sete_dias']
+    # Acontecendo: começou há no máximo 4 horas
+    assert nomes(manipulador.buscar_eventos_acontecendo(4, limite=None, agora=agora)) == [
+        'quatro_horas_antes', 'minuto_antes', 'agora']
+    # A busca por proximidade usa a mesma definição de próximo
+    assert sorted(nomes(evento for _, evento in manipulador.buscar_eventos_perto('01001-000', limite=100, agora=agora))) == (
+        sorted(PROXIMOS))
+    assert all(evento.esta_proximo(agora) for evento in manipulador.buscar_eventos_proximos(limite=None, agora=agora))
+    assert all(evento.esta_ativo(agora) for evento in manipulador.buscar_eventos_passados(limite=None, agora=agora))
+
+def test_um_instante_antes(manipulador, eventos):
+    # Logo antes do horário, o evento ainda é próximo e não está acontecendo
+    agora = AGORA - timedelta(microseconds=1)
+    assert nomes(manipulador.buscar_eventos_proximos(limite=None, agora=agora)) == ['agora'] + PROXIMOS
+    assert nomes(manipulador.buscar_eventos_passados(limite=None, agora=agora)) == PASSADOS[1:]
+    assert 'agora' not in nomes(manipulador.buscar_eventos_acontecendo(4, limite=None, agora=agora))
+    assert 'agora' in nomes(manipulador.buscar_eventos_proximos_dias(7, limite=None, agora=agora))
+    assert 'agora' in nomes(evento for _, evento in manipulador.buscar_eventos_perto('01001-000', agora=agora))
+
+def paginar(buscar, tamanho):
+    # Junta as páginas seguindo o (data_hora, id) do último evento de cada uma
+    resultado, apos = [], None
+    while True:
+        pagina = buscar(limite=tamanho, apos=apos, agora=AGORA)
+        resultado.extend(pagina)
+        if len(pagina) < tamanho:
+            return resultado
+        apos = (int(pagina[-1].data_hora.timestamp()), pagina[-1].id)
+
+@pytest.mark.parametrize('tamanho', [1, 2, 3, 7, 50])
+def test_paginacao_por_chave(manipulador, eventos, tamanho):
+    # Empates no horário não repetem nem pulam eventos entre páginas, nas duas direções
+    assert nomes(paginar(manipulador.buscar_eventos_proximos, tamanho)) == PROXIMOS
+    assert nomes(paginar(manipulador.buscar_eventos_passados, tamanho)) == PASSADOS
+    assert nomes(eventos.iterar_eventos_paginados(manipulador.buscar_eventos_proximos, agora=AGORA,
+                                                  tamanho_pagina=tamanho)) == PROXIMOS
+    assert nomes(eventos.iterar_eventos_paginados(manipulador.buscar_eventos_passados, agora=AGORA,
+                                                  tamanho_pagina=tamanho)) == PASSADOS
+
+def test_paginacao_com_filtros(manipulador, eventos):
+    # apos continua valendo junto com os filtros e com o início do período
+    primeira = manipulador.buscar_eventos_por_periodo(inicio=datetime(2030, 5, 20), limite=2, categoria='Música')
+    assert nomes(primeira) == ['empate1', 'empate2']
+    ultimo = primeira[-1]
+    segunda = manipulador.buscar_eventos_por_periodo(inicio=datetime(2030, 5, 20), limite=2, categoria='Música',
+                                                     apos=(int(ultimo.data_hora.timestamp()), ultimo.id))
+    assert nomes(segunda) == ['empate3', 'empate4']
+    assert manipulador.buscar_eventos_por_periodo(inicio=datetime(2030, 5, 20), categoria='Teatro') == []
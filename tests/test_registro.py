@@ -0,0 +1,153 @@
+# Os índices do RegistroEventos continuam coerentes entre si e com o banco depois de gravações, cancelamentos,
+# promoções da lista de espera e recargas
+import random
+
+import pytest
+
+from EventFest import RegistroEventos, Usuario, EventoConcreto, SituacaoReserva
+
+def agrupar(registros, chave):
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(chave(registro), []).append(registro.id)
+    return {valor: sorted(ids) for valor, ids in grupos.items()}
+
+def ids_por_chave(indice):
+    # Listas vazias podem ficar no índice depois de uma remoção; não contam
+    return {valor: sorted(registro.id for registro in registros) for valor, registros in indice.items() if registros}
+
+def conferir_indices(registro):
+    # Cada índice é exatamente o que se obtém das listas, com os mesmos objetos
+    assert registro.usuarios_por_id == {usuario.id: usuario for usuario in registro.usuarios}
+    assert registro.eventos_por_id == {evento.id: evento for evento in registro.eventos}
+    assert registro.usuarios_por_nome == {usuario.nome: usuario for usuario in registro.usuarios}
+    assert registro.eventos_por_nome == {evento.nome.strip(): evento for evento in registro.eventos}
+    assert ids_por_chave(registro.usuarios_por_cep) == agrupar(registro.usuarios, lambda usuario: usuario.cep)
+    assert ids_por_chave(registro.eventos_por_categoria) == agrupar(registro.eventos, lambda evento: evento.categoria)
+    assert ids_por_chave(registro.eventos_por_cep) == agrupar(registro.eventos, lambda evento: evento.cep)
+    assert ids_por_chave(registro.eventos_por_data) == agrupar(registro.eventos, lambda evento: evento.data.date())
+
+    # Adjacência: arrays ordenados e sem repetição, e os dois sentidos com os mesmos pares
+    pares = set()
+    for evento_id, participantes in registro.participantes_por_evento.items():
+        assert list(participantes) == sorted(set(participantes))
+        pares.update((evento_id, usuario_id) for usuario_id in participantes)
+    pares_inversos = set()
+    for usuario_id, eventos in registro.eventos_por_participante.items():
+        assert list(eventos) == sorted(set(eventos))
+        pares_inversos.update((evento_id, usuario_id) for evento_id in eventos)
+    assert pares == pares_inversos
+    return pares
+
+def retrato(registro):
+    # Conteúdo do registro independente da ordem das listas
+    return (
+        sorted((usuario.id, usuario.nome, usuario.idade, usuario.sexo, usuario.cep) for usuario in registro.usuarios),
+        sorted((evento.id, evento.nome, evento.categoria, evento.cep, evento.data_hora, evento.preco, evento.capacidade)
+               for evento in registro.eventos),
+        conferir_indices(registro),
+    )
+
+def conferir_com_o_banco(manipulador):
+    # O registro em memória é igual a um registro novo carregado do banco
+    registro = manipulador.cache.registro
+    novo = RegistroEventos()
+    novo.carregar(manipulador.carregar_dados(com_participacoes=False), manipulador.iterar_pares_participacao())
+    assert retrato(registro) == retrato(novo)
+    assert retrato(registro)[2] == set(manipulador.conexao.execute("SELECT evento_id, usuario_id FROM Participacoes"))
+
+@pytest.fixture
+def cargas(manipulador, monkeypatch):
+    # Conta as recargas do cache, para saber se as gravações foram aplicadas ao registro sem reler o banco
+    contador = []
+    recarregar = manipulador.cache.recarregar
+
+    def contar(*args, **kwargs):
+        contador.append(1)
+        return recarregar(*args, **kwargs)
+
+    monkeypatch.setattr(manipulador.cache, 'recarregar', contar)
+    return contador
+
+@pytest.mark.parametrize('semente', [1, 2, 3])
+def test_indices_depois_de_gravacoes(manipulador, gerenciadores, cargas, semente):
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    aleatorio = random.Random(semente)
+    manipulador.cache.obter_registro()
+    usuarios, eventos = [], []
+    promovidos = 0
+    for numero in range(400):
+        sorteio = aleatorio.random()
+        if sorteio < 0.1 or len(usuarios) < 4:
+            nome = f'u{numero}'
+            gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', aleatorio.choice(('01001-000', '02002-000')))
+            usuarios.append(nome)
+        elif sorteio < 0.15 or len(eventos) < 2:
+            nome = f'e{numero}'
+            gerenciador_eventos.registrar_evento(nome, 'Rua B', '01001-000', 10, aleatorio.choice(('Música', 'Teatro', None)),
+                                                 f'{aleatorio.randint(1, 28):02d}/05/2030', '20:00', 'x',
+                                                 aleatorio.choice((1, 2, 3)))
+            eventos.append(nome)
+        elif sorteio < 0.6:
+            try:
+                gerenciador_eventos.inscrever(aleatorio.choice(eventos), aleatorio.choice(usuarios))
+            except ValueError:
+                pass
+        elif sorteio < 0.85:
+            try:
+                promovidos += len(gerenciador_eventos.desinscrever(aleatorio.choice(eventos), aleatorio.choice(usuarios))[2])
+            except ValueError:
+                pass
+        elif sorteio < 0.93:
+            # Nova categoria, data, CEP e capacidade (aumentar a capacidade promove da fila)
+            evento = gerenciador_eventos.buscar_evento(aleatorio.choice(eventos))
+            manipulador.cache.salvar_evento(EventoConcreto(
+                evento.nome, evento.endereco, aleatorio.choice(('01001-000', '03003-000')), evento.preco,
+                aleatorio.choice(('Música', 'Esporte', None)), f'{aleatorio.randint(1, 28):02d}/06/2030', evento.hora,
+                evento.descricao, capacidade=aleatorio.choice((None, 2, 5))))
+        else:
+            usuario = gerenciador_usuarios.buscar_usuario(aleatorio.choice(usuarios))
+            manipulador.cache.salvar_usuario(Usuario(usuario.nome, aleatorio.randint(10, 80), 'M', usuario.telefone,
+                                                     usuario.endereco, aleatorio.choice(('01001-000', '04004-000'))))
+    assert promovidos > 0
+    # Tudo foi aplicado no registro carregado no começo, sem reler o banco
+    assert len(cargas) == 1
+    conferir_com_o_banco(manipulador)
+
+    # Depois de uma recarga os índices continuam os mesmos, e os objetos guardados pelos gerenciadores continuam válidos
+    antes = retrato(manipulador.cache.registro)
+    manipulador.cache.recarregar()
+    assert retrato(manipulador.cache.registro) == antes
+    assert gerenciador_eventos.registro is manipulador.cache.registro
+
+def test_promocao_no_registro(manipulador, gerenciadores, cargas):
+    # Cancelar e aumentar a capacidade promovem da fila nos dois sentidos do índice
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    registro = manipulador.cache.obter_registro()
+    for nome in ('a', 'b', 'c'):
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('show', 'Rua B', '01001-000', 10, 'Música', '01/05/2030', '20:00', 'x', 1)
+    assert [gerenciador_eventos.inscrever('show', nome)[2] for nome in 'abc'] == [
+        SituacaoReserva.INSCRITO, SituacaoReserva.LISTA_DE_ESPERA, SituacaoReserva.LISTA_DE_ESPERA]
+    assert registro.participantes_do_evento('show') == ['a']
+
+    assert gerenciador_eventos.desinscrever('show', 'a')[2] == ['b']
+    assert registro.participantes_do_evento('show') == ['b']
+    assert registro.eventos_do_participante('a') == []
+    assert [evento.nome for evento in registro.eventos_do_participante('b')] == ['show']
+
+    evento = registro.buscar_evento('show')
+    manipulador.cache.salvar_evento(EventoConcreto('show', evento.endereco, evento.cep, evento.preco, 'Teatro', '02/05/2030',
+                                                   evento.hora, evento.descricao, capacidade=5))
+    assert registro.participantes_do_evento('show') == ['b', 'c']
+    assert registro.eventos_da_categoria('Música') == [] and registro.eventos_da_categoria('Teatro') == [evento]
+    assert len(cargas) == 1
+    conferir_com_o_banco(manipulador)
+
+def test_recarga_depois_de_gravacao_externa(manipulador, gerenciadores, operacoes_aleatorias, cargas):
+    # Gravações feitas direto no banco (remoções em operacoes_aleatorias) fazem o registro ser recarregado inteiro
+    manipulador.cache.obter_registro()
+    operacoes_aleatorias(300, 7)
+    manipulador.cache.obter_registro()
+    assert len(cargas) > 1
+    conferir_com_o_banco(manipulador)
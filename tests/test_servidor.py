@@ -0,0 +1,152 @@
+# Servidor HTTP: entradas inválidas recebem uma resposta de erro sem derrubar a conexão, inscrições simultâneas
+# são gravadas em lotes e as listagens leem direto do banco
+import asyncio
+import time
+
+import pytest
+
+from servidor import ServidorEventFest, ClienteHTTP, LIMITE_PAGINA
+
+def executar(manipulador, teste):
+    # Roda a corrotina teste(servidor, cliente) com o servidor atendendo em uma porta livre
+    async def rodar():
+        servidor = ServidorEventFest(manipulador)
+        await servidor.iniciar('127.0.0.1', 0)
+        cliente = ClienteHTTP('127.0.0.1', servidor.porta)
+        try:
+            return await teste(servidor, cliente)
+        finally:
+            await cliente.fechar()
+            await servidor.fechar()
+    return asyncio.run(rodar())
+
+async def enviar_bruto(porta, requisicao):
+    # Envia bytes arbitrários e devolve o status da resposta
+    leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+    escritor.write(requisicao)
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    escritor.close()
+    return status
+
+@pytest.mark.parametrize('consulta', ['/eventos/proximos?limite=-1', '/eventos/proximos?limite=0',
+                                      '/usuarios?limite=-1', '/usuarios?deslocamento=-5', '/eventos?deslocamento=-1',
+                                      '/diario?limite=-1'])
+def test_paginacao_fora_do_intervalo(manipulador, consulta):
+    async def teste(servidor, cliente):
+        return await cliente.requisitar('GET', consulta)
+    status, resposta = executar(manipulador, teste)
+    assert status == 400 and 'erro' in resposta
+
+def test_limite_acima_do_maximo_e_reduzido(manipulador):
+    with manipulador.unidade_de_trabalho():
+        manipulador.conexao.executemany("INSERT INTO Usuarios (nome, idade) VALUES (?, 20)",
+                                        ((f'u{numero}',) for numero in range(LIMITE_PAGINA + 5)))
+    async def teste(servidor, cliente):
+        return await cliente.requisitar('GET', f'/usuarios?limite={LIMITE_PAGINA * 10}')
+    status, resposta = executar(manipulador, teste)
+    assert status == 200
+    assert (resposta['total'], len(resposta['usuarios'])) == (LIMITE_PAGINA + 5, LIMITE_PAGINA)
+
+@pytest.mark.parametrize('corpo', ['[1, 2]', '"texto"', '42', 'null'])
+def test_corpo_json_que_nao_e_objeto(manipulador, corpo):
+    async def teste(servidor, cliente):
+        requisicao = (f"POST /usuarios HTTP/1.1\r\nContent-Length: {len(corpo)}\r\n\r\n{corpo}").encode()
+        return await enviar_bruto(servidor.porta, requisicao)
+    assert executar(manipulador, teste) == 400
+
+def test_content_length_invalido(manipulador):
+    async def teste(servidor, cliente):
+        status = await enviar_bruto(servidor.porta, b"POST /usuarios HTTP/1.1\r\nContent-Length: abc\r\n\r\n{}")
+        # O servidor continua atendendo outras conexões
+        return status, await cliente.requisitar('GET', '/usuarios')
+    status, (status_seguinte, _) = executar(manipulador, teste)
+    assert (status, status_seguinte) == (400, 200)
+
+def test_erro_inesperado_vira_500(manipulador):
+    async def teste(servidor, cliente):
+        async def falhar(parametros, dados):
+            raise RuntimeError('falha')
+        servidor.rotas = [(metodo, padrao, falhar if operacao.__name__ == 'listar_usuarios' else operacao)
+                          for metodo, padrao, operacao in servidor.rotas]
+        return await cliente.requisitar('GET', '/usuarios')
+    status, resposta = executar(manipulador, teste)
+    assert status == 500 and 'erro' in resposta
+
+def test_inscricoes_simultaneas_em_lote(manipulador, gerenciadores):
+    # 30 clientes pedem vaga ao mesmo tempo em um evento de 5 vagas: as operações são gravadas em lotes
+    # e o lote que passa da capacidade inscreve até lotar e põe o resto na lista de espera
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    nomes = [f'u{numero:02d}' for numero in range(30)]
+    for nome in nomes:
+        gerenciador_usuarios.registrar_usuario(nome, 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('Show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x',
+                                         capacidade=5)
+
+    async def teste(servidor, cliente):
+        lotes = []
+        processar_lote = servidor.gerenciador_eventos.processar_lote
+
+        def processar_lote_registrando(operacoes):
+            # O primeiro lote demora, para as requisições seguintes se acumularem na fila
+            lotes.append(len(operacoes))
+            if len(lotes) == 1:
+                time.sleep(0.3)
+            return processar_lote(operacoes)
+        servidor.gerenciador_eventos.processar_lote = processar_lote_registrando
+
+        clientes = [ClienteHTTP('127.0.0.1', servidor.porta) for _ in nomes]
+        try:
+            respostas = await asyncio.gather(*[
+                cliente_rsvp.requisitar('POST', '/participacoes', {'evento': 'Show', 'usuario': nome})
+                for cliente_rsvp, nome in zip(clientes, nomes)])
+            # Repetir o pedido de quem já está na fila é recusado; cancelar uma vaga promove o primeiro da fila
+            repetido = await cliente.requisitar('POST', '/participacoes', {'evento': 'Show', 'usuario': nomes[-1]})
+            inscritos = [resposta['usuario'] for _, resposta in respostas if resposta.get('situacao') == 'inscrito']
+            cancelamento = await cliente.requisitar('DELETE', '/participacoes', {'evento': 'Show', 'usuario': inscritos[0]})
+            listagem = await cliente.requisitar('GET', '/eventos')
+        finally:
+            for cliente_rsvp in clientes:
+                await cliente_rsvp.fechar()
+        return lotes, respostas, repetido, inscritos, cancelamento, listagem
+
+    lotes, respostas, repetido, inscritos, cancelamento, listagem = executar(manipulador, teste)
+    assert sum(lotes) == 30 + 2 and max(lotes) > 1
+    assert all(status == 201 for status, _ in respostas)
+    situacoes = [resposta['situacao'] for _, resposta in respostas]
+    assert (situacoes.count('inscrito'), situacoes.count('lista_de_espera')) == (5, 25)
+    assert repetido[0] == 409
+
+    with manipulador.leitura() as conexao:
+        fila = [nome for (nome,) in conexao.execute(
+            "SELECT u.nome FROM ListaEspera l JOIN Usuarios u ON u.id = l.usuario_id ORDER BY l.id")]
+        assert conexao.execute("SELECT COUNT(*) FROM Participacoes").fetchone()[0] == 5
+    assert len(fila) == 24
+    status, resposta = cancelamento
+    assert status == 200 and len(resposta['promovidos']) == 1 and resposta['promovidos'][0] not in fila
+    status, resposta = listagem
+    participantes = resposta['eventos'][0]['participantes']
+    assert status == 200 and len(participantes) == 5
+    assert set(participantes) == (set(inscritos) - {inscritos[0]}) | set(cancelamento[1]['promovidos'])
+
+def test_listagens_nao_carregam_o_cache(manipulador, gerenciadores):
+    gerenciador_usuarios, gerenciador_eventos = gerenciadores
+    gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_eventos.registrar_evento('Peça', 'Rua B', '01001-000', 10, 'Teatro', '02/01/2030', '20:00', 'x')
+    gerenciador_eventos.registrar_evento('Show', 'Rua B', '01001-000', 10, 'Música', '01/01/2030', '20:00', 'x')
+    gerenciador_eventos.inscrever('Peça', 'ana')
+
+    async def teste(servidor, cliente):
+        return [await cliente.requisitar('GET', caminho)
+                for caminho in ('/usuarios', '/eventos', '/eventos?limite=1&deslocamento=1', '/usuarios/ana/eventos',
+                                '/usuarios/ninguem/eventos')]
+    usuarios, eventos, segunda_pagina, do_usuario, de_ninguem = executar(manipulador, teste)
+    assert usuarios[1]['total'] == 1 and usuarios[1]['usuarios'][0]['nome'] == 'ana'
+    # Em ordem de data: Show (01/01) antes de Peça (02/01)
+    assert eventos[1]['total'] == 2
+    assert [(evento['nome'], evento['participantes']) for evento in eventos[1]['eventos']] == [
+        ('Show', []), ('Peça', ['ana'])]
+    assert [evento['nome'] for evento in segunda_pagina[1]['eventos']] == ['Peça']
+    assert do_usuario == (200, {'usuario': 'ana', 'eventos': ['Peça']})
+    assert de_ninguem == (200, {'usuario': 'ninguem', 'eventos': []})
+    assert not manipulador.cache.carregado
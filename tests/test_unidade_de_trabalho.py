@@ -0,0 +1,46 @@
+# Unidades de trabalho (BEGIN IMMEDIATE / SAVEPOINT) sob disputa com outra conexão que segura a escrita
+import sqlite3
+
+import pytest
+
+@pytest.fixture
+def bloqueio(manipulador):
+    # Segunda conexão com a trava de escrita do arquivo; o manipulador desiste na hora em vez de esperar
+    manipulador.conexao.execute("PRAGMA busy_timeout = 0")
+    outra = sqlite3.connect(manipulador.nome_banco, isolation_level=None)
+    outra.execute("BEGIN IMMEDIATE")
+    yield outra
+    outra.close()
+
+def test_begin_bloqueado_nao_deixa_unidade_aberta(manipulador, gerenciadores, bloqueio):
+    gerenciador_usuarios, _ = gerenciadores
+    with pytest.raises(sqlite3.OperationalError):
+        with manipulador.unidade_de_trabalho():
+            pass
+    assert manipulador.nivel_transacao == 0
+    assert manipulador.thread_transacao is None
+    assert not manipulador.conexao.in_transaction
+    bloqueio.rollback()
+
+    # Sem a trava, a próxima unidade volta a ser a mais externa: o rollback desfaz tudo e invalida o cache
+    gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    gerenciador_usuarios.buscar_usuario('ana')
+    with pytest.raises(RuntimeError):
+        with manipulador.unidade_de_trabalho():
+            gerenciador_usuarios.registrar_usuario('bia', 21, 'F', '2', 'Rua B', '01001-000')
+            raise RuntimeError
+    assert not manipulador.cache.carregado
+    assert gerenciador_usuarios.buscar_usuario('bia') is None
+
+    # Fora de uma unidade, a leitura usa uma conexão de leitura e não a de escrita
+    with manipulador.leitura() as conexao:
+        assert conexao is not manipulador.conexao
+
+def test_gravacao_bloqueada_pode_ser_repetida(manipulador, gerenciadores, bloqueio):
+    gerenciador_usuarios, _ = gerenciadores
+    with pytest.raises(sqlite3.OperationalError):
+        gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert manipulador.nivel_transacao == 0
+    bloqueio.rollback()
+    gerenciador_usuarios.registrar_usuario('ana', 20, 'F', '1', 'Rua A', '01001-000')
+    assert gerenciador_usuarios.buscar_usuario('ana') is not None